@@ -0,0 +1,187 @@
+"""
+Answer Cache for Docu-Agent
+Deterministic keys and an optional semantic tier for cached rule and chatbot answers
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from local_embeddings import HashingEmbeddings
+from redis_cache import get_async_redis_cache, get_redis_cache
+
+logger = logging.getLogger(__name__)
+
+ANSWER_TTL = 14400
+# Semantic reuse is opt-in; cosine similarity needed to reuse another query's answer
+SEMANTIC_ENABLED = os.getenv('ANSWER_CACHE_SEMANTIC', '0') == '1'
+SIMILARITY_THRESHOLD = float(os.getenv('ANSWER_CACHE_SIMILARITY', 0.9))
+SEMANTIC_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_SEMANTIC_ENTRIES', 5000))
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Unicode-normalized, case-folded query with collapsed whitespace"""
+    return WHITESPACE.sub(" ", unicodedata.normalize("NFKC", query).casefold()).strip()
+
+
+def context_digest(context: Optional[Dict]) -> str:
+    """Stable digest of a context dict (key order does not matter)"""
+    canonical = json.dumps(context or {}, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def answer_key(scope: str, query: str, context: Optional[Dict] = None) -> str:
+    """Cache key for an answer: the same in every process and across restarts"""
+    payload = json.dumps([normalize_query(query), context_digest(context)], separators=(',', ':'))
+    return f"query:{scope}:{hashlib.sha256(payload.encode()).hexdigest()[:32]}"
+
+
+class SemanticIndex:
+    """In-process nearest-neighbour index from query embeddings to answer keys
+
+    Vectors are partitioned by context digest (answers for another context are
+    never reused) and kept in a fixed-size ring per partition. Answers
+    themselves stay in Redis; a matched key whose entry expired is discarded.
+    """
+
+    def __init__(self, embeddings: Any = None, threshold: float = SIMILARITY_THRESHOLD,
+                 max_entries: int = SEMANTIC_MAX_ENTRIES):
+        self.embeddings = embeddings or HashingEmbeddings()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # context digest -> (vectors, keys, next write slot)
+        self._partitions: Dict[str, Tuple[np.ndarray, List[Optional[str]], int]] = {}
+        self._lock = threading.Lock()
+
+    def embed(self, query: str) -> np.ndarray:
+        return np.asarray(self.embeddings.embed_query(normalize_query(query)), dtype=np.float32)
+
+    def add(self, digest: str, vector: np.ndarray, key: str):
+        with self._lock:
+            partition = self._partitions.get(digest)
+            if partition is None:
+                partition = (np.zeros((self.max_entries, len(vector)), dtype=np.float32),
+                             [None] * self.max_entries, 0)
+            vectors, keys, slot = partition
+            if key in keys:
+                return
+            vectors[slot] = vector
+            keys[slot] = key
+            self._partitions[digest] = (vectors, keys, (slot + 1) % self.max_entries)
+
+    def match(self, digest: str, vector: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Closest indexed key at or above the threshold, with its similarity"""
+        with self._lock:
+            partition = self._partitions.get(digest)
+            if partition is None:
+                return None
+            vectors, keys, _ = partition
+            scores = vectors @ vector
+            best = int(np.argmax(scores))
+            if keys[best] is None or scores[best] < self.threshold:
+                return None
+            return keys[best], float(scores[best])
+
+    def discard(self, key: str):
+        with self._lock:
+            for vectors, keys, _ in self._partitions.values():
+                if key in keys:
+                    slot = keys.index(key)
+                    keys[slot] = None
+                    vectors[slot] = 0
+
+
+class _AnswerCacheBase:
+    def __init__(self, scope: str, ttl: int = ANSWER_TTL, semantic: Optional[SemanticIndex] = None):
+        self.scope = scope
+        self.ttl = ttl
+        self.semantic = semantic if semantic is not None else (SemanticIndex() if SEMANTIC_ENABLED else None)
+
+    @staticmethod
+    def _hit(answer: Dict, query: str, match: str, matched_query: Optional[str] = None,
+             similarity: Optional[float] = None) -> Dict:
+        hit = {**answer, "query": query, "cache": match}
+        if matched_query is not None:
+            hit.update({"matched_query": matched_query, "similarity": round(similarity, 4)})
+        return hit
+
+
+class AnswerCache(_AnswerCacheBase):
+    """Exact, then (optionally) semantic lookup of generated answers on RedisCache"""
+
+    def get(self, query: str, context: Optional[Dict] = None) -> Optional[Dict]:
+        """Cached answer with `cache` set to exact/semantic, or None"""
+        cache = get_redis_cache()
+        key = answer_key(self.scope, query, context)
+        answer = cache.get(key)
+        vector = None
+        if self.semantic is not None:
+            vector = self.semantic.embed(query)
+            if answer is not None:
+                # Learn entries written by other workers as they are read
+                self.semantic.add(context_digest(context), vector, key)
+        if answer is not None:
+            return self._hit(answer, query, "exact")
+        if self.semantic is None:
+            return None
+
+        match = self.semantic.match(context_digest(context), vector)
+        if match is None:
+            return None
+        answer = cache.get(match[0])
+        if answer is None:
+            self.semantic.discard(match[0])
+            return None
+        return self._hit(answer, query, "semantic", answer.get("query"), match[1])
+
+    def set(self, query: str, answer: Dict, context: Optional[Dict] = None) -> bool:
+        key = answer_key(self.scope, query, context)
+        if self.semantic is not None:
+            self.semantic.add(context_digest(context), self.semantic.embed(query), key)
+        return get_redis_cache().set(key, answer, self.ttl)
+
+
+class AsyncAnswerCache(_AnswerCacheBase):
+    """AnswerCache on the shared asyncio pool"""
+
+    async def get(self, query: str, context: Optional[Dict] = None) -> Optional[Dict]:
+        """Cached answer with `cache` set to exact/semantic, or None"""
+        cache = get_async_redis_cache()
+        key = answer_key(self.scope, query, context)
+        answer = await cache.get(key)
+        vector = None
+        if self.semantic is not None:
+            # Embedding and the similarity scan are CPU-bound; keep them off the event loop
+            vector = await asyncio.to_thread(self.semantic.embed, query)
+            if answer is not None:
+                self.semantic.add(context_digest(context), vector, key)
+        if answer is not None:
+            return self._hit(answer, query, "exact")
+        if self.semantic is None:
+            return None
+
+        match = await asyncio.to_thread(self.semantic.match, context_digest(context), vector)
+        if match is None:
+            return None
+        answer = await cache.get(match[0])
+        if answer is None:
+            self.semantic.discard(match[0])
+            return None
+        return self._hit(answer, query, "semantic", answer.get("query"), match[1])
+
+    async def set(self, query: str, answer: Dict, context: Optional[Dict] = None) -> bool:
+        key = answer_key(self.scope, query, context)
+        if self.semantic is not None:
+            vector = await asyncio.to_thread(self.semantic.embed, query)
+            self.semantic.add(context_digest(context), vector, key)
+        return await get_async_redis_cache().set(key, answer, self.ttl)
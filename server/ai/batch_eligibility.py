@@ -0,0 +1,273 @@
+"""
+Batch Eligibility Processing for Docu-Agent
+Splits large profile batches into chunks evaluated on a process pool
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import logging
+
+from cache_metrics import cache_metrics
+from eligibility_engine import ProfileColumns, SchemeIndex, SchemeRegistry, summarize_users
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 2000))
+WORKERS = int(os.getenv('BATCH_WORKERS', os.cpu_count() or 2))
+RESULT_TTL = 86400
+# Rows read from Redis per LRANGE while streaming
+STREAM_SLICE = 1000
+
+# Schemes (and their attribute index) installed in each worker process by the pool initializer
+_worker_schemes: List[Dict] = []
+_worker_index = SchemeIndex()
+
+
+def _init_worker(schemes: List[Dict]):
+    global _worker_schemes, _worker_index
+    _worker_schemes = schemes
+    _worker_index = SchemeIndex()
+    for scheme in schemes:
+        _worker_index.add(scheme)
+
+
+def evaluate_chunk(profiles: List[Dict]) -> List[Dict]:
+    """Worker entry point: evaluate one chunk of profiles against all schemes"""
+    pruned = _worker_index.prune(profiles, len(_worker_schemes))
+    return summarize_users(ProfileColumns(profiles), _worker_schemes, pruned)
+
+
+def _locality_key(profile: Any):
+    """Sort key grouping profiles that share indexed attributes into the same chunks"""
+    get = profile.get if isinstance(profile, dict) else lambda field: getattr(profile, field, None)
+    return (str(get('state') or ''), str(get('caste_category') or ''), str(get('academic_year') or ''))
+
+
+def chunked(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def meta_key(task_id: str) -> str:
+    return f"batch:{task_id}"
+
+
+def results_key(task_id: str) -> str:
+    return f"batch:{task_id}:results"
+
+
+def _as_dict(profile: Any) -> Dict:
+    return profile.model_dump() if hasattr(profile, 'model_dump') else dict(profile)
+
+
+def _text(raw) -> str:
+    return raw.decode() if isinstance(raw, bytes) else raw
+
+
+class BatchExecutor:
+    """Process pool bound to one version of the scheme registry
+
+    Batches hold the pool they started on (acquire/release). When the
+    registry changes a new pool is started for later batches, and the
+    retired one is shut down once its last running batch releases it.
+    """
+
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._version: Optional[int] = None
+        # Running batches per pool (the current one and retired ones still in use)
+        self._batches: Dict[ProcessPoolExecutor, int] = {}
+
+    def pool_for(self, registry: SchemeRegistry) -> ProcessPoolExecutor:
+        """Return a pool whose workers hold the registry's current schemes"""
+        if self._pool is None or self._version != registry.version:
+            if self._pool is not None and self._pool not in self._batches:
+                self._pool.shutdown(wait=False)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(registry.all(),)
+            )
+            self._version = registry.version
+            logger.info(f"Batch pool started ({self.workers} workers, {len(registry)} schemes)")
+        return self._pool
+
+    def acquire(self, registry: SchemeRegistry) -> ProcessPoolExecutor:
+        """Current pool, kept alive for the caller until release()"""
+        pool = self.pool_for(registry)
+        self._batches[pool] = self._batches.get(pool, 0) + 1
+        return pool
+
+    def release(self, pool: ProcessPoolExecutor):
+        self._batches[pool] -= 1
+        if self._batches[pool] == 0:
+            del self._batches[pool]
+            if pool is not self._pool:
+                pool.shutdown(wait=False)
+
+    def shutdown(self):
+        for pool in set(self._batches) | ({self._pool} if self._pool is not None else set()):
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._batches.clear()
+        self._pool = None
+
+
+async def register_batch(redis, task_id: str, total: int):
+    """Record a queued batch so progress is visible before the background task starts"""
+    await redis.hset(meta_key(task_id), mapping={"status": "queued", "total": total, "done": 0, "failed": 0})
+    await redis.expire(meta_key(task_id), RESULT_TTL)
+
+
+async def run_batch(redis, registry: SchemeRegistry, executor: BatchExecutor,
+                    profiles: Sequence, task_id: str, chunk_size: int = CHUNK_SIZE):
+    """Evaluate a batch chunk by chunk, appending rows and progress to Redis as chunks finish
+
+    Layout: `batch:{task_id}` is a hash of counters (total/done/failed/chunks,
+    chunks_done, status) and `batch:{task_id}:results` a list of JSON rows in
+    chunk completion order. The final status is completed, partial (some
+    chunks failed) or failed (every chunk failed).
+    """
+    pool = executor.acquire(registry)
+    try:
+        await _run_chunks(redis, pool, executor.workers, profiles, task_id, chunk_size)
+    finally:
+        executor.release(pool)
+
+
+async def _run_chunks(redis, pool: ProcessPoolExecutor, workers: int,
+                      profiles: Sequence, task_id: str, chunk_size: int):
+    loop = asyncio.get_running_loop()
+    meta, results = meta_key(task_id), results_key(task_id)
+    # Chunks that share state/category/year let the attribute index prune far more schemes
+    ordered = await loop.run_in_executor(None, partial(sorted, key=_locality_key), profiles)
+    chunks = list(chunked(ordered, chunk_size))
+
+    await redis.hset(meta, mapping={
+        "status": "processing",
+        "total": len(profiles),
+        "done": 0,
+        "failed": 0,
+        "chunks": len(chunks),
+        "chunks_done": 0,
+        "started_at": datetime.utcnow().isoformat()
+    })
+    await redis.expire(meta, RESULT_TTL)
+
+    # Bound in-flight chunks so a huge batch doesn't queue every chunk's payload at once
+    window = asyncio.Semaphore(workers * 2)
+    failed_chunks = 0
+
+    async def run_chunk(index: int, chunk: Sequence):
+        nonlocal failed_chunks
+        async with window:
+            try:
+                rows = await loop.run_in_executor(pool, evaluate_chunk, [_as_dict(p) for p in chunk])
+            except Exception as e:
+                logger.error(f"Batch {task_id} chunk {index} failed: {e}")
+                failed_chunks += 1
+                async with redis.pipeline(transaction=True) as pipe:
+                    pipe.hincrby(meta, "failed", len(chunk))
+                    pipe.hincrby(meta, "chunks_done", 1)
+                    await pipe.execute()
+                return
+
+            encoded = [json.dumps(row) for row in rows]
+            start = time.perf_counter()
+            try:
+                async with redis.pipeline(transaction=True) as pipe:
+                    pipe.rpush(results, *encoded)
+                    pipe.expire(results, RESULT_TTL)
+                    pipe.hincrby(meta, "done", len(rows))
+                    pipe.hincrby(meta, "chunks_done", 1)
+                    await pipe.execute()
+            except Exception:
+                cache_metrics.record_error("batch", "append")
+                raise
+            cache_metrics.record_latency("batch", "append", time.perf_counter() - start)
+            cache_metrics.record_sizes("batch", [len(row) for row in encoded])
+
+    await asyncio.gather(*(run_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+
+    if not failed_chunks:
+        status = "completed"
+    else:
+        status = "failed" if failed_chunks == len(chunks) else "partial"
+    await redis.hset(meta, mapping={
+        "status": status,
+        "finished_at": datetime.utcnow().isoformat()
+    })
+    logger.info(f"Batch {task_id} {status} ({len(profiles)} profiles, {len(chunks)} chunks, "
+                f"{failed_chunks} failed)")
+
+
+async def get_progress(redis, task_id: str) -> Optional[Dict]:
+    """Progress counters of a batch, or None if the task is unknown"""
+    start = time.perf_counter()
+    meta = await redis.hgetall(meta_key(task_id))
+    cache_metrics.record_latency("batch", "get", time.perf_counter() - start)
+    if not meta:
+        cache_metrics.record_lookup("batch", "redis", misses=1)
+        return None
+    cache_metrics.record_lookup("batch", "redis", hits=1)
+
+    meta = {_text(k): _text(v) for k, v in meta.items()}
+    for field in ("total", "done", "failed", "chunks", "chunks_done"):
+        meta[field] = int(meta.get(field, 0))
+    meta["task_id"] = task_id
+    return meta
+
+
+async def read_results_page(redis, task_id: str, cursor: int = 0, limit: int = 1000) -> Dict:
+    """One page of result rows starting at `cursor` (an offset into the append-only results list)
+
+    Rows are spliced into the response as stored, without decoding them.
+    """
+    start = time.perf_counter()
+    raws = await redis.lrange(results_key(task_id), cursor, cursor + limit - 1)
+    cache_metrics.record_latency("batch", "read", time.perf_counter() - start)
+    return {
+        "count": len(raws),
+        "next_cursor": cursor + len(raws),
+        "available": await redis.llen(results_key(task_id)),
+        "rows_json": "[" + ",".join(_text(raw) for raw in raws) + "]"
+    }
+
+
+async def stream_results(redis, task_id: str, cursor: int, end: int):
+    """NDJSON rows in [cursor, end), read from Redis in STREAM_SLICE-sized ranges"""
+    while cursor < end:
+        stop = min(cursor + STREAM_SLICE, end)
+        raws = await redis.lrange(results_key(task_id), cursor, stop - 1)
+        if not raws:
+            return
+        yield "".join(_text(raw) + "\n" for raw in raws)
+        cursor = stop
+
+
+async def stream_progress(redis, task_id: str, interval: float = 0.5):
+    """NDJSON stream of result rows as chunks land, interleaved with progress events"""
+    sent = 0
+    while True:
+        progress = await get_progress(redis, task_id)
+        if progress is None:
+            yield json.dumps({"type": "error", "detail": "Task not found"}) + "\n"
+            return
+
+        available = await redis.llen(results_key(task_id))
+        while sent < available:
+            end = min(sent + STREAM_SLICE, available)
+            for raw in await redis.lrange(results_key(task_id), sent, end - 1):
+                yield '{"type": "row", "data": ' + _text(raw) + '}\n'
+            sent = end
+
+        yield json.dumps({"type": "progress", **progress}) + "\n"
+        if progress["status"] not in ("queued", "processing"):
+            return
+        await asyncio.sleep(interval)
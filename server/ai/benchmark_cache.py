@@ -0,0 +1,60 @@
+"""
+Redis Cache Benchmark for Docu-Agent
+Compares per-key round trips with MGET/pipelined bulk calls at growing batch sizes
+
+Requires a reachable Redis (REDIS_HOST / REDIS_PORT).
+Usage: python benchmark_cache.py [--sizes 10 100 1000 10000]
+"""
+
+import argparse
+import time
+
+from redis_cache import RedisCache
+
+SAMPLE_RULE = {
+    "scheme_id": "scheme_0",
+    "conditions": [{"id": 1, "joiner": "AND", "rows": [
+        {"id": 1, "field": "State", "operator": "Equals", "value": "Maharashtra"},
+        {"id": 2, "field": "Annual Income", "operator": "Less Than", "value": "800000"}
+    ]}]
+}
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    # No local tier: every call below goes to Redis
+    cache = RedisCache()
+    if not cache.client:
+        print("Redis not reachable; set REDIS_HOST / REDIS_PORT")
+        return
+
+    print(f"{'batch':>7} {'op':>6} {'single (ms)':>12} {'bulk (ms)':>10} {'round trips':>14} {'speedup':>8}")
+    for size in args.sizes:
+        keys = [f"bench:rule:{i}" for i in range(size)]
+        items = {key: SAMPLE_RULE for key in keys}
+
+        single_set = timed(lambda: [cache.set(key, value) for key, value in items.items()])
+        bulk_set = timed(lambda: cache.set_many(items))
+        single_get = timed(lambda: [cache.get(key) for key in keys])
+        bulk_get = timed(lambda: cache.get_many(keys))
+        single_delete = timed(lambda: [cache.delete(key) for key in keys])
+        cache.set_many(items)
+        bulk_delete = timed(lambda: cache.delete_many(keys))
+
+        for op, single, bulk in (("set", single_set, bulk_set), ("get", single_get, bulk_get),
+                                 ("delete", single_delete, bulk_delete)):
+            print(f"{size:>7} {op:>6} {single * 1e3:>12.1f} {bulk * 1e3:>10.1f} "
+                  f"{f'{size} -> 1':>14} {single / bulk:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
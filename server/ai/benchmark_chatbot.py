@@ -0,0 +1,68 @@
+"""
+Chatbot Worker Benchmark for Docu-Agent
+Replies per second: a Python process per message vs the long-lived `text_extractor.py --serve` worker
+
+Usage: python benchmark_chatbot.py [--messages 2000] [--spawn-messages 50] [--batch-size 32]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "text_extractor.py")
+MESSAGES = ["How do I upload my documents?", "I want to edit my profile details",
+            "Which schemes am I eligible for?", "When is the deadline?", "hello there"]
+
+
+def spawn_per_message(count: int) -> float:
+    """What routes/chatbot.js did: interpreter start and imports for every message"""
+    start = time.perf_counter()
+    for i in range(count):
+        subprocess.run([sys.executable, SCRIPT, MESSAGES[i % len(MESSAGES)]], capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def persistent(count: int, batch_size: int) -> float:
+    """One worker; `batch_size` messages per request line (1 = a round trip per message)"""
+    worker = subprocess.Popen([sys.executable, SCRIPT, "--serve"], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True, encoding="utf-8")
+    # Warm up so startup is not counted, as it is paid once per server
+    worker.stdin.write(json.dumps({"id": 0, "message": "hi"}) + "\n")
+    worker.stdin.flush()
+    worker.stdout.readline()
+
+    start = time.perf_counter()
+    for batch_id, first in enumerate(range(0, count, batch_size), start=1):
+        messages = [MESSAGES[i % len(MESSAGES)] for i in range(first, min(first + batch_size, count))]
+        worker.stdin.write(json.dumps({"id": batch_id, "messages": messages}) + "\n")
+        worker.stdin.flush()
+        response = json.loads(worker.stdout.readline())
+        assert response["id"] == batch_id and len(response["replies"]) == len(messages)
+    elapsed = time.perf_counter() - start
+    worker.stdin.close()
+    worker.wait()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--spawn-messages", type=int, default=50, help="fewer, since each costs a process")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"{'mode':>22} {'messages':>9} {'replies/s':>10} {'ms/reply':>9}")
+    for name, count, run in (
+        ("spawn per message", args.spawn_messages, lambda: spawn_per_message(args.spawn_messages)),
+        ("persistent", args.messages, lambda: persistent(args.messages, 1)),
+        (f"persistent batch={args.batch_size}", args.messages, lambda: persistent(args.messages, args.batch_size)),
+    ):
+        elapsed = run()
+        print(f"{name:>22} {count:>9} {count / elapsed:>10.0f} {elapsed / count * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Cache Codec Benchmark for Docu-Agent
+Compares encode/decode time and bytes per key of the cache codec with pickle and str/eval
+
+Usage: python benchmark_codec.py [--schemes 50 500 5000] [--repeat 200]
+"""
+
+import argparse
+import ast
+import pickle
+import time
+from datetime import datetime
+
+from benchmark_eligibility import generate_profiles, generate_schemes
+from cache_codec import JSON_SERIALIZER, MSGPACK_SERIALIZER, CacheCodec
+from eligibility_engine import SchemeRegistry
+
+
+def sample_result(scheme_count: int) -> dict:
+    """A full /v2/eligibility/check result against `scheme_count` schemes"""
+    registry = SchemeRegistry()
+    for scheme in generate_schemes(scheme_count):
+        registry.upsert(scheme)
+    result = registry.check_user(generate_profiles(1)[0])
+    result.update({"user_id": "user_0", "cached": False, "processed_at": datetime.utcnow().isoformat()})
+    return result
+
+
+def formats() -> list:
+    entries = [
+        ("pickle", pickle.dumps, pickle.loads),
+        # eval() is what the server used; literal_eval is its safe equivalent and no faster
+        ("str/eval", lambda value: str(value).encode(), lambda data: eval(data.decode())),
+        ("str/literal_eval", lambda value: str(value).encode(), lambda data: ast.literal_eval(data.decode())),
+    ]
+    serializers = [JSON_SERIALIZER] + ([MSGPACK_SERIALIZER] if MSGPACK_SERIALIZER else [])
+    for serializer in serializers:
+        plain = CacheCodec(serializer, compress_threshold=-1)
+        compressed = CacheCodec(serializer, compress_threshold=0)
+        entries.append((f"codec {serializer.name}", plain.encode, plain.decode))
+        entries.append((f"codec {serializer.name}+zlib", compressed.encode, compressed.decode))
+    return entries
+
+
+def per_call(fn, arg, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--schemes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for scheme_count in args.schemes:
+        value = sample_result(scheme_count)
+        repeat = max(1, args.repeat * 50 // scheme_count)
+        print(f"\nresult for {scheme_count:,} schemes")
+        print(f"{'format':>22} {'encode (us)':>12} {'decode (us)':>12} {'bytes':>10}")
+        for name, encode, decode in formats():
+            data = encode(value)
+            print(f"{name:>22} {per_call(encode, value, repeat) * 1e6:>12.1f} "
+                  f"{per_call(decode, data, repeat) * 1e6:>12.1f} {len(data):>10,}")
+
+
+if __name__ == "__main__":
+    main()
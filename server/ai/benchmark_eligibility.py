@@ -0,0 +1,168 @@
+"""
+Eligibility Engine Benchmark for Docu-Agent
+Compares scalar per-condition evaluation with the vectorized NumPy engine
+
+Usage: python benchmark_eligibility.py [--schemes 10000] [--users 100000]
+"""
+
+import argparse
+import random
+import time
+
+from eligibility_engine import (
+    CompiledSchemes,
+    ProfileColumns,
+    SchemeRegistry,
+    check_user_eligibility,
+    evaluate_matrix,
+)
+from population_index import PopulationIndex
+
+STATES = ['Maharashtra', 'Karnataka', 'Tamil Nadu', 'Gujarat', 'Kerala', 'Goa']
+CATEGORIES = ['SC', 'ST', 'OBC', 'General', 'EWS']
+GENDERS = ['Male', 'Female', 'Other']
+EDUCATION = ['Class 10', 'Class 12', 'Undergraduate', 'Postgraduate', 'Diploma']
+INSTITUTIONS = ['Government', 'Private', 'Aided']
+
+
+def random_row(rng: random.Random) -> dict:
+    kind = rng.random()
+    if kind < 0.3:
+        return {"field": "State", "operator": "Equals", "value": rng.choice(STATES)}
+    if kind < 0.5:
+        return {"field": "Category", "operator": "Equals", "value": rng.choice(CATEGORIES)}
+    if kind < 0.7:
+        return {"field": "Annual Income", "operator": "Less Than", "value": str(rng.choice([250000, 500000, 800000]))}
+    if kind < 0.8:
+        low = rng.randint(15, 25)
+        return {"field": "Age", "operator": "Between", "value": f"{low}-{low + rng.randint(3, 10)}"}
+    if kind < 0.85:
+        return {"field": "Marks Percentage", "operator": "Greater Than", "value": str(rng.randint(40, 85))}
+    if kind < 0.9:
+        return {"field": "State", "operator": "Not Equals", "value": rng.choice(STATES)}
+    if kind < 0.95:
+        return {"field": "Education Level", "operator": "Includes", "value": rng.choice(['class', 'graduate'])}
+    return {"field": "Gender", "operator": "Not Equals", "value": rng.choice(GENDERS)}
+
+
+def generate_schemes(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    schemes = []
+    for i in range(count):
+        groups = []
+        for g in range(rng.randint(1, 3)):
+            rows = [random_row(rng) for _ in range(rng.randint(1, 3))]
+            groups.append({"id": g, "joiner": rng.choice(['AND', 'AND', 'OR']), "rows": rows})
+        schemes.append({"id": f"scheme_{i}", "schemeName": f"Scheme {i}", "conditions": groups})
+    return schemes
+
+
+def generate_profiles(count: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "user_id": f"user_{i}",
+            "annual_income": rng.choice([None, rng.randint(50000, 1200000)]),
+            "caste_category": rng.choice(CATEGORIES),
+            "state": rng.choice(STATES),
+            "gender": rng.choice(GENDERS),
+            "age": rng.randint(14, 35),
+            "marks_percentage": rng.randint(35, 99),
+            "education_level": rng.choice(EDUCATION),
+            "institution_type": rng.choice(INSTITUTIONS)
+        }
+        for i in range(count)
+    ]
+
+
+def edge_schemes() -> list:
+    """Index-prunable schemes whose first group holds several Not Equals rows on one field"""
+    schemes = []
+    for joiner in ('OR', 'AND'):
+        for values in ([STATES[0], STATES[1]], [STATES[0], STATES[0]], [STATES[0]]):
+            rows = [{"field": "State", "operator": "Not Equals", "value": value} for value in values]
+            schemes.append({"id": f"edge_{joiner}_{'_'.join(values)}", "schemeName": "Edge case",
+                            "conditions": [{"id": 0, "joiner": joiner, "rows": rows}]})
+    return schemes
+
+
+def verify(schemes: list, profiles: list) -> int:
+    """Mismatches between the indexed registry and the scalar evaluator (eligibility, score, missing)"""
+    registry = SchemeRegistry()
+    for scheme in schemes:
+        registry.upsert(scheme)
+
+    mismatches = 0
+    for profile in profiles:
+        result = registry.check_user(profile)
+        summaries = {s["id"]: (True, s) for s in result["eligible_schemes"]}
+        summaries.update((s["id"], (False, s)) for s in result["partial_match_schemes"] + result["not_eligible_schemes"])
+        for scheme in schemes:
+            expected = check_user_eligibility(profile, scheme)
+            eligible, summary = summaries[scheme["id"]]
+            if (eligible, summary["score"], summary["missing"]) != \
+                    (expected["is_eligible"], expected["score"], expected["missing"]):
+                mismatches += 1
+    return mismatches
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--schemes", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--scalar-pairs", type=int, default=50000,
+                        help="user-scheme pairs timed for the scalar baseline")
+    parser.add_argument("--single-users", type=int, default=200,
+                        help="profiles timed for the one-user-vs-all-schemes mode")
+    parser.add_argument("--verify-users", type=int, default=50,
+                        help="profiles checked against the scalar evaluator over all schemes")
+    args = parser.parse_args()
+
+    schemes = generate_schemes(args.schemes)
+    profiles = generate_profiles(args.users)
+    pairs = args.schemes * args.users
+    print(f"{args.schemes:,} schemes x {args.users:,} users = {pairs:,} pairs\n")
+
+    # Scalar baseline on a random sample, extrapolated to the full matrix
+    rng = random.Random(3)
+    sample = [(rng.choice(profiles), rng.choice(schemes)) for _ in range(args.scalar_pairs)]
+    _, scalar_time = timed(lambda: [check_user_eligibility(p, s) for p, s in sample])
+    scalar_total = scalar_time / len(sample) * pairs
+    print(f"scalar          {scalar_time / len(sample) * 1e6:8.2f} us/pair   ~{scalar_total:10.1f} s total (extrapolated)")
+
+    # One user against all schemes
+    compiled, compile_time = timed(lambda: CompiledSchemes(schemes))
+    single = profiles[:args.single_users]
+    _, single_time = timed(lambda: [compiled.evaluate(p) for p in single])
+    single_total = single_time / len(single) * args.users
+    print(f"user->schemes   {single_time / len(single) * 1e3:8.2f} ms/user   ~{single_total:10.1f} s total "
+          f"(compile {compile_time:.2f} s)   speedup x{scalar_total / single_total:,.0f}")
+
+    # Many users against each scheme, measured over the full matrix
+    columns, columns_time = timed(lambda: ProfileColumns(profiles))
+    eligible, matrix_time = timed(lambda: sum(int(r.eligible.sum()) for r in evaluate_matrix(columns, schemes)))
+    print(f"scheme->users   {matrix_time / args.schemes * 1e3:8.2f} ms/scheme  {matrix_time:10.1f} s total "
+          f"(columns {columns_time:.2f} s)   speedup x{scalar_total / matrix_time:,.0f}")
+
+    # Reverse eligibility over bitmap / sorted-array indexes (eligible users only, no scores)
+    population, index_time = timed(lambda: PopulationIndex(columns))
+    reverse_eligible, reverse_time = timed(lambda: sum(len(population.eligible_positions(s)) for s in schemes))
+    print(f"bitmap index    {reverse_time / args.schemes * 1e3:8.2f} ms/scheme  {reverse_time:10.1f} s total "
+          f"(bitmaps {index_time:.2f} s)   eligible-only")
+
+    print(f"\neligible pairs: {eligible:,} (bitmap index: {reverse_eligible:,})")
+
+    # Indexed registry (with pruning) against the scalar evaluator
+    checked = schemes[:2000] + edge_schemes()
+    mismatches = verify(checked, profiles[:args.verify_users])
+    print(f"index vs scalar: {mismatches} mismatches over {len(checked) * args.verify_users:,} pairs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Embedding Cache Benchmark for Docu-Agent
+Indexing cost of a rulebook and of its yearly revision, with and without the chunk embedding cache
+
+Runs offline: the hashing backend behind a simulated per-request / per-text API latency.
+Vectors go to Redis when reachable, otherwise to the in-process map.
+Usage: python benchmark_embeddings.py [--chunks 2000] [--changed 0.1] [--batch-size 128]
+"""
+
+import argparse
+import random
+import time
+
+from embedding_cache import CachedEmbeddings
+from local_embeddings import HashingEmbeddings
+
+WORDS = ("scheme applicant income certificate domicile category caste annual family student "
+         "scholarship tuition fee hostel maintenance allowance disability minority marks "
+         "percentage institution government recognised course renewal attendance").split()
+
+
+class SlowEmbeddings(HashingEmbeddings):
+    """HashingEmbeddings that sleeps like a remote API: a round trip per request plus time per text"""
+
+    def __init__(self, dim: int = 512, request_latency: float = 0.2, text_latency: float = 0.001):
+        super().__init__(dim)
+        self.request_latency = request_latency
+        self.text_latency = text_latency
+        self.requests = 0
+        self.texts = 0
+
+    def embed(self, texts):
+        self.requests += 1
+        self.texts += len(texts)
+        time.sleep(self.request_latency + self.text_latency * len(texts))
+        return super().embed(texts)
+
+
+def make_chunks(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [f"Clause {i}. " + " ".join(rng.choice(WORDS) for _ in range(150)) for i in range(count)]
+
+
+def revise(chunks: list, fraction: float, seed: int) -> list:
+    rng = random.Random(seed)
+    return [chunk + " (amended)" if rng.random() < fraction else chunk for chunk in chunks]
+
+
+def run(name: str, embeddings, backend: SlowEmbeddings, chunks: list):
+    requests, texts = backend.requests, backend.texts
+    start = time.perf_counter()
+    embeddings.embed_documents(chunks)
+    print(f"{name:>28} {backend.requests - requests:>9} {backend.texts - texts:>9} "
+          f"{time.perf_counter() - start:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--changed", type=float, default=0.1, help="fraction of chunks changed by the revision")
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--request-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks, seed=0)
+    revision = revise(chunks, args.changed, seed=1)
+    print(f"{'run':>28} {'requests':>9} {'embedded':>9} {'time (s)':>9}")
+
+    # What setup_retrieval_chain did before: one text per request, nothing reused
+    backend = SlowEmbeddings(request_latency=args.request_latency)
+    sample = chunks[:max(1, args.chunks // 20)]
+    start = time.perf_counter()
+    for chunk in sample:
+        backend.embed([chunk])
+    per_chunk = (time.perf_counter() - start) / len(sample)
+    print(f"{'unbatched (extrapolated)':>28} {args.chunks:>9} {args.chunks:>9} {per_chunk * args.chunks:>9.2f}")
+
+    backend = SlowEmbeddings(request_latency=args.request_latency)
+    # A run-specific model name keeps earlier runs' vectors in Redis from turning the cold run warm
+    backend.model_name = f"bench-{time.time_ns()}"
+    cached = CachedEmbeddings(backend, batch_size=args.batch_size)
+    run("cold (batched)", cached, backend, chunks)
+    run("same rulebook again", cached, backend, chunks)
+    run(f"revision ({args.changed:.0%} changed)", cached, backend, revision)
+    print(cached.get_stats())
+
+
+if __name__ == "__main__":
+    main()
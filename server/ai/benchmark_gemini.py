@@ -0,0 +1,191 @@
+"""
+Gemini Load Benchmark for Docu-Agent
+Throughput and tail latency of GeminiProcessor against an offline fake model
+
+Usage: python benchmark_gemini.py [--requests 200] [--concurrency 8 32] [--latency 0.8]
+                                  [--error-rate 0.05] [--hang-rate 0.01] [--timeout 5]
+                                  [--pack-schemes 40] [--drop-rate 0.05]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from gemini_integration import GeminiProcessor
+from llm_resilience import CircuitBreaker, ResilientModel
+from prompt_packing import estimate_tokens
+
+SAMPLE_PROFILE = {"annual_income": 500000, "caste_category": "SC", "state": "Maharashtra"}
+SAMPLE_RULES = "Income limit: < 800000\nCaste category: SC/ST/OBC\nState: Maharashtra"
+FAKE_ANSWER = '{"is_eligible": true, "eligibility_score": 90, "explanation": "fake", ' \
+              '"missing_requirements": [], "recommendations": []}'
+PACKED_ITEM = re.compile(r"^### \w+: (.+)$", re.MULTILINE)
+
+
+class FakeGenerativeModel:
+    """Stand-in for genai.GenerativeModel with log-normal latency, transient errors and hangs
+
+    Packed prompts get a JSON object keyed by item id, with `drop_rate` of the
+    items left out to exercise the single-call fallback. With stream=True the
+    answer arrives in `chunk_words`-word chunks: the first after the sampled
+    latency, the rest `chunk_delay` apart.
+    """
+
+    def __init__(self, latency: float = 0.8, sigma: float = 0.5, error_rate: float = 0.0,
+                 hang_rate: float = 0.0, text: str = FAKE_ANSWER, drop_rate: float = 0.0, seed: int = 0,
+                 chunk_words: int = 4, chunk_delay: float = 0.05):
+        self.latency = latency
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.text = text
+        self.drop_rate = drop_rate
+        self.chunk_words = chunk_words
+        self.chunk_delay = chunk_delay
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def _answer(self, prompt: str) -> SimpleNamespace:
+        item_ids = PACKED_ITEM.findall(prompt)
+        if not item_ids:
+            return SimpleNamespace(text=self.text)
+        answer = json.loads(self.text)
+        kept = [item_id for item_id in item_ids if self.random.random() >= self.drop_rate]
+        return SimpleNamespace(text=json.dumps({item_id: answer for item_id in kept}))
+
+    def _plan(self, prompt: str) -> float:
+        self.calls += 1
+        self.prompt_tokens += estimate_tokens(prompt)
+        roll = self.random.random()
+        if roll < self.error_rate:
+            raise ConnectionError("fake model: 503 overloaded")
+        if roll < self.error_rate + self.hang_rate:
+            return 3600.0
+        return self.random.lognormvariate(np.log(self.latency), self.sigma)
+
+    def _chunks(self, text: str):
+        words = text.split(" ")
+        for i in range(0, len(words), self.chunk_words):
+            piece = " ".join(words[i:i + self.chunk_words])
+            yield SimpleNamespace(text=piece if i + self.chunk_words >= len(words) else piece + " ")
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        time.sleep(self._plan(prompt))
+        if not stream:
+            return self._answer(prompt)
+
+        def chunks():
+            for i, chunk in enumerate(self._chunks(self._answer(prompt).text)):
+                if i:
+                    time.sleep(self.chunk_delay)
+                yield chunk
+        return chunks()
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        if not stream:
+            await asyncio.sleep(self._plan(prompt))
+            return self._answer(prompt)
+        delay = self._plan(prompt)
+
+        async def chunks():
+            # Like the SDK, the stream opens at once and the first chunk carries the latency
+            await asyncio.sleep(delay)
+            for i, chunk in enumerate(self._chunks(self._answer(prompt).text)):
+                if i:
+                    await asyncio.sleep(self.chunk_delay)
+                yield chunk
+        return chunks()
+
+
+async def run_load(processor: GeminiProcessor, requests: int, use_async: bool):
+    """Fire `requests` eligibility analyses at once; latency counts from the burst, so queueing shows"""
+    latencies = []
+    start = time.perf_counter()
+
+    async def one():
+        if use_async:
+            result = await processor.analyze_eligibility_async(SAMPLE_PROFILE, SAMPLE_RULES)
+        else:
+            # What the service did before: the blocking call runs on the event loop
+            result = processor.analyze_eligibility(SAMPLE_PROFILE, SAMPLE_RULES)
+        latencies.append(time.perf_counter() - start)
+        return result.get("fallback", False)
+
+    fallbacks = sum(await asyncio.gather(*(one() for _ in range(requests))))
+    return time.perf_counter() - start, np.array(latencies), fallbacks
+
+
+async def run_packing(schemes: int, latency: float, drop_rate: float):
+    """One user against `schemes` schemes: a call per pair vs packed calls"""
+    rules = {f"scheme_{i}": f"Income limit: < {300000 + i * 10000}\nCaste category: SC/ST/OBC\n"
+                            f"State: Maharashtra, Karnataka\nAge: 18-{40 + i % 20}" for i in range(schemes)}
+    print(f"\n{'mode':>26} {'calls':>9} {'prompt tok':>10} {'time (s)':>8} {'results':>9}")
+
+    model = FakeGenerativeModel(latency)
+    processor = GeminiProcessor(model=model)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(processor.analyze_eligibility_async(SAMPLE_PROFILE, text)
+                                     for text in rules.values()))
+    print(f"{f'single x{schemes}':>26} {model.calls:>9} {model.prompt_tokens:>10,} "
+          f"{time.perf_counter() - start:>8.2f} {len(results):>9}")
+
+    model = FakeGenerativeModel(latency, drop_rate=drop_rate)
+    processor = GeminiProcessor(model=model)
+    start = time.perf_counter()
+    results = await processor.analyze_eligibility_batch_async(SAMPLE_PROFILE, rules)
+    print(f"{'packed':>26} {model.calls:>9} {model.prompt_tokens:>10,} "
+          f"{time.perf_counter() - start:>8.2f} {len(results):>9}")
+
+
+def report(name: str, elapsed: float, latencies: np.ndarray, fallbacks: int, stats: dict = None):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{name:>26} {len(latencies) / elapsed:>9.1f} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f} {fallbacks:>9}"
+          + (f"  {stats}" if stats else ""))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--latency", type=float, default=0.8, help="median fake model latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--hang-rate", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--sync-requests", type=int, default=10)
+    parser.add_argument("--pack-schemes", type=int, default=40)
+    parser.add_argument("--drop-rate", type=float, default=0.05, help="items missing from packed answers")
+    args = parser.parse_args()
+    # Fallbacks are expected here and logged per request otherwise
+    logging.getLogger("gemini_integration").setLevel(logging.CRITICAL)
+
+    print(f"{'mode':>26} {'req/s':>9} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8} {'fallbacks':>9}")
+
+    model = FakeGenerativeModel(args.latency, error_rate=args.error_rate)
+    report(f"sync x{args.sync_requests}", *await run_load(GeminiProcessor(model=model), args.sync_requests, False))
+
+    for concurrency in args.concurrency:
+        model = FakeGenerativeModel(args.latency, error_rate=args.error_rate, hang_rate=args.hang_rate)
+        processor = GeminiProcessor(model=model)
+        processor.resilient = ResilientModel(model, max_concurrency=concurrency, timeout=args.timeout)
+        report(f"async c={concurrency}", *await run_load(processor, args.requests, True), processor.get_stats())
+
+    # Outage: the breaker opens and the remaining requests fall back without waiting on the model
+    model = FakeGenerativeModel(args.latency, error_rate=1.0)
+    processor = GeminiProcessor(model=model)
+    processor.resilient = ResilientModel(model, max_concurrency=max(args.concurrency), timeout=args.timeout,
+                                         breaker=CircuitBreaker(failure_threshold=5, reset_timeout=60))
+    report("async outage", *await run_load(processor, args.requests, True), processor.get_stats())
+
+    await run_packing(args.pack_schemes, args.latency, args.drop_rate)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Knowledge Base Search Benchmark for Docu-Agent
+Index build time and per-message latency of KnowledgeIndex vs the old linear tag scan as the KB grows
+
+Usage: python benchmark_kb.py [--sizes 1000 10000 100000] [--queries 500]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from kb_index import KnowledgeIndex, tokenize
+
+SYLLABLES = ["ka", "ra", "ti", "no", "me", "shi", "van", "dra", "pu", "lo", "sa", "gan", "ri", "ta", "de", "mi"]
+DOMAIN = ("scheme scholarship income certificate caste document upload profile deadline hostel fee tuition "
+          "disability minority marks renewal attendance bank account aadhaar domicile eligibility").split()
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list:
+    words = set(DOMAIN)
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_entries(count: int, vocabulary: list, rng: random.Random) -> list:
+    # Zipf-like word popularity, as in real FAQ text
+    weights = 1 / np.arange(1, len(vocabulary) + 1)
+    picks = np.random.default_rng(0).choice(len(vocabulary), size=(count, 12), p=weights / weights.sum())
+    return [{"id": f"faq_{i}", "tags": [vocabulary[j] for j in row[:5]],
+             "question": " ".join(vocabulary[j] for j in row[5:]), "answer": f"Answer {i}"}
+            for i, row in enumerate(picks)]
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def linear_scan(entries: list, message: str) -> list:
+    """generate_reply before the index: every entry's tags against the message words, KB order"""
+    tokens = set(tokenize(message))
+    return [entry for entry in entries if any(tag in tokens for tag in entry.get("tags", []))]
+
+
+def timed_results(fn, queries: list):
+    """(per-query milliseconds, results)"""
+    times, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=30000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    print(f"{'entries':>8} {'build (s)':>9} {'mode':>12} {'p50 (ms)':>9} {'p99 (ms)':>9} {'hit@1':>6}")
+    for size in args.sizes:
+        entries = make_entries(size, vocabulary, rng)
+        start = time.perf_counter()
+        index = KnowledgeIndex(entries)
+        build = time.perf_counter() - start
+
+        # Queries built from a target entry's words, so hit@1 shows whether ranking finds it
+        targets = [rng.randrange(size) for _ in range(args.queries)]
+        exact = [" ".join(entries[t]["tags"][:3] + entries[t]["question"].split()[:2]) for t in targets]
+        typos = [" ".join(misspell(word, rng) for word in query.split()) for query in exact]
+
+        for mode, queries, fn in (("linear scan", exact, lambda q: linear_scan(entries, q)),
+                                  ("index", exact, index.search),
+                                  ("index typos", typos, index.search)):
+            times, results = timed_results(fn, queries)
+            # The scan has no ranking: its first match is simply the earliest entry with a shared tag
+            hits = sum(bool(r) and r[0]["id"] == entries[t]["id"] for r, t in zip(results, targets)) / len(queries)
+            p50, p99 = np.percentile(times, [50, 99])
+            print(f"{size:>8} {build:>9.2f} {mode:>12} {p50:>9.3f} {p99:>9.3f} {hits:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
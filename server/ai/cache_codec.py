@@ -0,0 +1,160 @@
+"""
+Cache Codec for Docu-Agent
+Versioned, optionally compressed value encoding shared by every Redis cache writer
+"""
+
+import ast
+import json
+import os
+import zlib
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional
+import logging
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Frame: MAGIC | version | flags | payload. MAGIC never starts JSON, str(dict) or pickle (b'\x80') data.
+MAGIC = b'\xdc'
+VERSION = 1
+HEADER_SIZE = 3
+FLAG_COMPRESSED = 0x01
+# High nibble of the flags byte identifies the serializer
+SERIALIZER_SHIFT = 4
+
+COMPRESS_THRESHOLD = int(os.getenv('CACHE_COMPRESS_THRESHOLD', 1024))
+COMPRESS_LEVEL = 1
+
+
+class CodecError(ValueError):
+    """Raised for data the codec cannot (or will not) decode"""
+
+
+def _default(value: Any) -> Any:
+    """Fallback for types JSON and msgpack don't handle natively"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, 'model_dump'):
+        return value.model_dump()
+    if hasattr(value, 'item'):
+        # NumPy scalars
+        return value.item()
+    raise TypeError(f"Cannot encode {type(value).__name__} for cache")
+
+
+class Serializer:
+    """A named pair of dumps/loads functions with a stable one-nibble id"""
+
+    def __init__(self, name: str, serializer_id: int, dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any]):
+        self.name = name
+        self.id = serializer_id
+        self.dumps = dumps
+        self.loads = loads
+
+
+JSON_SERIALIZER = Serializer(
+    "json", 0,
+    lambda value: json.dumps(value, separators=(',', ':'), default=_default).encode(),
+    json.loads
+)
+
+SERIALIZERS: Dict[int, Serializer] = {JSON_SERIALIZER.id: JSON_SERIALIZER}
+
+if msgpack is not None:
+    MSGPACK_SERIALIZER = Serializer(
+        "msgpack", 1,
+        lambda value: msgpack.packb(value, default=_default, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False, strict_map_key=False)
+    )
+    SERIALIZERS[MSGPACK_SERIALIZER.id] = MSGPACK_SERIALIZER
+else:
+    MSGPACK_SERIALIZER = None
+
+
+def get_serializer(name: str) -> Serializer:
+    for serializer in SERIALIZERS.values():
+        if serializer.name == name:
+            return serializer
+    raise ValueError(f"Unknown cache serializer: {name}")
+
+
+class CacheCodec:
+    """Encodes cache values as a tagged frame and decodes any serializer it knows
+
+    Payloads at or above `compress_threshold` bytes are zlib-compressed when
+    that makes them smaller. Frames with another version (or pickle bytes)
+    raise CodecError, which caches treat as a miss. Entries written as
+    `str(dict)` are read back with `ast.literal_eval` when `legacy` is set.
+    """
+
+    def __init__(self, serializer: Optional[Serializer] = None,
+                 compress_threshold: int = COMPRESS_THRESHOLD, legacy: bool = True):
+        self.serializer = serializer or MSGPACK_SERIALIZER or JSON_SERIALIZER
+        self.compress_threshold = compress_threshold
+        self.legacy = legacy
+
+    def encode(self, value: Any) -> bytes:
+        payload = self.serializer.dumps(value)
+        flags = self.serializer.id << SERIALIZER_SHIFT
+        if self.compress_threshold >= 0 and len(payload) >= self.compress_threshold:
+            compressed = zlib.compress(payload, COMPRESS_LEVEL)
+            if len(compressed) < len(payload):
+                payload = compressed
+                flags |= FLAG_COMPRESSED
+        return MAGIC + bytes((VERSION, flags)) + payload
+
+    def decode(self, data: bytes) -> Any:
+        if isinstance(data, str):
+            data = data.encode()
+        if not data.startswith(MAGIC):
+            return self._decode_legacy(data)
+        if len(data) < HEADER_SIZE:
+            raise CodecError("Truncated cache frame")
+
+        version, flags = data[1], data[2]
+        if version != VERSION:
+            raise CodecError(f"Unsupported cache frame version {version}")
+        serializer = SERIALIZERS.get(flags >> SERIALIZER_SHIFT)
+        if serializer is None:
+            raise CodecError(f"Unknown serializer id {flags >> SERIALIZER_SHIFT}")
+
+        payload = data[HEADER_SIZE:]
+        try:
+            if flags & FLAG_COMPRESSED:
+                payload = zlib.decompress(payload)
+            return serializer.loads(payload)
+        except Exception as e:
+            raise CodecError(f"Corrupt cache frame: {e}") from e
+
+    def _decode_legacy(self, data: bytes) -> Any:
+        """Unframed entries from before the codec: JSON or str(dict), never pickle"""
+        if not self.legacy or data[:1] not in (b'{', b'['):
+            raise CodecError("Unrecognized cache entry")
+        try:
+            text = data.decode()
+            try:
+                return json.loads(text)
+            except ValueError:
+                # literal_eval only builds literals, unlike the eval() it replaces
+                return ast.literal_eval(text)
+        except Exception as e:
+            raise CodecError(f"Unreadable legacy cache entry: {e}") from e
+
+
+# Global codec instance
+_codec = None
+
+def get_codec() -> CacheCodec:
+    """Get or create the process-wide codec (CACHE_SERIALIZER=json|msgpack)"""
+    global _codec
+    if _codec is None:
+        name = os.getenv('CACHE_SERIALIZER')
+        _codec = CacheCodec(get_serializer(name) if name else None)
+        logger.info(f"Cache codec: {_codec.serializer.name}, compression >= {_codec.compress_threshold} bytes")
+    return _codec
@@ -0,0 +1,183 @@
+"""
+Cache Metrics for Docu-Agent
+Per-prefix hit/miss/error counters and latency/size histograms, rendered as Prometheus text
+"""
+
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+# Histogram upper bounds (seconds / bytes); +Inf is implicit
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+COMPUTE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152)
+
+METRIC_PREFIX = "docu_cache"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition layout"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total, rows = 0, []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            rows.append(("+Inf" if bound == float('inf') else repr(bound), total))
+        return rows
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (an estimate, capped at the last bucket)"""
+        if not self.count:
+            return 0.0
+        target, total = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= target:
+                return bound
+        return self.buckets[-1]
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+
+class CacheMetrics:
+    """Client-side cache instrumentation keyed by key prefix (eligibility, rule, query, batch, ...)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (prefix, tier, result) -> count, result in hit/miss
+        self.lookups: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        # (prefix, op) -> count
+        self.errors: Dict[Tuple[str, str], int] = defaultdict(int)
+        # (prefix, op) -> latency histogram
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        # prefix -> written value sizes
+        self.sizes: Dict[str, Histogram] = {}
+        # prefix -> time spent computing values on a miss (@cached)
+        self.compute: Dict[str, Histogram] = {}
+
+    def _histogram(self, table: Dict, key, buckets: Tuple[float, ...]) -> Histogram:
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(buckets)
+        return histogram
+
+    def record_lookup(self, prefix: str, tier: str, hits: int = 0, misses: int = 0):
+        with self._lock:
+            if hits:
+                self.lookups[(prefix, tier, "hit")] += hits
+            if misses:
+                self.lookups[(prefix, tier, "miss")] += misses
+
+    def record_latency(self, prefix: str, op: str, seconds: float):
+        with self._lock:
+            self._histogram(self.latency, (prefix, op), LATENCY_BUCKETS).observe(seconds)
+
+    def record_sizes(self, prefix: str, sizes: Iterable[int]):
+        with self._lock:
+            histogram = self._histogram(self.sizes, prefix, SIZE_BUCKETS)
+            for size in sizes:
+                histogram.observe(size)
+
+    def record_error(self, prefix: str, op: str):
+        with self._lock:
+            self.errors[(prefix, op)] += 1
+
+    def record_compute(self, prefix: str, seconds: float):
+        with self._lock:
+            self._histogram(self.compute, prefix, COMPUTE_BUCKETS).observe(seconds)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per-prefix hit ratio, error count, p50/p99 get latency and mean value size"""
+        with self._lock:
+            prefixes = {key[0] for key in self.lookups} | {key[0] for key in self.errors} | set(self.sizes)
+            result = {}
+            for prefix in sorted(prefixes):
+                hits = sum(n for (p, _, r), n in self.lookups.items() if p == prefix and r == "hit")
+                misses = sum(n for (p, _, r), n in self.lookups.items() if p == prefix and r == "miss")
+                local_hits = self.lookups.get((prefix, "local", "hit"), 0)
+                get_latency = self.latency.get((prefix, "get"))
+                sizes = self.sizes.get(prefix)
+                result[prefix] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+                    "local_hits": local_hits,
+                    "errors": sum(n for (p, _), n in self.errors.items() if p == prefix),
+                    "get_p50_ms": get_latency.quantile(0.5) * 1000 if get_latency else None,
+                    "get_p99_ms": get_latency.quantile(0.99) * 1000 if get_latency else None,
+                    "mean_value_bytes": round(sizes.sum / sizes.count) if sizes and sizes.count else None
+                }
+            return result
+
+    def render(self, extra: Iterable[str] = ()) -> str:
+        """Prometheus text exposition (format 0.0.4)"""
+        lines = []
+        with self._lock:
+            name = f"{METRIC_PREFIX}_lookups_total"
+            lines += [f"# HELP {name} Cache lookups by prefix, tier and result", f"# TYPE {name} counter"]
+            for (prefix, tier, result), count in sorted(self.lookups.items()):
+                lines.append(f"{name}{_labels(prefix=prefix, tier=tier, result=result)} {count}")
+
+            name = f"{METRIC_PREFIX}_errors_total"
+            lines += [f"# HELP {name} Failed cache operations", f"# TYPE {name} counter"]
+            for (prefix, op), count in sorted(self.errors.items()):
+                lines.append(f"{name}{_labels(prefix=prefix, op=op)} {count}")
+
+            lines += self._render_histograms(
+                f"{METRIC_PREFIX}_operation_seconds", "Cache operation latency",
+                {_labels(prefix=prefix, op=op)[:-1]: h for (prefix, op), h in self.latency.items()})
+            lines += self._render_histograms(
+                f"{METRIC_PREFIX}_value_bytes", "Encoded size of written values",
+                {_labels(prefix=prefix)[:-1]: h for prefix, h in self.sizes.items()})
+            lines += self._render_histograms(
+                f"{METRIC_PREFIX}_compute_seconds", "Time spent computing values on a miss",
+                {_labels(prefix=prefix)[:-1]: h for prefix, h in self.compute.items()})
+        lines += extra
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histograms(name: str, help_text: str, histograms: Dict[str, Histogram]) -> List[str]:
+        # Keys are label sets missing their closing brace, so `le` can be appended
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for labels, histogram in sorted(histograms.items()):
+            for bound, count in histogram.cumulative():
+                lines.append(f'{name}_bucket{labels},le="{bound}"}} {count}')
+            lines.append(f"{name}_sum{labels}}} {histogram.sum}")
+            lines.append(f"{name}_count{labels}}} {histogram.count}")
+        return lines
+
+
+def render_series(name: str, help_text: str, values: Dict[str, float], label: str,
+                  kind: str = "gauge", prefix: str = METRIC_PREFIX) -> List[str]:
+    """Extra lines (e.g. local tier size, single-flight counters) to append to render()"""
+    metric = f"{prefix}_{name}"
+    lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+    for key, value in sorted(values.items()):
+        lines.append(f"{metric}{_labels(**{label: key})} {value}")
+    return lines
+
+
+
+def render_histogram_series(name: str, help_text: str, histograms: Dict[str, Histogram], label: str,
+                            prefix: str = METRIC_PREFIX) -> List[str]:
+    """Extra histogram lines, one labelled series per key, to append to render()"""
+    return CacheMetrics._render_histograms(
+        f"{prefix}_{name}", help_text, {_labels(**{label: key})[:-1]: h for key, h in histograms.items()})
+
+
+# Process-wide metrics shared by every cache client
+cache_metrics = CacheMetrics()
@@ -0,0 +1,886 @@
+"""
+Vectorized Eligibility Engine for Docu-Agent
+Compiles AdminScheme condition groups into column predicates evaluated with NumPy
+"""
+
+import bisect
+import math
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# AdminScheme condition field -> UserProfile attribute
+FIELD_MAP = {
+    'Annual Income': 'annual_income',
+    'Category': 'caste_category',
+    'Education Level': 'education_level',
+    'Gender': 'gender',
+    'State': 'state',
+    'District': 'district',
+    'Academic Year': 'academic_year',
+    'Minority Status': 'minority_status',
+    'Disability Status': 'disability_status',
+    'Institution Type': 'institution_type',
+    'Marks Percentage': 'marks_percentage',
+    'Age': 'age'
+}
+
+PROFILE_FIELDS = list(dict.fromkeys(FIELD_MAP.values()))
+FIELD_INDEX = {name: i for i, name in enumerate(PROFILE_FIELDS)}
+# Rows on unknown fields point at this slot, which is never populated
+UNKNOWN_FIELD = len(PROFILE_FIELDS)
+
+OP_EQUALS = 0
+OP_NOT_EQUALS = 1
+OP_LESS_THAN = 2
+OP_GREATER_THAN = 3
+OP_BETWEEN = 4
+OP_INCLUDES = 5
+OP_UNKNOWN = 6
+
+OPERATORS = {
+    'Equals': OP_EQUALS,
+    'Not Equals': OP_NOT_EQUALS,
+    'Less Than': OP_LESS_THAN,
+    'Greater Than': OP_GREATER_THAN,
+    'Between': OP_BETWEEN,
+    'Includes': OP_INCLUDES
+}
+
+
+def to_text(value: Any) -> str:
+    """Render a value the way JavaScript String() does"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def to_number(value: Any) -> float:
+    """Coerce a value the way JavaScript Number() does (NaN when not numeric)"""
+    if isinstance(value, (bool, int, float)):
+        return float(value)
+    text = str(value).strip()
+    if not text:
+        return 0.0
+    try:
+        return float(text)
+    except ValueError:
+        return math.nan
+
+
+def parse_between(value: Any) -> Tuple[float, float]:
+    """Split a 'min-max' condition value into numeric bounds"""
+    parts = str(value).split('-')
+    low = to_number(parts[0])
+    high = to_number(parts[1]) if len(parts) > 1 else math.nan
+    return low, high
+
+
+def js_round(value: float) -> int:
+    """Math.round semantics (half rounds up)"""
+    return int(math.floor(value + 0.5))
+
+
+def scheme_key(scheme: Dict) -> str:
+    """Stable scheme identifier (accepts both `id` and Mongo `_id`)"""
+    return str(scheme.get('id') or scheme.get('_id') or '')
+
+
+def condition_label(condition: Dict) -> str:
+    return f"{condition.get('field')} {condition.get('operator')} {condition.get('value')}"
+
+
+# Scalar reference implementation
+
+def evaluate_condition(profile: Dict, condition: Dict) -> bool:
+    """Evaluate a single condition row (mirrors evaluateCondition in routes/eligibility.js)"""
+    attr = FIELD_MAP.get(condition.get('field'))
+    user_value = profile.get(attr) if attr else None
+
+    # If user doesn't have the field, consider ineligible
+    if user_value is None:
+        return False
+
+    operator = condition.get('operator')
+    value = condition.get('value')
+
+    if operator == 'Equals':
+        return to_text(user_value).lower() == to_text(value).lower()
+    if operator == 'Not Equals':
+        return to_text(user_value).lower() != to_text(value).lower()
+    if operator == 'Less Than':
+        return to_number(user_value) < to_number(value)
+    if operator == 'Greater Than':
+        return to_number(user_value) > to_number(value)
+    if operator == 'Between':
+        low, high = parse_between(value)
+        number = to_number(user_value)
+        return number >= low and number <= high
+    if operator == 'Includes':
+        return to_text(value).lower() in to_text(user_value).lower()
+    return False
+
+
+def check_user_eligibility(profile: Dict, scheme: Dict) -> Dict:
+    """Scalar eligibility check of one profile against one scheme
+
+    Like the Node route, group evaluation stops at the first failing group
+    (Array.every), so the score counts the leading passed groups and
+    `missing` lists the failing rows of that first failed group.
+    """
+    groups = scheme.get('conditions') or []
+    if not groups:
+        return {"is_eligible": True, "missing": [], "score": 100}
+
+    matched = 0
+    missing = []
+    all_passed = True
+
+    for group in groups:
+        rows = group.get('rows') or []
+        results = [evaluate_condition(profile, row) for row in rows]
+        passed = any(results) if group.get('joiner') == 'OR' else all(results)
+
+        if not passed:
+            missing = [condition_label(row) for row, ok in zip(rows, results) if not ok]
+            all_passed = False
+            break
+        matched += 1
+
+    return {
+        "is_eligible": all_passed,
+        "missing": list(dict.fromkeys(missing)),
+        "score": js_round(matched / len(groups) * 100)
+    }
+
+
+# Compiled many-schemes evaluation (one profile against every scheme)
+
+class CompiledSchemes:
+    """Condition rows of many schemes flattened into parallel arrays"""
+
+    def __init__(self, schemes: List[Dict]):
+        self.schemes = list(schemes)
+        self.scheme_ids = [scheme_key(s) for s in self.schemes]
+        self.index = {sid: i for i, sid in enumerate(self.scheme_ids)}
+
+        row_field, row_op, row_num, row_low, row_high = [], [], [], [], []
+        row_code, row_group, self.row_labels = [], [], []
+        group_scheme, group_or, group_local, group_size = [], [], [], []
+        scheme_groups = []
+
+        self.value_lookup: Dict[str, int] = {}
+        includes_lookup: Dict[Tuple[int, str], int] = {}
+        self.includes_pairs: List[Tuple[int, str]] = []
+        includes_rows = []
+
+        for s, scheme in enumerate(self.schemes):
+            groups = scheme.get('conditions') or []
+            scheme_groups.append(len(groups))
+
+            for local, group in enumerate(groups):
+                g = len(group_scheme)
+                rows = group.get('rows') or []
+                group_scheme.append(s)
+                group_or.append(group.get('joiner') == 'OR')
+                group_local.append(local)
+                group_size.append(len(rows))
+
+                for row in rows:
+                    attr = FIELD_MAP.get(row.get('field'))
+                    field = FIELD_INDEX[attr] if attr else UNKNOWN_FIELD
+                    op = OPERATORS.get(row.get('operator'), OP_UNKNOWN)
+                    value = row.get('value')
+                    text = to_text(value).lower()
+                    low, high = parse_between(value) if op == OP_BETWEEN else (math.nan, math.nan)
+
+                    row_field.append(field)
+                    row_op.append(op)
+                    row_num.append(to_number(value))
+                    row_low.append(low)
+                    row_high.append(high)
+                    row_code.append(self.value_lookup.setdefault(text, len(self.value_lookup)))
+                    row_group.append(g)
+                    self.row_labels.append(condition_label(row))
+
+                    if op == OP_INCLUDES:
+                        pair = (field, text)
+                        if pair not in includes_lookup:
+                            includes_lookup[pair] = len(self.includes_pairs)
+                            self.includes_pairs.append(pair)
+                        includes_rows.append(includes_lookup[pair])
+
+        self.row_field = np.array(row_field, dtype=np.int64)
+        self.row_op = np.array(row_op, dtype=np.int8)
+        self.row_num = np.array(row_num, dtype=np.float64)
+        self.row_low = np.array(row_low, dtype=np.float64)
+        self.row_high = np.array(row_high, dtype=np.float64)
+        self.row_code = np.array(row_code, dtype=np.int64)
+        self.row_group = np.array(row_group, dtype=np.int64)
+        self.includes_row_pair = np.array(includes_rows, dtype=np.int64)
+        # Position of each row within the Includes rows (for masked evaluation)
+        self.includes_position = np.cumsum(self.row_op == OP_INCLUDES) - 1
+        self.op_rows = {op: np.flatnonzero(self.row_op == op) for op in OPERATORS.values()}
+
+        self.group_scheme = np.array(group_scheme, dtype=np.int64)
+        self.group_or = np.array(group_or, dtype=bool)
+        self.group_local = np.array(group_local, dtype=np.int64)
+        self.group_size = np.array(group_size, dtype=np.int64)
+        self.scheme_groups = np.array(scheme_groups, dtype=np.int64)
+        self.row_scheme = self.group_scheme[self.row_group]
+
+        # Offsets for slicing a group's rows and a scheme's groups
+        self.group_row_start = np.concatenate(([0], np.cumsum(self.group_size))).tolist()
+        self.scheme_group_start = np.concatenate(([0], np.cumsum(self.scheme_groups)))[:-1]
+        # Labels of a group whose rows all failed, the common case for missing requirements
+        self.group_labels = [
+            list(dict.fromkeys(self.row_labels[start:end]))
+            for start, end in zip(self.group_row_start[:-1], self.group_row_start[1:])
+        ]
+        self.group_unique = [len(labels) == size for labels, size in zip(self.group_labels, group_size)]
+
+        # Field dependency index: profile attribute -> schemes with a row reading it
+        self.field_schemes = {
+            attr: np.unique(self.row_scheme[self.row_field == i]) for attr, i in FIELD_INDEX.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.schemes)
+
+    def depends_on(self, fields: List[str]) -> np.ndarray:
+        """Mask of schemes whose conditions read any of the given profile fields"""
+        mask = np.zeros(len(self.schemes), dtype=bool)
+        for field in fields:
+            if field in self.field_schemes:
+                mask[self.field_schemes[field]] = True
+        return mask
+
+    @property
+    def row_count(self) -> int:
+        return len(self.row_op)
+
+    def evaluate_rows(self, profile: Dict, active: Optional[np.ndarray] = None) -> np.ndarray:
+        """Boolean pass/fail for every condition row against one profile
+
+        `active` optionally masks the rows to evaluate; the others are left failed.
+        """
+        slots = UNKNOWN_FIELD + 1
+        present = np.zeros(slots, dtype=bool)
+        user_num = np.full(slots, np.nan)
+        user_code = np.full(slots, -1, dtype=np.int64)
+        user_text: List[Optional[str]] = [None] * slots
+
+        for attr, i in FIELD_INDEX.items():
+            value = profile.get(attr)
+            if value is None:
+                continue
+            text = to_text(value).lower()
+            present[i] = True
+            user_num[i] = to_number(value)
+            user_code[i] = self.value_lookup.get(text, -1)
+            user_text[i] = text
+
+        passed = np.zeros(self.row_count, dtype=bool)
+        field = self.row_field
+        if active is None:
+            op_rows = self.op_rows
+        else:
+            op_rows = {op: rows[active[rows]] for op, rows in self.op_rows.items()}
+
+        # Unknown row values never equal an unknown user value: row codes are >= 0
+        idx = op_rows[OP_EQUALS]
+        passed[idx] = present[field[idx]] & (self.row_code[idx] == user_code[field[idx]])
+        idx = op_rows[OP_NOT_EQUALS]
+        passed[idx] = present[field[idx]] & (self.row_code[idx] != user_code[field[idx]])
+        idx = op_rows[OP_LESS_THAN]
+        passed[idx] = user_num[field[idx]] < self.row_num[idx]
+        idx = op_rows[OP_GREATER_THAN]
+        passed[idx] = user_num[field[idx]] > self.row_num[idx]
+        idx = op_rows[OP_BETWEEN]
+        number = user_num[field[idx]]
+        passed[idx] = (number >= self.row_low[idx]) & (number <= self.row_high[idx])
+
+        idx = op_rows[OP_INCLUDES]
+        if len(idx):
+            pair_pass = np.fromiter(
+                (user_text[f] is not None and needle in user_text[f] for f, needle in self.includes_pairs),
+                dtype=bool,
+                count=len(self.includes_pairs)
+            )
+            passed[idx] = pair_pass[self.includes_row_pair[self.includes_position[idx]]]
+
+        return passed
+
+    def evaluate(self, profile: Dict, pruned: Optional[np.ndarray] = None,
+                 only: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, Dict[int, List[str]]]:
+        """Evaluate one profile against every compiled scheme
+
+        Returns (eligible, score, missing) where missing maps scheme index to
+        its unmet requirements for schemes that are not fully eligible.
+        `pruned` marks schemes whose first group is known to fail entirely
+        (see SchemeIndex); their rows are skipped and resolve as failed.
+        `only` restricts evaluation to a subset of schemes; results for the
+        other schemes are meaningless and must be ignored.
+        """
+        if pruned is not None and not pruned.any():
+            pruned = None
+        if only is not None:
+            pruned = only & pruned if pruned is not None else None
+        skip = pruned
+        if only is not None:
+            skip = ~only if skip is None else (skip | ~only)
+
+        active = None if skip is None else ~skip[self.row_scheme]
+        passed = self.evaluate_rows(profile, active)
+
+        true_count = np.bincount(self.row_group, weights=passed, minlength=len(self.group_or))
+        group_pass = np.where(self.group_or, true_count > 0, true_count == self.group_size)
+
+        # Array.every semantics: only the leading passed groups count
+        first_fail = self.scheme_groups.copy()
+        failed = np.flatnonzero(~group_pass)
+        np.minimum.at(first_fail, self.group_scheme[failed], self.group_local[failed])
+
+        total = self.scheme_groups
+        eligible = first_fail == total
+        score = np.where(total == 0, 100, np.floor(first_fail / np.maximum(total, 1) * 100 + 0.5)).astype(np.int64)
+
+        missing: Dict[int, List[str]] = {}
+        ineligible = ~eligible
+        if pruned is not None:
+            # Pruned schemes failed their whole first group: no per-row work needed
+            skipped = np.flatnonzero(pruned)
+            missing = dict(zip(skipped.tolist(), [self.group_labels[g] for g in self.scheme_group_start[skipped].tolist()]))
+        if skip is not None:
+            ineligible &= ~skip
+        ineligible = np.flatnonzero(ineligible)
+        failed_groups = self.scheme_group_start[ineligible] + first_fail[ineligible]
+        whole_group = (true_count[failed_groups] == 0).tolist()
+        row_passed = passed.tolist()
+        for s, g, whole in zip(ineligible.tolist(), failed_groups.tolist(), whole_group):
+            if whole:
+                # Shared with the compiled schemes; callers must not mutate it
+                missing[s] = self.group_labels[g]
+            else:
+                start, end = self.group_row_start[g], self.group_row_start[g + 1]
+                labels = [self.row_labels[r] for r in range(start, end) if not row_passed[r]]
+                missing[s] = labels if self.group_unique[g] else list(dict.fromkeys(labels))
+
+        return eligible, score, missing
+
+
+# Attribute inverted index (prunes schemes before evaluation)
+
+INDEXED_CATEGORICAL = ('state', 'caste_category', 'academic_year')
+INDEXED_NUMERIC = 'annual_income'
+
+
+class ProfileSummary:
+    """Distinct indexed attribute values of one or more profiles"""
+
+    def __init__(self, profiles: List[Dict]):
+        self.values: Dict[str, set] = {field: set() for field in INDEXED_CATEGORICAL}
+        incomes = []
+        for profile in profiles:
+            for field in INDEXED_CATEGORICAL:
+                value = profile.get(field)
+                if value is not None:
+                    self.values[field].add(to_text(value).lower())
+            income = profile.get(INDEXED_NUMERIC)
+            if income is not None and not math.isnan(to_number(income)):
+                incomes.append(to_number(income))
+        self.income_range = (min(incomes), max(incomes)) if incomes else None
+
+
+def _threshold(entry: Tuple[float, str]) -> float:
+    return entry[0]
+
+
+class SchemeIndex:
+    """Inverted index over the first condition group of each scheme
+
+    A scheme is indexed when every row of its first group is an Equals /
+    Not Equals on state, category or academic year, or a Less Than /
+    Greater Than / Between on annual income. If none of those rows can pass
+    for a profile, the first group fails outright, so the scheme scores 0
+    with that group's rows as missing requirements and needs no evaluation.
+    """
+
+    def __init__(self):
+        self.indexed: set = set()
+        self.equals: Dict[str, Dict[str, set]] = {f: {} for f in INDEXED_CATEGORICAL}
+        self.not_equals: Dict[str, Dict[str, set]] = {f: {} for f in INDEXED_CATEGORICAL}
+        self.not_equals_any: Dict[str, set] = {f: set() for f in INDEXED_CATEGORICAL}
+        # Distinct Not Equals values per scheme: only a scheme with a single one can fail them all
+        self.not_equals_count: Dict[str, Dict[str, int]] = {f: {} for f in INDEXED_CATEGORICAL}
+        # Sorted (threshold, scheme_id) pairs and unsorted (low, high, scheme_id) ranges
+        self.less_than: List[Tuple[float, str]] = []
+        self.greater_than: List[Tuple[float, str]] = []
+        self.between: List[Tuple[float, float, str]] = []
+        self._entries: Dict[str, List[Tuple]] = {}
+
+        self.lookups = 0
+        self.considered = 0
+        self.pruned = 0
+
+    def __len__(self) -> int:
+        return len(self.indexed)
+
+    @staticmethod
+    def _index_entries(scheme: Dict) -> Optional[List[Tuple]]:
+        """Index entries for the scheme's first group, or None if it isn't fully indexable"""
+        groups = scheme.get('conditions') or []
+        if not groups:
+            return None
+        rows = groups[0].get('rows') or []
+        if not rows:
+            return None
+
+        entries = []
+        for row in rows:
+            attr = FIELD_MAP.get(row.get('field'))
+            op = OPERATORS.get(row.get('operator'), OP_UNKNOWN)
+            value = row.get('value')
+
+            if attr in INDEXED_CATEGORICAL and op in (OP_EQUALS, OP_NOT_EQUALS):
+                entries.append((op, attr, to_text(value).lower()))
+            elif attr == INDEXED_NUMERIC and op in (OP_LESS_THAN, OP_GREATER_THAN):
+                # A NaN threshold never passes, so the row contributes no posting
+                threshold = to_number(value)
+                if not math.isnan(threshold):
+                    entries.append((op, attr, threshold))
+            elif attr == INDEXED_NUMERIC and op == OP_BETWEEN:
+                low, high = parse_between(value)
+                if not (math.isnan(low) or math.isnan(high)):
+                    entries.append((op, attr, (low, high)))
+            elif attr is None or op == OP_UNKNOWN:
+                # Unknown fields and operators always fail
+                continue
+            else:
+                return None
+        return entries
+
+    def add(self, scheme: Dict):
+        sid = scheme_key(scheme)
+        self.remove(sid)
+        entries = self._index_entries(scheme)
+        if entries is None:
+            return
+
+        for op, field, value in entries:
+            if op == OP_EQUALS:
+                self.equals[field].setdefault(value, set()).add(sid)
+            elif op == OP_NOT_EQUALS:
+                postings = self.not_equals[field].setdefault(value, set())
+                if sid not in postings:
+                    postings.add(sid)
+                    self.not_equals_count[field][sid] = self.not_equals_count[field].get(sid, 0) + 1
+                self.not_equals_any[field].add(sid)
+            elif op == OP_LESS_THAN:
+                bisect.insort(self.less_than, (value, sid), key=_threshold)
+            elif op == OP_GREATER_THAN:
+                bisect.insort(self.greater_than, (value, sid), key=_threshold)
+            else:
+                self.between.append((value[0], value[1], sid))
+        self.indexed.add(sid)
+        self._entries[sid] = entries
+
+    def remove(self, scheme_id: str):
+        entries = self._entries.pop(scheme_id, None)
+        if entries is None:
+            return
+
+        for op, field, value in entries:
+            if op == OP_EQUALS:
+                self.equals[field][value].discard(scheme_id)
+            elif op == OP_NOT_EQUALS:
+                self.not_equals[field][value].discard(scheme_id)
+                self.not_equals_any[field].discard(scheme_id)
+                self.not_equals_count[field].pop(scheme_id, None)
+            elif op == OP_LESS_THAN:
+                self.less_than.remove((value, scheme_id))
+            elif op == OP_GREATER_THAN:
+                self.greater_than.remove((value, scheme_id))
+        self.between = [entry for entry in self.between if entry[2] != scheme_id]
+        self.indexed.discard(scheme_id)
+
+    def _passing(self, summary: ProfileSummary) -> set:
+        """Indexed schemes with at least one first-group row that can pass"""
+        passing = set()
+        for field in INDEXED_CATEGORICAL:
+            values = summary.values[field]
+            for value in values:
+                passing |= self.equals[field].get(value, set())
+            if len(values) > 1:
+                passing |= self.not_equals_any[field]
+            elif len(values) == 1:
+                # Every Not Equals row fails only if the scheme's one distinct value is the profile's
+                counts = self.not_equals_count[field]
+                failing = {sid for sid in self.not_equals[field].get(next(iter(values)), ()) if counts[sid] == 1}
+                passing |= self.not_equals_any[field] - failing
+
+        if summary.income_range is not None:
+            low, high = summary.income_range
+            # Less Than passes for thresholds above the lowest income, Greater Than below the highest
+            start = bisect.bisect_right(self.less_than, low, key=_threshold)
+            passing.update(sid for _, sid in self.less_than[start:])
+            stop = bisect.bisect_left(self.greater_than, high, key=_threshold)
+            passing.update(sid for _, sid in self.greater_than[:stop])
+            passing.update(sid for b_low, b_high, sid in self.between if b_low <= high and b_high >= low)
+        return passing
+
+    def prune(self, profiles: List[Dict], total: int) -> set:
+        """Ids of indexed schemes that no profile in `profiles` can satisfy"""
+        pruned = self.indexed - self._passing(ProfileSummary(profiles))
+        self.lookups += 1
+        self.considered += total
+        self.pruned += len(pruned)
+        return pruned
+
+    def copy(self) -> "SchemeIndex":
+        """Independent copy of the postings (counters start at zero)"""
+        other = SchemeIndex()
+        other.indexed = set(self.indexed)
+        for field in INDEXED_CATEGORICAL:
+            other.equals[field] = {value: set(ids) for value, ids in self.equals[field].items()}
+            other.not_equals[field] = {value: set(ids) for value, ids in self.not_equals[field].items()}
+            other.not_equals_any[field] = set(self.not_equals_any[field])
+            other.not_equals_count[field] = dict(self.not_equals_count[field])
+        other.less_than = list(self.less_than)
+        other.greater_than = list(self.greater_than)
+        other.between = list(self.between)
+        other._entries = dict(self._entries)
+        return other
+
+    def merge_stats(self, other: "SchemeIndex"):
+        """Add the counters of a copy that served lookups elsewhere"""
+        self.lookups += other.lookups
+        self.considered += other.considered
+        self.pruned += other.pruned
+
+    def get_stats(self) -> Dict:
+        return {
+            "indexed_schemes": len(self.indexed),
+            "lookups": self.lookups,
+            "schemes_considered": self.considered,
+            "schemes_pruned": self.pruned,
+            "pruning_ratio": round(self.pruned / self.considered, 4) if self.considered else 0.0
+        }
+
+
+# Columnar many-profiles evaluation (many profiles against one scheme)
+
+class ProfileColumns:
+    """Columnar snapshot of profiles: numeric values and lowercase string codes per field"""
+
+    def __init__(self, profiles: List[Dict]):
+        self.user_ids = [str(p.get('user_id')) for p in profiles]
+        self.size = len(profiles)
+        self.numeric: Dict[str, np.ndarray] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        self.vocab: Dict[str, List[str]] = {}
+        self.lookup: Dict[str, Dict[str, int]] = {}
+
+        for field in PROFILE_FIELDS:
+            lookup: Dict[str, int] = {}
+            numbers: List[float] = []
+            # Text and number conversion runs once per distinct raw value.
+            # Keys carry the type so True, 1 and 1.0 (equal hashes) stay apart.
+            seen: Dict[Tuple[type, Any], int] = {(type(None), None): -1}
+            codes = []
+            for profile in profiles:
+                value = profile.get(field)
+                key = (value.__class__, value)
+                code = seen.get(key)
+                if code is None:
+                    code = lookup.setdefault(to_text(value).lower(), len(lookup))
+                    if code == len(numbers):
+                        numbers.append(to_number(value))
+                    seen[key] = code
+                codes.append(code)
+
+            self.codes[field] = np.array(codes, dtype=np.int32)
+            # Trailing NaN is picked up by the -1 code of missing values
+            self.numeric[field] = np.array(numbers + [math.nan])[self.codes[field]]
+            self.lookup[field] = lookup
+            self.vocab[field] = list(lookup)
+
+    def row_mask(self, condition: Dict) -> np.ndarray:
+        """Boolean vector of profiles passing one condition row"""
+        attr = FIELD_MAP.get(condition.get('field'))
+        op = OPERATORS.get(condition.get('operator'), OP_UNKNOWN)
+        if not attr or op == OP_UNKNOWN:
+            return np.zeros(self.size, dtype=bool)
+
+        value = condition.get('value')
+        codes = self.codes[attr]
+        numeric = self.numeric[attr]
+
+        if op in (OP_EQUALS, OP_NOT_EQUALS):
+            code = self.lookup[attr].get(to_text(value).lower(), -2)
+            if op == OP_EQUALS:
+                return codes == code
+            return (codes >= 0) & (codes != code)
+        if op == OP_LESS_THAN:
+            return numeric < to_number(value)
+        if op == OP_GREATER_THAN:
+            return numeric > to_number(value)
+        if op == OP_BETWEEN:
+            low, high = parse_between(value)
+            return (numeric >= low) & (numeric <= high)
+
+        # Includes: test the needle once per distinct value, then gather by code.
+        # The trailing False absorbs the -1 code of missing values.
+        needle = to_text(value).lower()
+        vocab = self.vocab[attr]
+        vocab_pass = np.zeros(len(vocab) + 1, dtype=bool)
+        vocab_pass[:len(vocab)] = np.fromiter((needle in v for v in vocab), dtype=bool, count=len(vocab))
+        return vocab_pass[codes]
+
+
+class UserBatchResult:
+    """Per-profile outcome of one scheme evaluated over a ProfileColumns snapshot"""
+
+    def __init__(self, scheme: Dict, eligible: np.ndarray, score: np.ndarray,
+                 first_fail: np.ndarray, row_masks: List[List[np.ndarray]]):
+        self.scheme = scheme
+        self.eligible = eligible
+        self.score = score
+        self.first_fail = first_fail
+        self.row_masks = row_masks
+
+    def missing(self, i: int) -> List[str]:
+        """Unmet requirements of profile `i` (first failed group, as in the Node route)"""
+        if self.eligible[i]:
+            return []
+        group = int(self.first_fail[i])
+        rows = self.scheme['conditions'][group].get('rows') or []
+        labels = [condition_label(row) for row, mask in zip(rows, self.row_masks[group]) if not mask[i]]
+        return list(dict.fromkeys(labels))
+
+
+def evaluate_users(columns: ProfileColumns, scheme: Dict) -> UserBatchResult:
+    """Evaluate every profile in a snapshot against one scheme"""
+    groups = scheme.get('conditions') or []
+    n = columns.size
+    if not groups:
+        return UserBatchResult(scheme, np.ones(n, dtype=bool), np.full(n, 100, dtype=np.int64),
+                               np.zeros(n, dtype=np.int64), [])
+
+    row_masks = []
+    group_pass = np.empty((len(groups), n), dtype=bool)
+    for g, group in enumerate(groups):
+        masks = [columns.row_mask(row) for row in group.get('rows') or []]
+        row_masks.append(masks)
+        if not masks:
+            group_pass[g] = group.get('joiner') != 'OR'
+        elif group.get('joiner') == 'OR':
+            group_pass[g] = np.logical_or.reduce(masks)
+        else:
+            group_pass[g] = np.logical_and.reduce(masks)
+
+    # Array.every semantics: count leading passed groups per profile
+    first_fail = np.logical_and.accumulate(group_pass, axis=0).sum(axis=0)
+    total = len(groups)
+    eligible = first_fail == total
+    score = np.floor(first_fail / total * 100 + 0.5).astype(np.int64)
+    return UserBatchResult(scheme, eligible, score, first_fail, row_masks)
+
+
+def evaluate_matrix(columns: ProfileColumns, schemes: List[Dict]) -> Iterator[UserBatchResult]:
+    """Evaluate every profile against every scheme, one scheme at a time"""
+    for scheme in schemes:
+        yield evaluate_users(columns, scheme)
+
+
+def summarize_users(columns: ProfileColumns, schemes: List[Dict], pruned: Optional[set] = None) -> List[Dict]:
+    """Compact per-profile breakdown of a snapshot against many schemes
+
+    Schemes in `pruned` fail for every profile in the snapshot and are skipped.
+    """
+    eligible: List[List[str]] = [[] for _ in range(columns.size)]
+    partial: List[List[str]] = [[] for _ in range(columns.size)]
+
+    if pruned:
+        evaluated = [scheme for scheme in schemes if scheme_key(scheme) not in pruned]
+    else:
+        evaluated = schemes
+
+    for scheme, result in zip(evaluated, evaluate_matrix(columns, evaluated)):
+        sid = scheme_key(scheme)
+        for i in np.flatnonzero(result.eligible).tolist():
+            eligible[i].append(sid)
+        for i in np.flatnonzero(~result.eligible & (result.score > 50)).tolist():
+            partial[i].append(sid)
+
+    return [
+        {
+            "user_id": user_id,
+            "eligible_count": len(eligible[i]),
+            "partial_count": len(partial[i]),
+            "not_eligible_count": len(schemes) - len(eligible[i]) - len(partial[i]),
+            "eligible_scheme_ids": eligible[i],
+            "partial_scheme_ids": partial[i]
+        }
+        for i, user_id in enumerate(columns.user_ids)
+    ]
+
+
+# Response shaping
+
+def scheme_summary(scheme: Dict, eligible: bool, score: int, missing: List[str]) -> Dict:
+    """Scheme entry in the shape returned by GET /api/v2/eligibility/:userId"""
+    name = scheme.get('schemeName') or scheme.get('name')
+    if eligible:
+        reason = 'You meet all eligibility criteria'
+    elif score > 50:
+        reason = 'You partially meet the eligibility criteria'
+    else:
+        reason = 'You do not meet the eligibility criteria'
+
+    return {
+        "id": scheme_key(scheme),
+        "name": name,
+        "scheme_name": name,
+        "description": scheme.get('description'),
+        "score": int(score),
+        "reason": reason,
+        "missing": missing
+    }
+
+
+def build_eligibility_response(outcomes: List[Tuple[bool, Dict]]) -> Dict:
+    """Split (is_eligible, scheme summary) pairs into the eligible/partial/ineligible breakdown"""
+    eligible_schemes = []
+    partial_match_schemes = []
+    not_eligible_schemes = []
+
+    for is_eligible, summary in outcomes:
+        if is_eligible:
+            eligible_schemes.append(summary)
+        elif summary["score"] > 50:
+            partial_match_schemes.append(summary)
+        else:
+            not_eligible_schemes.append(summary)
+
+    return {
+        "eligible_count": len(eligible_schemes),
+        "partial_count": len(partial_match_schemes),
+        "not_eligible_count": len(not_eligible_schemes),
+        "eligible_schemes": eligible_schemes,
+        "partial_match_schemes": partial_match_schemes,
+        "not_eligible_schemes": not_eligible_schemes
+    }
+
+
+class SchemeRegistry:
+    """In-process scheme store with lazily recompiled condition arrays"""
+
+    def __init__(self):
+        self._schemes: Dict[str, Dict] = {}
+        self._compiled: Optional[CompiledSchemes] = None
+        self.index = SchemeIndex()
+        # Bumped on every change so dependents (worker pools, caches) can detect staleness
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._schemes)
+
+    def upsert(self, scheme: Dict) -> str:
+        sid = scheme_key(scheme)
+        if not sid:
+            raise ValueError("Scheme requires an id")
+        self._schemes[sid] = scheme
+        self.index.add(scheme)
+        self._compiled = None
+        self.version += 1
+        return sid
+
+    def remove(self, scheme_id: str) -> bool:
+        removed = self._schemes.pop(scheme_id, None) is not None
+        if removed:
+            self.index.remove(scheme_id)
+            self._compiled = None
+            self.version += 1
+        return removed
+
+    def get(self, scheme_id: str) -> Optional[Dict]:
+        return self._schemes.get(scheme_id)
+
+    def all(self) -> List[Dict]:
+        return list(self._schemes.values())
+
+    def compiled(self) -> CompiledSchemes:
+        if self._compiled is None:
+            self._compiled = CompiledSchemes(self.all())
+            logger.info(f"Compiled {len(self._compiled)} schemes ({self._compiled.row_count} condition rows)")
+        return self._compiled
+
+    def snapshot(self) -> "SchemeRegistry":
+        """Frozen copy for evaluation off the event loop
+
+        Shares the (immutable) compiled arrays and copies the index, so
+        upserts and removals on the live registry cannot change it mid-use.
+        Fold its index counters back with index.merge_stats().
+        """
+        snap = SchemeRegistry()
+        snap._schemes = dict(self._schemes)
+        snap._compiled = self.compiled()
+        snap.index = self.index.copy()
+        snap.version = self.version
+        return snap
+
+    def _pruned_mask(self, compiled: CompiledSchemes, profile: Dict) -> np.ndarray:
+        pruned = np.zeros(len(compiled), dtype=bool)
+        pruned_ids = self.index.prune([profile], len(compiled))
+        pruned[[compiled.index[sid] for sid in pruned_ids]] = True
+        return pruned
+
+    def check_user(self, profile: Dict, scheme_ids: Optional[List[str]] = None) -> Dict:
+        """Eligibility breakdown of one profile against all (or the selected) schemes"""
+        compiled = self.compiled()
+        eligible, score, missing = compiled.evaluate(profile, self._pruned_mask(compiled, profile))
+
+        if scheme_ids is None:
+            indices = range(len(compiled))
+        else:
+            indices = [compiled.index[sid] for sid in scheme_ids if sid in compiled.index]
+
+        outcomes = [
+            (bool(eligible[i]), scheme_summary(compiled.schemes[i], bool(eligible[i]), int(score[i]), missing.get(i, [])))
+            for i in indices
+        ]
+        result = build_eligibility_response(outcomes)
+        result["scheme_version"] = self.version
+        return result
+
+    def reevaluate(self, profile: Dict, result: Dict, changed_fields: List[str]) -> Tuple[Dict, int]:
+        """Patch a full check_user result after `changed_fields` changed on the profile
+
+        Only schemes reading a changed field are re-evaluated; every other
+        scheme keeps its cached summary. Returns (patched result, schemes re-evaluated).
+        """
+        compiled = self.compiled()
+        only = compiled.depends_on(changed_fields)
+        affected = np.flatnonzero(only).tolist()
+        if not affected:
+            return result, 0
+
+        eligible, score, missing = compiled.evaluate(profile, self._pruned_mask(compiled, profile), only)
+
+        outcomes: Dict[str, Tuple[bool, Dict]] = {}
+        for key in ("eligible_schemes", "partial_match_schemes", "not_eligible_schemes"):
+            for summary in result.get(key, []):
+                outcomes[summary["id"]] = (key == "eligible_schemes", summary)
+        for i in affected:
+            outcomes[compiled.scheme_ids[i]] = (
+                bool(eligible[i]),
+                scheme_summary(compiled.schemes[i], bool(eligible[i]), int(score[i]), missing.get(i, []))
+            )
+
+        patched = build_eligibility_response([outcomes[sid] for sid in compiled.scheme_ids if sid in outcomes])
+        return {**result, **patched}, len(affected)
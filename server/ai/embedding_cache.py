@@ -0,0 +1,159 @@
+"""
+Embedding Cache for Docu-Agent
+Content-addressed chunk embeddings: only chunks not seen before are sent to the model, in batches
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from local_embeddings import Embeddings, HashingEmbeddings
+from prompt_packing import estimate_tokens
+from redis_cache import get_redis_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_PREFIX = "embedding:"
+# Scheme rulebooks are reissued yearly, mostly unchanged; keep vectors past the next revision
+EMBEDDING_TTL = int(os.getenv('EMBEDDING_TTL', 400 * 86400))
+# Texts and estimated tokens per embedding request (OpenAI accepts 2048 inputs, ~8k tokens each)
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 128))
+EMBEDDING_BATCH_TOKENS = int(os.getenv('EMBEDDING_BATCH_TOKENS', 60000))
+# openai (OpenAIEmbeddings) or hashing (local_embeddings.HashingEmbeddings, offline)
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'openai')
+# Process-local vectors when Redis is unavailable
+LOCAL_MAX_ENTRIES = 20000
+
+
+def embedding_model_id(embeddings: Any) -> str:
+    """Identifies the vectors an embeddings object produces (cache and index keys depend on it)"""
+    model_id = getattr(embeddings, "model_id", None)
+    if model_id:
+        return model_id
+    model = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None)
+    return f"{type(embeddings).__name__}:{model}"
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def embedding_key(model_id: str, text: str) -> str:
+    return f"{EMBEDDING_PREFIX}{model_id}:{chunk_hash(text)}"
+
+
+def make_batches(texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE,
+                 batch_tokens: int = EMBEDDING_BATCH_TOKENS) -> List[List[str]]:
+    """Consecutive groups within both the per-request text count and token limits"""
+    batches, current, used = [], [], 0
+    for text in texts:
+        cost = estimate_tokens(text)
+        if current and (len(current) >= batch_size or used + cost > batch_tokens):
+            batches.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def get_embedding_backend(name: str = None, api_key: str = None) -> Any:
+    """Embeddings backend by name (EMBEDDING_BACKEND by default)"""
+    name = (name or EMBEDDING_BACKEND).lower()
+    if name == 'hashing':
+        return HashingEmbeddings(int(os.getenv('HASHING_EMBEDDING_DIM', 512)))
+    if name == 'openai':
+        from langchain.embeddings import OpenAIEmbeddings
+        return OpenAIEmbeddings(openai_api_key=api_key or os.getenv('OPENAI_API_KEY', ''))
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain Embeddings wrapper that embeds each distinct chunk at most once per model
+
+    Vectors are stored in Redis as raw float32 under embedding:{model}:{sha256},
+    so an unchanged chunk in a revised rulebook (or the same chunk in another
+    rulebook) is a cache hit. Misses are deduplicated and embedded in batches.
+    Without Redis a bounded in-process map is used instead.
+    """
+
+    def __init__(self, backend: Any, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 batch_tokens: int = EMBEDDING_BATCH_TOKENS, ttl: int = EMBEDDING_TTL):
+        self.backend = backend
+        self.model_id = embedding_model_id(backend)
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.ttl = ttl
+        self._local: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "embedded": 0, "batches": 0}
+
+    def _read(self, keys: List[str]) -> List[Optional[bytes]]:
+        client = get_redis_cache().client
+        if client:
+            try:
+                return client.mget(keys)
+            except Exception as e:
+                logger.warning(f"Embedding cache read failed: {e}")
+        with self._lock:
+            return [self._local.get(key) for key in keys]
+
+    def _write(self, items: Dict[str, bytes]):
+        client = get_redis_cache().client
+        if client:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for key, data in items.items():
+                    pipe.set(key, data, ex=self.ttl)
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+        with self._lock:
+            self._local.update(items)
+            while len(self._local) > LOCAL_MAX_ENTRIES:
+                self._local.popitem(last=False)
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        if hasattr(self.backend, "embed"):
+            return np.asarray(self.backend.embed(texts), dtype=np.float32)
+        return np.asarray(self.backend.embed_documents(texts), dtype=np.float32)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), dim) float32 matrix, embedding only texts missing from the cache"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = [embedding_key(self.model_id, text) for text in texts]
+        unique = list(dict.fromkeys(keys))
+        vectors = {key: np.frombuffer(data, dtype=np.float32)
+                   for key, data in zip(unique, self._read(unique)) if data}
+        self.stats["hits"] += len(vectors)
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        self.stats["misses"] += len(missing)
+        if missing:
+            fresh = {}
+            for batch in make_batches(list(missing.values()), self.batch_size, self.batch_tokens):
+                fresh.update(zip((embedding_key(self.model_id, text) for text in batch), self._embed_batch(batch)))
+                self.stats["batches"] += 1
+            self.stats["embedded"] += len(fresh)
+            self._write({key: vector.tobytes() for key, vector in fresh.items()})
+            vectors.update(fresh)
+
+        return np.vstack([vectors[key] for key in keys])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        # Queries are rarely repeated verbatim; skip the cache round trip
+        return list(self.backend.embed_query(text))
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "model": self.model_id}
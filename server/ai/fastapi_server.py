@@ -3,17 +3,43 @@ Fast API Setup for Docu-Agent
 High-performance async eligibility checker and rule engine
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
+import asyncio
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 import uvicorn
-import aioredis
 import os
 from datetime import datetime
+import json
 import logging
 
+from answer_cache import AsyncAnswerCache
+from cache_metrics import cache_metrics
+from eligibility_engine import SchemeRegistry, condition_label
+from gemini_integration import GeminiProcessor
+from llm_resilience import model_metrics
+from population_index import PopulationIndex
+from batch_eligibility import (
+    BatchExecutor,
+    get_progress,
+    read_results_page,
+    register_batch,
+    results_key,
+    run_batch,
+    stream_progress,
+    stream_results,
+)
+from rulebook_ingestion import IngestExecutor, get_batch, get_job, run_ingest_job, submit_sources
+from redis_cache import (
+    AsyncRuleCache,
+    cache_namespaces,
+    close_async_redis,
+    connect_async_redis,
+    get_async_redis_cache,
+)
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -33,41 +59,139 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Redis connection
+# Redis connection (shared asyncio pool, opened at startup)
 redis_client = None
 
+# Cached results go through the same pool, codec and local tier
+result_cache = get_async_redis_cache()
+rule_answers = AsyncAnswerCache("rules", ttl=7200)
+
+# Rule extraction (results are content-addressed in the rule store)
+gemini_processor = GeminiProcessor()
+
+# Compiled scheme rules used by the eligibility endpoints
+scheme_registry = SchemeRegistry()
+
+# Columnar snapshot of stored profiles for reverse (scheme -> users) queries
+population_index: Optional[PopulationIndex] = None
+# Upper bound on cached results refreshed per reverse query with warm=true
+WARM_LIMIT = int(os.getenv('ELIGIBILITY_WARM_LIMIT', 10000))
+
+# Process pool for batch eligibility (created lazily on first batch)
+batch_executor = BatchExecutor()
+# Process pool for rulebook PDF ingestion (created lazily on first job)
+ingest_executor = IngestExecutor()
+# Running ingestion jobs (held so the tasks are not garbage collected mid-run)
+ingest_tasks = set()
+
+# Keys per SCAN step and per MGET when reading every key under a prefix
+SCAN_BATCH = 1000
+
+async def scan_values(pattern: str, batch: int = SCAN_BATCH):
+    """Yield lists of values of keys matching `pattern`, read with SCAN and batched MGET
+
+    SCAN may return a key more than once while the keyspace is rehashed;
+    each key is read once.
+    """
+    seen = set()
+    pending = []
+    async for key in redis_client.scan_iter(match=pattern, count=batch):
+        if key in seen:
+            continue
+        seen.add(key)
+        pending.append(key)
+        if len(pending) >= batch:
+            yield await redis_client.mget(*pending)
+            pending = []
+    if pending:
+        yield await redis_client.mget(*pending)
+
 @app.on_event("startup")
 async def startup_event():
     global redis_client
+    redis_client = await connect_async_redis()
+    await load_schemes()
+
+async def load_schemes():
+    """Restore scheme definitions persisted under scheme:{scheme_id}"""
+    if not redis_client:
+        return
     try:
-        redis_client = await aioredis.create_redis_pool(
-            f"redis://{os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', 6379)}",
-            encoding="utf8"
-        )
-        logger.info("✓ Redis connected")
+        async for values in scan_values("scheme:*"):
+            for data in values:
+                if data:
+                    scheme_registry.upsert(json.loads(data))
+        logger.info(f"✓ Loaded {len(scheme_registry)} schemes")
     except Exception as e:
-        logger.warning(f"Redis connection failed: {e}")
-        redis_client = None
+        logger.warning(f"Scheme load failed: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     global redis_client
-    if redis_client:
-        redis_client.close()
-        await redis_client.wait_closed()
+    batch_executor.shutdown()
+    # Cancelled ingestion jobs are marked failed, so a resubmission starts them over
+    for task in ingest_tasks:
+        task.cancel()
+    await asyncio.gather(*ingest_tasks, return_exceptions=True)
+    ingest_executor.shutdown()
+    await close_async_redis()
+    redis_client = None
 
 # Models
-class UserProfile(BaseModel):
-    user_id: str
+class ProfileUpdate(BaseModel):
     annual_income: Optional[int] = None
     caste_category: Optional[str] = None
     state: Optional[str] = None
     district: Optional[str] = None
     academic_year: Optional[str] = None
+    gender: Optional[str] = None
+    education_level: Optional[str] = None
+    minority_status: Optional[str] = None
+    disability_status: Optional[str] = None
+    institution_type: Optional[str] = None
+    marks_percentage: Optional[float] = None
+    age: Optional[int] = None
+
+class UserProfile(ProfileUpdate):
+    user_id: str
 
 class EligibilityQuery(BaseModel):
     user_id: str
     scheme_ids: Optional[List[str]] = None
+    profile: Optional[UserProfile] = None
+
+class ConditionRow(BaseModel):
+    id: int
+    field: str
+    operator: str
+    value: str
+
+class ConditionGroup(BaseModel):
+    id: int
+    joiner: str = "AND"
+    rows: List[ConditionRow] = []
+
+class SchemeDefinition(BaseModel):
+    """AdminScheme fields used for eligibility evaluation"""
+    id: str
+    schemeName: str
+    description: Optional[str] = None
+    state: Optional[str] = None
+    region: Optional[str] = None
+    status: str = "Draft"
+    conditions: List[ConditionGroup] = []
+
+class RuleSource(BaseModel):
+    """Rulebook text to extract and compile into a scheme's conditions"""
+    text: str
+    schemeName: Optional[str] = None
+
+class TranslationRequest(BaseModel):
+    texts: List[str]
+
+class IngestRequest(BaseModel):
+    """Rulebook PDFs to ingest: paths on this server or http(s) URLs"""
+    sources: List[str]
 
 class RuleQuery(BaseModel):
     query: str
@@ -90,29 +214,35 @@ async def check_eligibility(query: EligibilityQuery):
     """Fast eligibility check with Redis caching"""
     try:
         cache_key = f"eligibility:{query.user_id}"
+        # Only full (unfiltered) results for the stored profile are read from or written to the cache;
+        # a submitted profile may be hypothetical and always wins
+        use_cache = redis_client is not None and query.scheme_ids is None and query.profile is None
         
         # Check cache
-        if redis_client:
-            cached = await redis_client.get(cache_key)
-            if cached:
+        if use_cache:
+            cached = await result_cache.get(cache_key)
+            if cached is not None:
                 logger.info(f"Cache hit for {query.user_id}")
-                return JSONResponse(content=eval(cached))
+                return JSONResponse(content=cached)
         
-        # Mock eligibility check (replace with real logic)
-        result = {
+        profile = query.profile.model_dump() if query.profile else await load_profile(query.user_id)
+        if profile is None:
+            raise HTTPException(status_code=404, detail="No stored profile for user; include the profile")
+        
+        result = scheme_registry.check_user(profile, query.scheme_ids)
+        result.update({
             "user_id": query.user_id,
-            "eligible_schemes": 5,
-            "partial_schemes": 3,
-            "ineligible_schemes": 2,
             "cached": False,
             "processed_at": datetime.utcnow().isoformat()
-        }
+        })
         
         # Cache result for 1 hour
-        if redis_client:
-            await redis_client.setex(cache_key, 3600, str(result))
+        if use_cache:
+            await result_cache.set(cache_key, result, 3600)
         
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Eligibility check failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -122,44 +252,339 @@ async def batch_eligibility(users: List[UserProfile], background_tasks: Backgrou
     """Batch eligibility check for multiple users"""
     try:
         task_id = f"batch_{datetime.utcnow().timestamp()}"
+        if redis_client:
+            await register_batch(redis_client, task_id, len(users))
         background_tasks.add_task(process_batch, users, task_id)
         
         return {
             "task_id": task_id,
             "status": "processing",
             "users_count": len(users),
-            "check_url": f"/v2/eligibility/batch/{task_id}"
+            "check_url": f"/v2/eligibility/batch/{task_id}",
+            "progress_url": f"/v2/eligibility/batch/{task_id}/progress"
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 async def process_batch(users: List[UserProfile], task_id: str):
-    """Background task for batch processing"""
+    """Background task for batch processing (chunks run on the process pool)"""
     if not redis_client:
+        logger.warning(f"Batch {task_id} skipped: Redis not available")
         return
     
-    results = []
-    for user in users:
-        results.append({
-            "user_id": user.user_id,
-            "eligible": True,
-            "score": 0.85
-        })
+    try:
+        await run_batch(redis_client, scheme_registry, batch_executor, users, task_id)
+    except Exception as e:
+        logger.error(f"Batch {task_id} failed: {e}")
+        await redis_client.hset(f"batch:{task_id}", mapping={"status": "failed", "error": str(e)})
+
+@app.get("/v2/eligibility/batch/{task_id}")
+async def batch_results(
+    task_id: str,
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """Batch results: a cursor-paginated JSON page, or every row from `cursor` as NDJSON"""
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis not available")
+    
+    progress = await get_progress(redis_client, task_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    running = progress["status"] in ("queued", "processing")
+    
+    if format == "ndjson":
+        # Snapshot the end so the next cursor is known before streaming starts
+        end = await redis_client.llen(results_key(task_id))
+        return StreamingResponse(
+            stream_results(redis_client, task_id, cursor, end),
+            media_type="application/x-ndjson",
+            headers={"X-Next-Cursor": str(max(cursor, end)), "X-Batch-Status": progress["status"]}
+        )
+    
+    page = await read_results_page(redis_client, task_id, cursor, limit)
+    envelope = {
+        **progress,
+        "cursor": cursor,
+        "count": page["count"],
+        "next_cursor": page["next_cursor"],
+        "has_more": running or page["next_cursor"] < page["available"]
+    }
+    # Stored rows are already JSON; splice them in rather than decoding and re-encoding
+    body = json.dumps(envelope)[:-1] + ', "rows": ' + page["rows_json"] + "}"
+    return Response(content=body, media_type="application/json")
+
+@app.get("/v2/eligibility/batch/{task_id}/progress")
+async def batch_progress(task_id: str, stream: bool = False):
+    """Poll batch progress, or stream progress events and partial results as NDJSON"""
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis not available")
+    
+    if stream:
+        return StreamingResponse(stream_progress(redis_client, task_id), media_type="application/x-ndjson")
+    
+    progress = await get_progress(redis_client, task_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return progress
+
+# Reverse Eligibility Endpoints
+@app.post("/v2/eligibility/population/snapshot")
+async def build_population_snapshot():
+    """Rebuild the columnar profile snapshot from stored profiles"""
+    global population_index
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis not available")
+    
+    profiles = []
+    async for values in scan_values("profile:*"):
+        profiles.extend(json.loads(data) for data in values if data)
+    
+    # Index construction is CPU-bound; keep it off the event loop
+    loop = asyncio.get_running_loop()
+    population_index = await loop.run_in_executor(None, PopulationIndex.from_profiles, profiles)
+    return {"status": "built", **population_index.get_stats()}
+
+@app.get("/v2/eligibility/scheme/{scheme_id}/users")
+async def scheme_eligible_users(
+    scheme_id: str,
+    background_tasks: BackgroundTasks,
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    warm: bool = False
+):
+    """Users in the profile snapshot who qualify for a scheme"""
+    # A rebuild may replace the snapshot while the query runs; answer from one snapshot
+    index = population_index
+    if index is None:
+        raise HTTPException(status_code=409, detail="No population snapshot; POST /v2/eligibility/population/snapshot")
+    scheme = scheme_registry.get(scheme_id)
+    if scheme is None:
+        raise HTTPException(status_code=404, detail="Scheme not found")
+    
+    started = datetime.utcnow()
+    # Bitmap query over the whole population; keep it off the event loop
+    loop = asyncio.get_running_loop()
+    user_ids = await loop.run_in_executor(None, index.eligible_users, scheme)
+    elapsed_ms = (datetime.utcnow() - started).total_seconds() * 1000
+    
+    if warm and redis_client:
+        background_tasks.add_task(warm_eligibility_cache, user_ids[:WARM_LIMIT])
+    
+    return {
+        "scheme_id": scheme_id,
+        "eligible_users": len(user_ids),
+        "population": index.size,
+        "snapshot_built_at": index.built_at,
+        "query_ms": round(elapsed_ms, 2),
+        "cursor": cursor,
+        "next_cursor": cursor + limit if cursor + limit < len(user_ids) else None,
+        "user_ids": user_ids[cursor:cursor + limit],
+        "warming": min(len(user_ids), WARM_LIMIT) if warm and redis_client else 0
+    }
+
+async def warm_eligibility_cache(user_ids: List[str], chunk_size: int = 200):
+    """Recompute and cache full eligibility results for the given users"""
+    loop = asyncio.get_running_loop()
+    warmed = 0
+    # Worker threads use a frozen copy; scheme changes on the loop keep mutating the live registry
+    registry = scheme_registry.snapshot()
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        stored = await redis_client.mget(*[f"profile:{uid}" for uid in chunk])
+        profiles = [json.loads(data) for data in stored if data]
+        results = await loop.run_in_executor(None, lambda: [registry.check_user(p) for p in profiles])
+        
+        processed_at = datetime.utcnow().isoformat()
+        for profile, result in zip(profiles, results):
+            result.update({"user_id": profile["user_id"], "cached": False, "processed_at": processed_at})
+        await result_cache.set_many(
+            {f"eligibility:{profile['user_id']}": result for profile, result in zip(profiles, results)},
+            3600, local=False
+        )
+        warmed += len(results)
+    scheme_registry.index.merge_stats(registry.index)
+    logger.info(f"Warmed eligibility cache for {warmed} users")
+
+# Profile Endpoints
+async def load_profile(user_id: str) -> Optional[Dict]:
+    """Stored profile under profile:{user_id}, if any"""
+    if not redis_client:
+        return None
+    data = await redis_client.get(f"profile:{user_id}")
+    return json.loads(data) if data else None
+
+@app.patch("/v2/profiles/{user_id}")
+async def update_profile(user_id: str, update: ProfileUpdate):
+    """Update profile fields and patch the cached eligibility result in place"""
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis not available")
+    
+    old = await load_profile(user_id) or {"user_id": user_id}
+    changes = update.model_dump(exclude_unset=True)
+    changed_fields = [field for field, value in changes.items() if old.get(field) != value]
+    profile = {**old, **changes, "user_id": user_id}
+    await redis_client.set(f"profile:{user_id}", json.dumps(profile))
     
-    await redis_client.setex(f"batch:{task_id}", 86400, str(results))
+    cache_key = f"eligibility:{user_id}"
+    cache_status = "unchanged"
+    reevaluated = 0
+    result = await result_cache.get(cache_key) if changed_fields else None
+    if result is not None:
+        if result.get("scheme_version") == scheme_registry.version:
+            # Only schemes reading a changed field are re-evaluated; keep the entry's remaining TTL
+            result, reevaluated = scheme_registry.reevaluate(profile, result, changed_fields)
+            result["processed_at"] = datetime.utcnow().isoformat()
+            ttl = await result_cache.ttl(cache_key)
+            await result_cache.set(cache_key, result, ttl if ttl > 0 else 3600)
+            cache_status = "patched"
+        else:
+            # Schemes changed since the result was cached; recompute on next check
+            await result_cache.delete(cache_key)
+            cache_status = "invalidated"
+    
+    return {
+        "user_id": user_id,
+        "changed_fields": changed_fields,
+        "schemes_reevaluated": reevaluated,
+        "cache": cache_status
+    }
+
+# Scheme Endpoints
+@app.put("/v2/schemes/{scheme_id}")
+async def upsert_scheme(scheme_id: str, scheme: SchemeDefinition):
+    """Add or replace a scheme's eligibility conditions"""
+    data = scheme.model_dump()
+    data["id"] = scheme_id
+    await save_scheme(scheme_id, data)
+    
+    return {"scheme_id": scheme_id, "status": "compiled", "schemes_count": len(scheme_registry)}
+
+@app.post("/v2/schemes/{scheme_id}/rules/compile")
+async def compile_scheme_rules(scheme_id: str, source: RuleSource):
+    """Extract rules from rulebook text and set them as the scheme's conditions
+    
+    Extraction is keyed by a content hash of the text: unchanged text is a
+    rule store hit with no LLM call. Parts that do not compile onto known
+    fields and operators are returned as `uncompiled` for manual review.
+    """
+    extraction = await gemini_processor.extract_rules_from_text_async(source.text)
+    if "error" in extraction:
+        raise HTTPException(status_code=502, detail=f"Rule extraction failed: {extraction['error']}")
+    if "conditions" not in extraction:
+        raise HTTPException(status_code=502, detail="Rule extraction returned no structured rules")
+    if not extraction["conditions"]:
+        raise HTTPException(status_code=422, detail={"message": "No rules could be compiled",
+                                                     "uncompiled": extraction["uncompiled"]})
+    
+    existing = scheme_registry.get(scheme_id) or {"schemeName": source.schemeName or scheme_id, "status": "Draft"}
+    data = {**existing, "id": scheme_id, "conditions": extraction["conditions"],
+            "rules_source_hash": extraction["source_hash"]}
+    if source.schemeName:
+        data["schemeName"] = source.schemeName
+    await save_scheme(scheme_id, data)
+    
+    return {
+        "scheme_id": scheme_id,
+        "status": "compiled",
+        "source_hash": extraction["source_hash"],
+        "extraction_cached": extraction["cached"],
+        "conditions": extraction["conditions"],
+        "uncompiled": extraction["uncompiled"]
+    }
+
+async def save_scheme(scheme_id: str, data: Dict):
+    """Compile a scheme into the registry, persist it and drop results it may change"""
+    scheme_registry.upsert(data)
+    
+    if redis_client:
+        await redis_client.set(f"scheme:{scheme_id}", json.dumps(data))
+        await invalidate_scheme_caches(scheme_id)
+
+# Rulebook Ingestion Endpoints
+@app.post("/v2/rulebooks/ingest")
+async def ingest_rulebooks(request: IngestRequest):
+    """Queue rulebook PDFs for parsing, splitting and indexing on the ingestion pool
+    
+    Jobs are registered at once and download or hash their PDF on their own;
+    a PDF (by content hash) another live job already owns ends as
+    "duplicate" pointing at that job.
+    """
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis not available")
+    if not request.sources:
+        raise HTTPException(status_code=400, detail="No sources given")
+    
+    submitted = await submit_sources(redis_client, request.sources)
+    for job_id, source in submitted["to_run"]:
+        task = asyncio.create_task(run_ingest_job(redis_client, ingest_executor, job_id, source))
+        ingest_tasks.add(task)
+        task.add_done_callback(ingest_tasks.discard)
+    
+    batch_id = submitted["batch_id"]
+    return {
+        "batch_id": batch_id,
+        "jobs_started": len(submitted["to_run"]),
+        "jobs": submitted["entries"],
+        "workers": ingest_executor.workers,
+        "check_url": f"/v2/rulebooks/ingest/{batch_id}"
+    }
+
+@app.get("/v2/rulebooks/ingest/{batch_id}")
+async def ingest_batch_status(batch_id: str):
+    """Per-job page progress and the batch's aggregate throughput"""
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis not available")
+    
+    batch = await get_batch(redis_client, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+@app.get("/v2/rulebooks/jobs/{job_id}")
+async def ingest_job_status(job_id: str):
+    """Progress, throughput and (once completed) index key of one ingestion job"""
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis not available")
+    
+    job = await get_job(redis_client, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/v2/schemes/index/stats")
+async def scheme_index_stats():
+    """Attribute index coverage and pruning ratio for this worker"""
+    return {"total_schemes": len(scheme_registry), **scheme_registry.index.get_stats()}
+
+@app.delete("/v2/schemes/{scheme_id}")
+async def delete_scheme(scheme_id: str):
+    """Remove a scheme from eligibility evaluation"""
+    if not scheme_registry.remove(scheme_id):
+        raise HTTPException(status_code=404, detail="Scheme not found")
+    
+    if redis_client:
+        await redis_client.delete(f"scheme:{scheme_id}")
+        await invalidate_scheme_caches(scheme_id)
+    
+    return {"scheme_id": scheme_id, "status": "removed", "schemes_count": len(scheme_registry)}
+
+async def invalidate_scheme_caches(scheme_id: str):
+    """Cached eligibility results cover every scheme; rule entries only the one that changed"""
+    await result_cache.invalidate_namespace("eligibility")
+    await AsyncRuleCache.invalidate_scheme(scheme_id)
 
 # Rule Query Endpoints
 @app.post("/v2/rules/query")
 async def query_rules(query: RuleQuery):
     """Query rules using Gemini AI with caching"""
     try:
-        # Generate cache key from query
-        cache_key = f"rule:{hash(query.query)}"
-        
+        # Normalized query + context hash, so equivalent queries share an entry across workers
         if redis_client:
-            cached = await redis_client.get(cache_key)
-            if cached:
-                return JSONResponse(content=eval(cached))
+            cached = await rule_answers.get(query.query, query.context)
+            if cached is not None:
+                return JSONResponse(content=cached)
         
         # Mock response (Gemini integration in separate module)
         result = {
@@ -170,21 +595,98 @@ async def query_rules(query: RuleQuery):
         }
         
         if redis_client:
-            await redis_client.setex(cache_key, 7200, str(result))
+            await rule_answers.set(query.query, result, query.context)
         
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Chatbot Endpoints
+def sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def chatbot_events(query: str, context: Optional[Dict]):
+    async for event in gemini_processor.stream_chatbot_answer(query, context):
+        kind = event.pop("type")
+        yield sse_event(kind, event)
+
+def chatbot_stream_response(query: str, context: Optional[Dict]) -> StreamingResponse:
+    return StreamingResponse(
+        chatbot_events(query, context),
+        media_type="text/event-stream",
+        # Keep proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/v2/chatbot/stream")
+async def stream_chatbot(query: RuleQuery):
+    """Chatbot answer as Server-Sent Events
+    
+    `token` events carry answer text as it is generated; the final `done`
+    event has the same shape as answer_chatbot_query (`query`, `answer`,
+    `model`), and `error` carries the usual fallback payload.
+    """
+    return chatbot_stream_response(query.query, query.context)
+
+@app.get("/v2/chatbot/stream")
+async def stream_chatbot_get(q: str, context: Optional[str] = None):
+    """EventSource variant of POST /v2/chatbot/stream (context as a JSON string)"""
+    try:
+        parsed = json.loads(context) if context else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="context must be a JSON object")
+    if parsed is not None and not isinstance(parsed, dict):
+        raise HTTPException(status_code=400, detail="context must be a JSON object")
+    return chatbot_stream_response(q, parsed)
+
+# Translation Endpoints
+@app.post("/v2/translations/{language}")
+async def translate_texts(language: str, request: TranslationRequest):
+    """Translate many strings in one call (translation memory first, misses packed per request)"""
+    stats = {}
+    translations = await gemini_processor.translate_batch_async(request.texts, language, stats)
+    return {"language": language, "translations": translations, **stats}
+
+@app.post("/v2/translations/{language}/warm")
+async def warm_translations(language: str):
+    """Pre-translate every scheme name, description and condition label into a language
+    
+    Condition labels are the strings eligibility results list as missing
+    requirements, so localized responses are then served from memory.
+    """
+    texts = []
+    for scheme in scheme_registry.all():
+        texts += [scheme.get("schemeName") or "", scheme.get("description") or ""]
+        texts += [condition_label(row) for group in scheme.get("conditions") or [] for row in group.get("rows") or []]
+    
+    start = datetime.utcnow()
+    stats = {}
+    await gemini_processor.translate_batch_async(texts, language, stats)
+    return {
+        "language": language,
+        "schemes": len(scheme_registry),
+        **stats,
+        "elapsed_seconds": round((datetime.utcnow() - start).total_seconds(), 3)
+    }
+
 # Cache Management
 @app.delete("/v2/cache/clear")
-async def clear_cache():
-    """Clear all Redis cache"""
+async def clear_cache(namespace: Optional[List[str]] = Query(None), tag: Optional[List[str]] = Query(None)):
+    """Invalidate cache namespaces and/or tags (every cache namespace when neither is given)
+    
+    Invalidation bumps generation counters; orphaned keys are swept in the background.
+    """
     if not redis_client:
         raise HTTPException(status_code=503, detail="Redis not available")
     
-    await redis_client.flushdb()
-    return {"status": "cache cleared", "timestamp": datetime.utcnow().isoformat()}
+    generations = {}
+    for name in tag or []:
+        generations[f"tag:{name}"] = await result_cache.invalidate_tag(name)
+    if namespace or not tag:
+        for name in namespace or sorted(cache_namespaces):
+            generations[f"namespace:{name}"] = await result_cache.invalidate_namespace(name)
+    
+    return {"status": "cache cleared", "generations": generations, "timestamp": datetime.utcnow().isoformat()}
 
 @app.get("/v2/cache/stats")
 async def cache_stats():
@@ -196,9 +698,17 @@ async def cache_stats():
     return {
         "used_memory": info.get("used_memory_human"),
         "connected_clients": info.get("connected_clients"),
-        "total_commands": info.get("total_commands_processed")
+        "total_commands": info.get("total_commands_processed"),
+        # Client-side, per key prefix, for this worker process
+        "prefixes": cache_metrics.summary()
     }
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Per-prefix cache metrics and streaming model metrics of this worker in Prometheus text format"""
+    return Response(content=result_cache.prometheus_metrics(model_metrics.render()),
+                    media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     port = int(os.getenv("FASTAPI_PORT", 8002))
     uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
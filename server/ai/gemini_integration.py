@@ -3,23 +3,58 @@ Google Gemini Integration for Docu-Agent
 Advanced AI-powered eligibility inference and rule interpretation
 """
 
+import asyncio
 import google.generativeai as genai
 import json
 import os
-from typing import Dict, List, Optional
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import logging
 
+from answer_cache import AnswerCache, AsyncAnswerCache
+from eligibility_engine import FIELD_MAP, OPERATORS
+from llm_resilience import CircuitOpenError, ResilientModel, model_metrics
+from prompt_packing import (
+    estimate_tokens,
+    format_items,
+    format_segments,
+    pack_items,
+    split_results,
+    split_segments,
+    strip_code_fence,
+)
+from redis_cache import AsyncTranslationCache, TranslationCache, redis_cache_connected
+from rule_store import AsyncRuleStore, RuleStore, build_record, text_hash
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Condition vocabulary the extraction prompt asks for (what rule_store can compile)
+RULE_FIELDS = ", ".join(f'"{field}"' for field in FIELD_MAP)
+RULE_OPERATORS = ", ".join(f'"{operator}"' for operator in OPERATORS)
+
+# Per-item result requested from packed (multi-scheme / multi-user) prompts
+ELIGIBILITY_SCHEMA = ('{"is_eligible": boolean, "eligibility_score": 0-100, "missing_requirements": [string], '
+                      '"recommendations": [string], "explanation": string}')
+
 class GeminiProcessor:
-    """Process eligibility rules and queries using Google Gemini"""
+    """Process eligibility rules and queries using Google Gemini
     
-    def __init__(self, api_key: str = None):
+    Each method has an *_async twin for the FastAPI service. The async path
+    never blocks the event loop and goes through ResilientModel (bounded
+    concurrency, timeouts, jittered retries, circuit breaker); when the call
+    fails it returns the same fallback shape as the sync method.
+    """
+    
+    def __init__(self, api_key: str = None, model: Any = None):
         self.api_key = api_key or os.getenv('GOOGLE_GEMINI_API_KEY', '')
         self.model_name = 'gemini-pro'
-        self.model = None
-        self.initialize()
+        self.model = model
+        self.resilient = ResilientModel(model) if model is not None else None
+        self.chatbot_answers = AnswerCache("chatbot")
+        self.async_chatbot_answers = AsyncAnswerCache("chatbot", semantic=self.chatbot_answers.semantic)
+        if model is None:
+            self.initialize()
     
     def initialize(self):
         """Initialize Gemini client"""
@@ -30,19 +65,16 @@ class GeminiProcessor:
         try:
             genai.configure(api_key=self.api_key)
             self.model = genai.GenerativeModel(self.model_name)
+            self.resilient = ResilientModel(self.model)
             logger.info(f"✓ Gemini {self.model_name} initialized")
             return True
         except Exception as e:
             logger.error(f"Failed to initialize Gemini: {e}")
             return False
     
-    def analyze_eligibility(self, user_profile: Dict, scheme_rules: str) -> Dict:
-        """Analyze user eligibility against scheme rules using Gemini"""
-        if not self.model:
-            return {"error": "Gemini not initialized", "fallback": True}
-        
-        try:
-            prompt = f"""
+    @staticmethod
+    def _eligibility_prompt(user_profile: Dict, scheme_rules: str) -> str:
+        return f"""
 Analyze the following user profile against the scheme eligibility rules.
 
 USER PROFILE:
@@ -58,65 +90,49 @@ Provide a JSON response with:
 - recommendations (list)
 - explanation (string)
 """
-            
-            response = self.model.generate_content(prompt)
-            
-            # Parse response
-            try:
-                result = json.loads(response.text)
-            except:
-                result = {
-                    "is_eligible": True,
-                    "eligibility_score": 75,
-                    "explanation": response.text,
-                    "missing_requirements": [],
-                    "recommendations": []
-                }
-            
-            return result
-        except Exception as e:
-            logger.error(f"Eligibility analysis failed: {e}")
-            return {"error": str(e), "fallback": True}
     
-    def extract_rules_from_text(self, text: str) -> Dict:
-        """Extract structured eligibility rules from unstructured text"""
-        if not self.model:
-            return {"error": "Gemini not initialized"}
-        
+    @staticmethod
+    def _parse_eligibility(text: str) -> Dict:
         try:
-            prompt = f"""
+            return json.loads(text)
+        except:
+            return {
+                "is_eligible": True,
+                "eligibility_score": 75,
+                "explanation": text,
+                "missing_requirements": [],
+                "recommendations": []
+            }
+    
+    @staticmethod
+    def _rules_prompt(text: str) -> str:
+        return f"""
 Extract and structure the eligibility rules from the following text.
 
 TEXT:
 {text}
 
 Provide a JSON response with:
-- rules (list of structured rules)
+- rules (list of structured rules, each {{"field", "operator", "value"}} where possible:
+  field one of {RULE_FIELDS}; operator one of {RULE_OPERATORS},
+  or "In" with a list value; Between values as "min-max"; a rule met by any of several
+  conditions as {{"any_of": [rules]}}; anything else as a plain string)
 - categories (list of identified categories)
 - conditions (list of conditions)
-- income_limits (dict if mentioned)
-- age_limits (dict if mentioned)
+- income_limits (dict if mentioned, e.g. {{"min": number, "max": number}} in rupees per year)
+- age_limits (dict if mentioned, e.g. {{"min": number, "max": number}} in years)
 """
-            
-            response = self.model.generate_content(prompt)
-            
-            try:
-                result = json.loads(response.text)
-            except:
-                result = {"raw_text": response.text}
-            
-            return result
-        except Exception as e:
-            logger.error(f"Rule extraction failed: {e}")
-            return {"error": str(e)}
     
-    def generate_action_roadmap(self, user_profile: Dict, ineligible_reasons: List[str]) -> Dict:
-        """Generate actionable steps to improve eligibility"""
-        if not self.model:
-            return {"error": "Gemini not initialized"}
-        
+    @staticmethod
+    def _parse_rules(text: str) -> Dict:
         try:
-            prompt = f"""
+            return json.loads(strip_code_fence(text))
+        except:
+            return {"raw_text": text}
+    
+    @staticmethod
+    def _roadmap_prompt(user_profile: Dict, ineligible_reasons: List[str]) -> str:
+        return f"""
 The user is currently ineligible for a scheme due to these reasons:
 {json.dumps(ineligible_reasons, indent=2)}
 
@@ -129,48 +145,40 @@ Generate a personalized action roadmap with:
 - resources (links/contacts needed)
 - priority (high/medium/low for each step)
 """
-            
-            response = self.model.generate_content(prompt)
-            
-            try:
-                result = json.loads(response.text)
-            except:
-                result = {"approach": response.text}
-            
-            return result
-        except Exception as e:
-            logger.error(f"Roadmap generation failed: {e}")
-            return {"error": str(e)}
     
-    def multilingual_translate(self, text: str, language: str = 'hi') -> str:
-        """Translate results to regional languages (Hindi, Marathi, etc)"""
-        if not self.model:
-            return text
-        
+    @staticmethod
+    def _parse_roadmap(text: str) -> Dict:
         try:
-            prompt = f"""
+            return json.loads(text)
+        except:
+            return {"approach": text}
+    
+    @staticmethod
+    def _translate_prompt(text: str, language: str) -> str:
+        return f"""
 Translate the following text to {language} while maintaining clarity:
 
 {text}
 
 Provide only the translated text without explanations.
 """
-            
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            logger.warning(f"Translation failed: {e}")
-            return text
     
-    def answer_chatbot_query(self, query: str, context: Optional[Dict] = None) -> Dict:
-        """Answer user questions about schemes and eligibility"""
-        if not self.model:
-            return {"error": "Gemini not initialized", "fallback": True}
-        
-        try:
-            context_str = json.dumps(context) if context else ""
-            
-            prompt = f"""
+    @staticmethod
+    def _translate_batch_prompt(segments: Dict[str, str], language: str) -> str:
+        return f"""
+Translate each segment below to {language} while maintaining clarity.
+Every segment starts with a marker line such as <<<0>>>. Copy each marker line unchanged,
+followed by only the translation of that segment, in the same order.
+
+{format_segments(segments)}
+
+Provide only the marker lines and translations without explanations.
+"""
+    
+    @staticmethod
+    def _chatbot_prompt(query: str, context: Optional[Dict]) -> str:
+        context_str = json.dumps(context) if context else ""
+        return f"""
 You are a helpful assistant for a scheme eligibility platform. Answer the user's question.
 
 Context: {context_str}
@@ -179,18 +187,453 @@ User Query: {query}
 
 Provide a helpful, accurate response. If unsure, say so.
 """
+    
+    @staticmethod
+    def _log_async_failure(action: str, error: Exception, level: int = logging.ERROR):
+        # The breaker logs once when it opens; each short-circuited call is routine
+        if isinstance(error, CircuitOpenError):
+            logger.debug(f"{action} short-circuited")
+        else:
+            logger.log(level, f"{action} failed: {error!r}")
+    
+    def analyze_eligibility(self, user_profile: Dict, scheme_rules: str) -> Dict:
+        """Analyze user eligibility against scheme rules using Gemini"""
+        if not self.model:
+            return {"error": "Gemini not initialized", "fallback": True}
+        
+        try:
+            response = self.model.generate_content(self._eligibility_prompt(user_profile, scheme_rules))
+            return self._parse_eligibility(response.text)
+        except Exception as e:
+            logger.error(f"Eligibility analysis failed: {e}")
+            return {"error": str(e), "fallback": True}
+    
+    async def analyze_eligibility_async(self, user_profile: Dict, scheme_rules: str) -> Dict:
+        if not self.resilient:
+            return {"error": "Gemini not initialized", "fallback": True}
+        
+        try:
+            response = await self.resilient.generate_content(self._eligibility_prompt(user_profile, scheme_rules))
+            return self._parse_eligibility(response.text)
+        except Exception as e:
+            self._log_async_failure("Eligibility analysis", e)
+            return {"error": str(e) or repr(e), "fallback": True}
+    
+    @staticmethod
+    def _schemes_pack_prompt(profile_json: str, schemes: Dict[str, str]) -> str:
+        return f"""
+Analyze the following user profile against the eligibility rules of each scheme below.
+
+USER PROFILE:
+{profile_json}
+
+SCHEMES:
+{format_items("scheme_id", schemes)}
+
+Respond with only a JSON object that maps every scheme_id above to:
+{ELIGIBILITY_SCHEMA}
+"""
+    
+    @staticmethod
+    def _users_pack_prompt(users: Dict[str, str], scheme_rules: str) -> str:
+        return f"""
+Analyze each user profile below against the scheme eligibility rules.
+
+SCHEME RULES:
+{scheme_rules}
+
+USERS:
+{format_items("user_id", users)}
+
+Respond with only a JSON object that maps every user_id above to:
+{ELIGIBILITY_SCHEMA}
+"""
+    
+    def _eligibility_packs(self, user_profile: Optional[Dict], schemes: Optional[Dict[str, str]],
+                           users: Optional[Dict[str, Dict]], scheme_rules: Optional[str]):
+        """(item ids, prompt) per request, plus the analyze_eligibility args for one item
+        
+        Single-item packs get an empty prompt and go straight to the plain call.
+        """
+        if schemes is None and users is None:
+            raise ValueError("Pass schemes (one user, many schemes) or users (many users, one scheme)")
+        if users is None:
+            schemes = {str(scheme_id): rules for scheme_id, rules in schemes.items()}
+            shared, items = json.dumps(user_profile, separators=(',', ':')), schemes
+            build = lambda pack: self._schemes_pack_prompt(shared, {item: items[item] for item in pack})
+            single_args = lambda item: (user_profile, schemes[item])
+        else:
+            users = {str(user_id): profile for user_id, profile in users.items()}
+            shared = scheme_rules
+            items = {user_id: json.dumps(profile, separators=(',', ':')) for user_id, profile in users.items()}
+            build = lambda pack: self._users_pack_prompt({item: items[item] for item in pack}, shared)
+            single_args = lambda item: (users[item], scheme_rules)
+        packs = [(pack, build(pack) if len(pack) > 1 else "") for pack in pack_items(items, estimate_tokens(shared))]
+        return packs, single_args
+    
+    def analyze_eligibility_batch(self, user_profile: Dict = None, schemes: Dict[str, str] = None,
+                                  users: Dict[str, Dict] = None, scheme_rules: str = None) -> Dict[str, Dict]:
+        """Analyze one user against many schemes, or many users against one scheme, in packed calls
+        
+        Pass (user_profile, schemes={scheme_id: rules}) or (users={user_id: profile}, scheme_rules).
+        Items are packed into as few requests as the token budget allows and the
+        answer is split back out per id; items missing or malformed in a packed
+        answer, or in a pack whose call failed, are retried with
+        analyze_eligibility. Returns {id: result}.
+        """
+        packs, single_args = self._eligibility_packs(user_profile, schemes, users, scheme_rules)
+        if not self.model:
+            return {item: {"error": "Gemini not initialized", "fallback": True} for pack, _ in packs for item in pack}
+        
+        results = {}
+        for pack, prompt in packs:
+            if prompt:
+                try:
+                    response = self.model.generate_content(prompt)
+                    results.update(split_results(response.text, pack, self._is_eligibility_result))
+                except Exception as e:
+                    # A pack can fail where single items would not (e.g. a timeout on a long answer)
+                    logger.warning(f"Packed eligibility analysis failed, retrying items singly: {e}")
+            for item in pack:
+                if item not in results:
+                    results[item] = self.analyze_eligibility(*single_args(item))
+        return results
+    
+    async def analyze_eligibility_batch_async(self, user_profile: Dict = None, schemes: Dict[str, str] = None,
+                                              users: Dict[str, Dict] = None,
+                                              scheme_rules: str = None) -> Dict[str, Dict]:
+        packs, single_args = self._eligibility_packs(user_profile, schemes, users, scheme_rules)
+        if not self.resilient:
+            return {item: {"error": "Gemini not initialized", "fallback": True} for pack, _ in packs for item in pack}
+        
+        async def run_pack(pack: List[str], prompt: str) -> Dict[str, Dict]:
+            results = {}
+            if prompt:
+                try:
+                    response = await self.resilient.generate_content(prompt)
+                    results = split_results(response.text, pack, self._is_eligibility_result)
+                except CircuitOpenError as e:
+                    # Single calls would be short-circuited too
+                    self._log_async_failure("Packed eligibility analysis", e)
+                    return {item: {"error": str(e) or repr(e), "fallback": True} for item in pack}
+                except Exception as e:
+                    self._log_async_failure("Packed eligibility analysis (retrying items singly)", e,
+                                            level=logging.WARNING)
+            missing = [item for item in pack if item not in results]
+            singles = await asyncio.gather(*(
+                self.analyze_eligibility_async(*single_args(item)) for item in missing))
+            results.update(zip(missing, singles))
+            return results
+        
+        results = {}
+        for pack_results in await asyncio.gather(*(run_pack(pack, prompt) for pack, prompt in packs)):
+            results.update(pack_results)
+        return results
+    
+    @staticmethod
+    def _is_eligibility_result(result: Dict) -> bool:
+        return "is_eligible" in result
+    
+    @staticmethod
+    def _extraction_result(record: Dict, cached: bool) -> Dict:
+        return {**record["extraction"], "source_hash": record["source_hash"], "conditions": record["conditions"],
+                "uncompiled": record["uncompiled"], "cached": cached}
+    
+    def _store_extraction(self, source_hash: str, extraction: Dict) -> Optional[Dict]:
+        """Record for a structured extraction; unparsed answers are not stored, so they are retried"""
+        if not isinstance(extraction, dict) or "raw_text" in extraction:
+            return None
+        return build_record(source_hash, "text", extraction, self.model_name)
+    
+    def extract_rules_from_text(self, text: str) -> Dict:
+        """Extract structured eligibility rules from unstructured text
+        
+        Results are stored by content hash and compiled into condition groups,
+        so the same text is never sent to the model twice.
+        """
+        source_hash = text_hash(text)
+        record = RuleStore.get(source_hash)
+        if record is not None and record.get("extraction") is not None:
+            return self._extraction_result(record, cached=True)
+        if not self.model:
+            return {"error": "Gemini not initialized"}
+        
+        try:
+            response = self.model.generate_content(self._rules_prompt(text))
+            result = self._parse_rules(response.text)
+            record = self._store_extraction(source_hash, result)
+            if record is None:
+                return result
+            return self._extraction_result(RuleStore.put(record), cached=False)
+        except Exception as e:
+            logger.error(f"Rule extraction failed: {e}")
+            return {"error": str(e)}
+    
+    async def extract_rules_from_text_async(self, text: str) -> Dict:
+        source_hash = text_hash(text)
+        record = await AsyncRuleStore.get(source_hash)
+        if record is not None and record.get("extraction") is not None:
+            return self._extraction_result(record, cached=True)
+        if not self.resilient:
+            return {"error": "Gemini not initialized"}
+        
+        try:
+            response = await self.resilient.generate_content(self._rules_prompt(text))
+            result = self._parse_rules(response.text)
+            record = self._store_extraction(source_hash, result)
+            if record is None:
+                return result
+            return self._extraction_result(await AsyncRuleStore.put(record), cached=False)
+        except Exception as e:
+            self._log_async_failure("Rule extraction", e)
+            return {"error": str(e) or repr(e)}
+    
+    def generate_action_roadmap(self, user_profile: Dict, ineligible_reasons: List[str]) -> Dict:
+        """Generate actionable steps to improve eligibility"""
+        if not self.model:
+            return {"error": "Gemini not initialized"}
+        
+        try:
+            response = self.model.generate_content(self._roadmap_prompt(user_profile, ineligible_reasons))
+            return self._parse_roadmap(response.text)
+        except Exception as e:
+            logger.error(f"Roadmap generation failed: {e}")
+            return {"error": str(e)}
+    
+    async def generate_action_roadmap_async(self, user_profile: Dict, ineligible_reasons: List[str]) -> Dict:
+        if not self.resilient:
+            return {"error": "Gemini not initialized"}
+        
+        try:
+            response = await self.resilient.generate_content(self._roadmap_prompt(user_profile, ineligible_reasons))
+            return self._parse_roadmap(response.text)
+        except Exception as e:
+            self._log_async_failure("Roadmap generation", e)
+            return {"error": str(e) or repr(e)}
+    
+    def multilingual_translate(self, text: str, language: str = 'hi') -> str:
+        """Translate results to regional languages (Hindi, Marathi, etc)
+        
+        Blocking; async code should use multilingual_translate_async.
+        """
+        return self.translate_batch([text], language)[0]
+    
+    async def multilingual_translate_async(self, text: str, language: str = 'hi') -> str:
+        return (await self.translate_batch_async([text], language))[0]
+    
+    def _translation_packs(self, pending: List[str], language: str) -> List[Tuple[Dict[str, str], str]]:
+        """({segment id: text}, prompt) per request; single texts use the plain translation prompt"""
+        items = {str(i): text for i, text in enumerate(pending)}
+        packs = []
+        for pack in pack_items(items, 0):
+            segments = {item: items[item] for item in pack}
+            prompt = (self._translate_batch_prompt(segments, language) if len(pack) > 1
+                      else self._translate_prompt(segments[pack[0]], language))
+            packs.append((segments, prompt))
+        return packs
+    
+    @staticmethod
+    def _split_translations(segments: Dict[str, str], text: str) -> Dict[str, str]:
+        """{source text: translation} from one answer; segments missing from a packed answer are left out"""
+        if len(segments) == 1:
+            (source,) = segments.values()
+            return {source: text.strip()} if text.strip() else {}
+        return {segments[item]: translation for item, translation in split_segments(text, list(segments)).items()}
+    
+    def translate_batch(self, texts: List[str], language: str = 'hi', stats: Dict = None) -> List[str]:
+        """Translate many strings with as few model calls as possible
+        
+        Each distinct string is looked up in the translation memory first; the
+        misses are packed into delimited multi-segment requests under the token
+        budget, and segments missing from a packed answer get a single call.
+        Strings that cannot be translated come back unchanged.
+        
+        Called from an event loop thread, the memory is only used if the sync
+        Redis client is already connected: opening it there could stall the
+        loop for the whole connect timeout. Use translate_batch_async instead.
+        """
+        distinct = list(dict.fromkeys(text for text in texts if text.strip()))
+        use_memory = redis_cache_connected() or not _on_event_loop()
+        memory = TranslationCache.get_translations(language, distinct) if use_memory else {}
+        pending = [text for text in distinct if text not in memory]
+        
+        def run_pack(segments: Dict[str, str], prompt: str) -> Dict[str, str]:
+            try:
+                response = self.model.generate_content(prompt)
+            except Exception as e:
+                logger.warning(f"Translation failed: {e}")
+                return {}
+            result = self._split_translations(segments, response.text)
+            if len(segments) > 1:
+                for text in segments.values():
+                    if text not in result:
+                        result.update(run_pack({"0": text}, self._translate_prompt(text, language)))
+            return result
+        
+        translated = {}
+        if pending and self.model:
+            for segments, prompt in self._translation_packs(pending, language):
+                translated.update(run_pack(segments, prompt))
+            if translated and use_memory:
+                TranslationCache.set_translations(language, translated)
+        
+        if stats is not None:
+            stats.update({"texts": len(distinct), "memory_hits": len(memory), "translated": len(translated),
+                          "untranslated": len(pending) - len(translated)})
+        memory.update(translated)
+        return [memory.get(text, text) for text in texts]
+    
+    async def translate_batch_async(self, texts: List[str], language: str = 'hi', stats: Dict = None) -> List[str]:
+        distinct = list(dict.fromkeys(text for text in texts if text.strip()))
+        memory = await AsyncTranslationCache.get_translations(language, distinct)
+        pending = [text for text in distinct if text not in memory]
+        
+        async def run_pack(segments: Dict[str, str], prompt: str) -> Dict[str, str]:
+            try:
+                response = await self.resilient.generate_content(prompt)
+            except Exception as e:
+                self._log_async_failure("Translation", e, logging.WARNING)
+                return {}
+            result = self._split_translations(segments, response.text)
+            missing = [text for text in segments.values() if text not in result]
+            if len(segments) > 1 and missing:
+                for single in await asyncio.gather(*(
+                        run_pack({"0": text}, self._translate_prompt(text, language)) for text in missing)):
+                    result.update(single)
+            return result
+        
+        translated = {}
+        if pending and self.resilient:
+            for result in await asyncio.gather(*(run_pack(segments, prompt) for segments, prompt
+                                                 in self._translation_packs(pending, language))):
+                translated.update(result)
+            if translated:
+                await AsyncTranslationCache.set_translations(language, translated)
+        
+        if stats is not None:
+            stats.update({"texts": len(distinct), "memory_hits": len(memory), "translated": len(translated),
+                          "untranslated": len(pending) - len(translated)})
+        memory.update(translated)
+        return [memory.get(text, text) for text in texts]
+    
+    def answer_chatbot_query(self, query: str, context: Optional[Dict] = None) -> Dict:
+        """Answer user questions about schemes and eligibility"""
+        if not self.model:
+            return {"error": "Gemini not initialized", "fallback": True}
+        
+        cached = self.chatbot_answers.get(query, context)
+        if cached is not None:
+            return cached
+        
+        try:
+            response = self.model.generate_content(self._chatbot_prompt(query, context))
             
-            response = self.model.generate_content(prompt)
-            
-            return {
+            result = {
                 "query": query,
                 "answer": response.text,
                 "model": "gemini-pro"
             }
+            # Only real answers are cached; errors and fallbacks are retried next time
+            self.chatbot_answers.set(query, result, context)
+            return result
         except Exception as e:
             logger.error(f"Chatbot query failed: {e}")
             return {"error": str(e), "fallback": True}
+    
+    async def answer_chatbot_query_async(self, query: str, context: Optional[Dict] = None) -> Dict:
+        if not self.resilient:
+            return {"error": "Gemini not initialized", "fallback": True}
+        
+        cached = await self.async_chatbot_answers.get(query, context)
+        if cached is not None:
+            return cached
+        
+        try:
+            response = await self.resilient.generate_content(self._chatbot_prompt(query, context))
+            
+            result = {
+                "query": query,
+                "answer": response.text,
+                "model": "gemini-pro"
+            }
+            await self.async_chatbot_answers.set(query, result, context)
+            return result
+        except Exception as e:
+            self._log_async_failure("Chatbot query", e)
+            return {"error": str(e) or repr(e), "fallback": True}
+    
+    async def stream_chatbot_answer(self, query: str, context: Optional[Dict] = None) -> AsyncIterator[Dict]:
+        """answer_chatbot_query as events: {"type": "token", "text"} per chunk, then one
+        {"type": "done", query, answer, model, ...} (or {"type": "error", ..., "fallback": True})
+        
+        A cached answer is replayed as a single token. The assembled answer is
+        written to the answer cache only when the stream completes normally with
+        some text.
+        """
+        cached = await self.async_chatbot_answers.get(query, context)
+        if cached is not None:
+            yield {"type": "token", "text": cached["answer"]}
+            yield {"type": "done", **cached}
+            return
+        if not self.resilient:
+            yield {"type": "error", "error": "Gemini not initialized", "fallback": True}
+            return
+        
+        start = time.perf_counter()
+        parts = []
+        last = None
+        outcome = "failed"
+        try:
+            async for chunk in self.resilient.stream_content(self._chatbot_prompt(query, context)):
+                last = chunk
+                text = chunk.text
+                if not text:
+                    continue
+                if not parts:
+                    model_metrics.record_ttft("chatbot", time.perf_counter() - start)
+                parts.append(text)
+                yield {"type": "token", "text": text}
+            
+            result = {
+                "query": query,
+                "answer": "".join(parts),
+                "model": "gemini-pro"
+            }
+            outcome = "completed"
+            # Empty or cut-short answers still go out, but the next ask retries them
+            if result["answer"].strip() and not self._stopped_early(last):
+                await self.async_chatbot_answers.set(query, result, context)
+            yield {"type": "done", **result}
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away mid-stream; nothing is cached
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            self._log_async_failure("Chatbot stream", e)
+            yield {"type": "error", "error": str(e) or repr(e), "fallback": True}
+        finally:
+            model_metrics.record_stream("chatbot", outcome, time.perf_counter() - start)
+    
+    @staticmethod
+    def _stopped_early(chunk: Any) -> bool:
+        """Whether a stream's last chunk reports a finish reason other than a normal stop (safety, max tokens, ...)"""
+        candidates = getattr(chunk, "candidates", None) or []
+        reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+        if reason is None:
+            return False
+        return getattr(reason, "name", str(reason)) not in ("STOP", "FINISH_REASON_UNSPECIFIED", "0", "1")
+    
+    def get_stats(self) -> Dict:
+        """Async call counters and circuit breaker state"""
+        return self.resilient.get_stats() if self.resilient else {}
+
 
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
 
 def check_gemini_availability() -> bool:
     """Check if Gemini API is available"""
@@ -0,0 +1,196 @@
+"""
+Knowledge Base Index for Docu-Agent
+BM25-ranked chatbot answers from an inverted index, with trigram lookup for misspelled words
+"""
+
+import json
+import math
+import os
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# JSON list (or {"entries": [...]}) or JSON lines of {"id", "tags", "answer", "question"?}
+KB_FILE = os.getenv('CHATBOT_KB_FILE', '')
+TOP_K = int(os.getenv('CHATBOT_TOP_K', 3))
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Words shorter than this are only matched exactly (too few trigrams to judge a typo)
+FUZZY_MIN_LENGTH = 4
+# Vocabulary words sharing the most trigrams with a misspelling are checked by edit distance;
+# those within the allowed edits (2 from 8 letters up) count, the closest FUZZY_CANDIDATES of them
+FUZZY_SHORTLIST = 20
+FUZZY_CANDIDATES = 2
+FUZZY_CACHE_SIZE = 10000
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric words, with '/' and '-' as separators (repeats kept for term frequency)"""
+    tokens = []
+    for part in str(text or "").replace("/", " ").replace("-", " ").split():
+        clean = "".join(ch for ch in part if ch.isalnum())
+        if clean:
+            tokens.append(clean.lower())
+    return tokens
+
+
+def trigrams(word: str) -> List[str]:
+    padded = f"<{word}>"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance counting an adjacent transposition as one edit"""
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def load_kb(path: Optional[str] = None) -> List[Dict]:
+    """Entries from a KB file (CHATBOT_KB_FILE by default), else knowledge_base.BOT_KB"""
+    path = path or KB_FILE
+    if not path:
+        from knowledge_base import BOT_KB
+        return BOT_KB
+
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            entries = [json.loads(line) for line in f if line.strip()]
+        else:
+            entries = json.load(f)
+    if isinstance(entries, dict):
+        entries = entries.get("entries", [])
+
+    valid = [entry for entry in entries if isinstance(entry, dict) and entry.get("id") and entry.get("answer")]
+    if len(valid) < len(entries):
+        logger.warning(f"Skipped {len(entries) - len(valid)} KB entries without an id or answer")
+    return valid
+
+
+class KnowledgeIndex:
+    """Inverted index over entry tags (and question text, if any), built once
+
+    Each term's postings hold precomputed BM25 weights, so a query adds a few
+    numpy arrays into a score vector and takes the top k. A query word that is
+    not in the vocabulary is matched to vocabulary words within one or two
+    edits, shortlisted by shared trigrams and weighted by closeness. Ties keep
+    KB order.
+    """
+
+    def __init__(self, entries: List[Dict]):
+        self.entries = list(entries)
+        documents = [self._terms(entry) for entry in self.entries]
+        lengths = np.array([len(terms) for terms in documents], dtype=np.float32)
+        average = float(lengths.mean()) if len(documents) and lengths.mean() > 0 else 1.0
+
+        postings: Dict[str, List] = defaultdict(lambda: ([], []))
+        for doc, terms in enumerate(documents):
+            for term, tf in Counter(terms).items():
+                ids, freqs = postings[term]
+                ids.append(doc)
+                freqs.append(tf)
+
+        total = len(documents)
+        self.postings: Dict[str, tuple] = {}
+        for term, (ids, freqs) in postings.items():
+            ids = np.array(ids, dtype=np.int32)
+            freqs = np.array(freqs, dtype=np.float32)
+            idf = math.log(1 + (total - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[ids] / average)
+            self.postings[term] = (ids, (idf * freqs * (BM25_K1 + 1) / (freqs + norm)).astype(np.float32))
+
+        # Trigram -> ids of vocabulary words containing it, for misspelling candidates
+        self.vocabulary = list(self.postings)
+        self.word_lengths = np.array([len(term) for term in self.vocabulary], dtype=np.int32)
+        self.trigram_counts = np.array([len(set(trigrams(term))) for term in self.vocabulary], dtype=np.int32)
+        grams: Dict[str, List[int]] = defaultdict(list)
+        for term_id, term in enumerate(self.vocabulary):
+            for gram in set(trigrams(term)):
+                grams[gram].append(term_id)
+        self.trigram_index = {gram: np.array(ids, dtype=np.int32) for gram, ids in grams.items()}
+        self._fuzzy_cache: Dict[str, List] = {}
+
+    @staticmethod
+    def _terms(entry: Dict) -> List[str]:
+        terms = []
+        for tag in entry.get("tags", []):
+            terms += tokenize(tag)
+        return terms + tokenize(entry.get("question", ""))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def similar_terms(self, word: str) -> List:
+        """[(vocabulary word, similarity)] for a word not in the vocabulary, closest first"""
+        if len(word) < FUZZY_MIN_LENGTH:
+            return []
+        cached = self._fuzzy_cache.get(word)
+        if cached is not None:
+            return cached
+
+        grams = set(trigrams(word))
+        hits = [self.trigram_index[gram] for gram in grams if gram in self.trigram_index]
+        result = []
+        if hits:
+            ids, shared = np.unique(np.concatenate(hits), return_counts=True)
+            close = np.abs(self.word_lengths[ids] - len(word)) <= 2
+            ids, shared = ids[close], shared[close]
+            dice = 2 * shared / (len(grams) + self.trigram_counts[ids])
+            if len(ids) > FUZZY_SHORTLIST:
+                keep = np.argpartition(-dice, FUZZY_SHORTLIST - 1)[:FUZZY_SHORTLIST]
+                ids, dice = ids[keep], dice[keep]
+            allowed = 1 if len(word) < 8 else 2
+            checked = []
+            for term_id, similarity in zip(ids.tolist(), dice.tolist()):
+                term = self.vocabulary[term_id]
+                distance = edit_distance(word, term)
+                if distance <= allowed:
+                    checked.append((distance, -similarity, term))
+            checked.sort()
+            result = [(term, 1 - distance / max(len(word), len(term)))
+                      for distance, _, term in checked[:FUZZY_CANDIDATES]]
+
+        if len(self._fuzzy_cache) >= FUZZY_CACHE_SIZE:
+            self._fuzzy_cache.clear()
+        self._fuzzy_cache[word] = result
+        return result
+
+    def search(self, text: str, top_k: int = TOP_K) -> List[Dict]:
+        """Top-k entries for a message: [{"id", "score", "entry"}], best first"""
+        words = set(tokenize(text))
+        if not words or not self.entries:
+            return []
+
+        scores = np.zeros(len(self.entries), dtype=np.float32)
+        for word in words:
+            if word in self.postings:
+                ids, weights = self.postings[word]
+                scores[ids] += weights
+                continue
+            for term, similarity in self.similar_terms(word):
+                ids, weights = self.postings[term]
+                scores[ids] += weights * similarity
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            # Everything above the k-th best score, then the earliest entries tied with it
+            values = scores[candidates]
+            cutoff = np.partition(values, len(values) - top_k)[len(values) - top_k]
+            above = candidates[values > cutoff]
+            tied = candidates[values == cutoff][:top_k - len(above)]
+            candidates = np.concatenate([above, tied])
+        # Best score first; equal scores keep KB order
+        ranked = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [{"id": self.entries[i].get("id"), "score": round(float(scores[i]), 4), "entry": self.entries[i]}
+                for i in ranked]
@@ -6,21 +6,112 @@ Handles PDF extraction, rule parsing, and eligibility inference
 from langchain.document_loaders import PyPDFLoader
 from langchain.text_splitter import CharacterTextSplitter
 from langchain.chains import RetrievalQA
-from langchain.embeddings import OpenAIEmbeddings
 from langchain.vectorstores import FAISS
 from langchain.llms import OpenAI
+from langchain.schema import Document
+from pypdf import PdfReader
+import hashlib
 import json
 import os
-from typing import List, Dict
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Dict, Optional
+
+from embedding_cache import CachedEmbeddings, embedding_model_id, get_embedding_backend
+from rule_store import RuleStore, build_record, file_hash
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# One subdirectory per index key: index.faiss + index.pkl (LangChain save_local) and meta.json
+FAISS_INDEX_DIR = os.getenv('FAISS_INDEX_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'faiss_indexes'))
+# Chunks embedded and added to the index per step while a PDF is streamed
+INGEST_FLUSH_CHUNKS = int(os.getenv('INGEST_FLUSH_CHUNKS', 128))
+# Loaded indexes kept per process, so repeated queries do not re-read them from disk
+MAX_LOADED_INDEXES = int(os.getenv('FAISS_MAX_LOADED', 8))
+
+_loaded_indexes: "OrderedDict[str, FAISS]" = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def index_key(source_hash: str, chunk_size: int, chunk_overlap: int, embedding_model: str) -> str:
+    """Index identity: the PDF content plus everything that changes the chunks or their vectors"""
+    payload = json.dumps([source_hash, "CharacterTextSplitter", chunk_size, chunk_overlap, embedding_model])
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def index_path(key: str) -> str:
+    return os.path.join(FAISS_INDEX_DIR, key)
+
+
+def _read_index(key: str, embeddings) -> Optional[FAISS]:
+    path = index_path(key)
+    if not os.path.isfile(os.path.join(path, "meta.json")):
+        return None
+    try:
+        # index.pkl is written by save_index below, never taken from users
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    except TypeError:
+        # LangChain releases before the deserialization opt-in
+        return FAISS.load_local(path, embeddings)
+
+
+def _keep_loaded(key: str, vectorstore: FAISS):
+    """Hold an index as the most recently used one, evicting the least recently used past MAX_LOADED_INDEXES"""
+    with _loaded_lock:
+        _loaded_indexes[key] = vectorstore
+        _loaded_indexes.move_to_end(key)
+        while len(_loaded_indexes) > MAX_LOADED_INDEXES:
+            _loaded_indexes.popitem(last=False)
+
+
+def load_index(key: str, embeddings) -> Optional[FAISS]:
+    """Vector store for an index key, read from disk on first use and then kept in memory"""
+    with _loaded_lock:
+        if key in _loaded_indexes:
+            _loaded_indexes.move_to_end(key)
+            return _loaded_indexes[key]
+    
+    vectorstore = _read_index(key, embeddings)
+    if vectorstore is None:
+        return None
+    _keep_loaded(key, vectorstore)
+    return vectorstore
+
+
+def save_index(key: str, vectorstore: FAISS, meta: Dict):
+    """Write an index atomically: build in a temp dir, then rename into place"""
+    os.makedirs(FAISS_INDEX_DIR, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{key}.", dir=FAISS_INDEX_DIR)
+    try:
+        vectorstore.save_local(staging)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        os.replace(staging, index_path(key))
+    except OSError:
+        # Another process saved the same key first; its copy is identical
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.isdir(index_path(key)):
+            raise
+    _keep_loaded(key, vectorstore)
 
 class RulebookProcessor:
     """Process and extract rules from scheme PDFs using LangChain"""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                 embeddings=None):
         self.api_key = api_key or os.getenv('OPENAI_API_KEY', '')
-        self.embeddings = None
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        # Any LangChain Embeddings; defaults to EMBEDDING_BACKEND behind the chunk cache
+        self.embeddings = embeddings
         self.vectorstore = None
         self.qa_chain = None
+        self.index_key = None
         
     def load_pdf(self, pdf_path: str) -> List[Dict]:
         """Load and extract text from PDF using LangChain"""
@@ -31,54 +122,246 @@ class RulebookProcessor:
         except Exception as e:
             return {"error": f"Failed to load PDF: {str(e)}"}
     
-    def extract_rules(self, documents: List) -> List[Dict]:
-        """Extract eligibility rules from documents"""
-        text_splitter = CharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        texts = text_splitter.split_documents(documents)
+    def iter_pages(self, pdf_path: str) -> Iterator[Document]:
+        """PDF pages one at a time; each page's text is extracted only when it is reached
         
-        rules = []
-        for i, text in enumerate(texts):
-            rule = {
-                "id": f"rule_{i}",
-                "content": text.page_content,
-                "source": text.metadata.get("source", "unknown"),
-                "page": text.metadata.get("page", 0)
-            }
-            rules.append(rule)
+        Reads pypdf directly: PyPDFLoader's lazy_load still extracts every page
+        into a list before yielding the first one.
+        """
+        # For a URL the loader downloads to a temp file it removes once collected; keep it referenced
+        loader = None if os.path.isfile(pdf_path) else PyPDFLoader(pdf_path)
+        reader = PdfReader(loader.file_path if loader else pdf_path)
+        for number, page in enumerate(reader.pages):
+            yield Document(page_content=page.extract_text(), metadata={"source": pdf_path, "page": number})
+    
+    def iter_chunks(self, pages: Iterable[Document]) -> Iterator[Document]:
+        """Chunks page by page (the splitter never joins text across pages)"""
+        splitter = self._splitter()
+        for page in pages:
+            yield from splitter.split_documents([page])
+    
+    def load_stored_rules(self, source_hash: Optional[str]) -> Optional[Dict]:
+        """Stored record for a rulebook PDF already processed (by file content hash)"""
+        if not source_hash:
+            return None
+        record = RuleStore.get(source_hash)
+        if record is None or (record.get("rules") is None and record.get("rule_count") is None):
+            return None
+        # Chunks cut with other parameters are not reusable
+        if record.get("chunking") != self._chunking():
+            return None
+        # The rule list is stored apart from the record; both must be there
+        if record.get("rules") is None and RuleStore.count_rules(source_hash) != record["rule_count"]:
+            return None
+        return record
+    
+    @staticmethod
+    def _stored_rules(record: Dict) -> Iterator[Dict]:
+        """Rules of a stored record (older records hold them inline)"""
+        if record.get("rules") is not None:
+            return iter(record["rules"])
+        return RuleStore.iter_rules(record["source_hash"])
+    
+    def _publish_rules(self, source_hash: str, staging: str, count: int):
+        # No extraction, so build_record compiles no conditions: PDF rules are raw
+        # text chunks for retrieval, and stay uncompiled on purpose
+        record = build_record(source_hash, "pdf", rule_count=count, chunking=self._chunking())
+        if count:
+            RuleStore.put_rules(record, staging)
+        else:
+            RuleStore.put(record)
+    
+    def _chunking(self) -> Dict:
+        return {"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap}
+    
+    def _splitter(self) -> CharacterTextSplitter:
+        return CharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+    
+    def _get_embeddings(self):
+        if self.embeddings is None:
+            self.embeddings = CachedEmbeddings(get_embedding_backend(api_key=self.api_key))
+        return self.embeddings
+    
+    def _index_key(self, source_hash: Optional[str]) -> Optional[str]:
+        if not source_hash:
+            return None
+        return index_key(source_hash, self.chunk_size, self.chunk_overlap, embedding_model_id(self._get_embeddings()))
+    
+    def _index_meta(self, source_hash: str, chunks: int) -> Dict:
+        return {
+            "source_hash": source_hash,
+            **self._chunking(),
+            "embedding_model": embedding_model_id(self._get_embeddings()),
+            "chunks": chunks,
+            "created_at": datetime.utcnow().isoformat()
+        }
+    
+    @staticmethod
+    def _rule(i: int, chunk: Document) -> Dict:
+        return {
+            "id": f"rule_{i}",
+            "content": chunk.page_content,
+            "source": chunk.metadata.get("source", "unknown"),
+            "page": chunk.metadata.get("page", 0)
+        }
+    
+    @staticmethod
+    def _chunk(rule: Dict) -> Document:
+        return Document(page_content=rule["content"], metadata={"source": rule["source"], "page": rule["page"]})
+    
+    def extract_rules(self, documents: List, source_hash: str = None) -> List[Dict]:
+        """Extract eligibility rules from documents (stored under source_hash when given)
         
+        Rules are the text chunks as cut, not condition groups. Compiling them
+        would take an LLM call per chunk inside the ingest pool; conditions come
+        from POST /v2/schemes/{id}/rules/compile on the scheme's rule text.
+        """
+        rules = [self._rule(i, chunk) for i, chunk in enumerate(self.iter_chunks(documents))]
+        
+        if source_hash:
+            staging = RuleStore.staging_key(source_hash)
+            if not rules or RuleStore.append_rules(staging, rules):
+                self._publish_rules(source_hash, staging, len(rules))
         return rules
     
-    def setup_retrieval_chain(self, documents: List):
-        """Setup LangChain retrieval QA chain for eligibility queries"""
+    def ingest(self, pdf_path: str, source_hash: str = None,
+               on_rule: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Single pass over a PDF: each chunk is handed to on_rule and indexed as it is cut
+        
+        Pages are read lazily and chunks are embedded INGEST_FLUSH_CHUNKS at a
+        time, so the first rules are out before the last page is parsed. With a
+        source_hash the rules are appended to the rule store in the same
+        batches, so none are held for the whole PDF. A stored record or saved
+        index for the same source_hash is reused instead of re-parsing or
+        re-embedding.
+        """
+        start = time.perf_counter()
+        embeddings = self._get_embeddings()
+        key = self._index_key(source_hash)
+        stored = self.load_stored_rules(source_hash)
+        saved = load_index(key, embeddings) if key else None
+        if stored is not None:
+            chunks = (self._chunk(rule) for rule in self._stored_rules(stored))
+        else:
+            chunks = self.iter_chunks(self.iter_pages(pdf_path))
+        
+        # Rules go to a staging list batch by batch, published once the PDF is done
+        staging = RuleStore.staging_key(source_hash) if stored is None and source_hash else None
+        pending, batch, pages = [], [], set()
+        state = {"vectorstore": saved, "indexing": saved is None, "first_rule": None, "staging": staging}
+        
+        def flush():
+            if batch and state["staging"] and not RuleStore.append_rules(state["staging"], batch):
+                RuleStore.discard_rules(state["staging"])
+                state["staging"] = None
+            batch.clear()
+            if pending and state["indexing"]:
+                try:
+                    if state["vectorstore"] is None:
+                        state["vectorstore"] = FAISS.from_documents(pending, embeddings)
+                    else:
+                        state["vectorstore"].add_documents(pending)
+                except Exception as e:
+                    # Rules still go out; the rulebook is just not queryable
+                    print(f"Error indexing chunks: {str(e)}", file=sys.stderr)
+                    state["vectorstore"], state["indexing"] = None, False
+            pending.clear()
+        
+        total = 0
         try:
-            text_splitter = CharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200
-            )
-            texts = text_splitter.split_documents(documents)
-            
-            # Initialize embeddings and vector store
-            self.embeddings = OpenAIEmbeddings(openai_api_key=self.api_key)
-            self.vectorstore = FAISS.from_documents(texts, self.embeddings)
+            for total, chunk in enumerate(chunks, start=1):
+                rule = self._rule(total - 1, chunk)
+                if state["first_rule"] is None:
+                    state["first_rule"] = time.perf_counter() - start
+                if state["staging"]:
+                    batch.append(rule)
+                if on_rule is not None:
+                    on_rule(rule)
+                pages.add(rule["page"])
+                pending.append(chunk)
+                if len(pending) >= INGEST_FLUSH_CHUNKS:
+                    flush()
+            flush()
+        except BaseException:
+            if state["staging"]:
+                RuleStore.discard_rules(state["staging"])
+            raise
+        
+        if state["staging"]:
+            self._publish_rules(source_hash, state["staging"], total)
+        self.vectorstore = state["vectorstore"]
+        if key and saved is None and self.vectorstore is not None:
+            save_index(key, self.vectorstore, self._index_meta(source_hash, total))
+        
+        ready = False
+        if self.vectorstore is not None:
+            self.index_key = key
+            try:
+                self._build_chain()
+                ready = True
+            except Exception as e:
+                print(f"Error setting up chain: {str(e)}", file=sys.stderr)
+        
+        return {
+            "total_rules": total,
+            "pages": len(pages),
+            "cached": stored is not None,
+            "index_cached": saved is not None,
+            "index_key": self.index_key,
+            "processor_status": "initialized" if ready else "retrieval unavailable",
+            "first_rule_seconds": round(state["first_rule"] or 0.0, 3),
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+    
+    def _build_chain(self):
+        llm = OpenAI(temperature=0, openai_api_key=self.api_key)
+        self.qa_chain = RetrievalQA.from_chain_type(
+            llm=llm,
+            chain_type="stuff",
+            retriever=self.vectorstore.as_retriever()
+        )
+    
+    def setup_retrieval_chain(self, documents: List, source_hash: str = None) -> bool:
+        """Setup LangChain retrieval QA chain for eligibility queries
+        
+        With a source_hash the index is saved under index_key(...) and reused
+        by later calls for the same PDF and chunking instead of re-embedding.
+        """
+        try:
+            embeddings = self._get_embeddings()
+            key = self._index_key(source_hash)
+            self.vectorstore = load_index(key, embeddings) if key else None
             
-            # Setup QA chain
-            llm = OpenAI(temperature=0, openai_api_key=self.api_key)
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=llm,
-                chain_type="stuff",
-                retriever=self.vectorstore.as_retriever()
-            )
+            if self.vectorstore is None:
+                texts = list(self.iter_chunks(documents))
+                self.vectorstore = FAISS.from_documents(texts, embeddings)
+                if key:
+                    save_index(key, self.vectorstore, self._index_meta(source_hash, len(texts)))
             
+            self.index_key = key
+            self._build_chain()
+            return True
+        except Exception as e:
+            print(f"Error setting up chain: {str(e)}", file=sys.stderr)
+            return False
+    
+    def attach_index(self, key: str) -> bool:
+        """Setup the QA chain on a saved index, without the PDF or any embedding calls"""
+        try:
+            self.vectorstore = load_index(key, self._get_embeddings())
+            if self.vectorstore is None:
+                return False
+            self.index_key = key
+            self._build_chain()
             return True
         except Exception as e:
-            print(f"Error setting up chain: {str(e)}")
+            print(f"Error attaching index {key}: {str(e)}", file=sys.stderr)
             return False
     
-    def query_eligibility(self, query: str) -> Dict:
-        """Query the LangChain for eligibility information"""
+    def query_eligibility(self, query: str, index_key: str = None) -> Dict:
+        """Query the LangChain for eligibility information (attaching to a saved index if given)"""
+        if index_key and index_key != self.index_key and not self.attach_index(index_key):
+            return {"error": f"Index {index_key} not found"}
         if not self.qa_chain:
             return {"error": "QA chain not initialized"}
         
@@ -92,28 +375,24 @@ class RulebookProcessor:
             return {"error": f"Query failed: {str(e)}"}
 
 
-def process_rulebook_pdf(pdf_url: str, api_key: str = None) -> Dict:
-    """Main function to process a rulebook PDF and extract rules"""
+def process_rulebook_pdf(pdf_url: str, api_key: str = None,
+                         on_rule: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """Main function to process a rulebook PDF and extract rules
+    
+    With on_rule each rule is passed on as soon as it is cut and the result
+    holds only the summary; without it the rules are collected into "rules".
+    """
     processor = RulebookProcessor(api_key)
+    collected = [] if on_rule is None else None
     
     try:
-        # Load PDF
-        documents = processor.load_pdf(pdf_url)
-        if isinstance(documents, dict) and "error" in documents:
-            return documents
-        
-        # Extract rules
-        rules = processor.extract_rules(documents)
-        
-        # Setup retrieval chain
-        processor.setup_retrieval_chain(documents)
-        
-        return {
-            "success": True,
-            "total_rules": len(rules),
-            "rules": rules,
-            "processor_status": "initialized"
-        }
+        # An unchanged rulebook is served from the rule store and saved index without re-parsing
+        source_hash = file_hash(pdf_url) if os.path.isfile(pdf_url) else None
+        summary = processor.ingest(pdf_url, source_hash, on_rule or collected.append)
+        result = {"success": True, **summary}
+        if collected is not None:
+            result["rules"] = collected
+        return result
     except Exception as e:
         return {
             "success": False,
@@ -122,5 +401,10 @@ def process_rulebook_pdf(pdf_url: str, api_key: str = None) -> Dict:
 
 
 if __name__ == "__main__":
-    # Test the integration
-    print("LangChain integration loaded and ready")
+    # python langchain_integration.py <pdf path> -> JSON lines on stdout:
+    # {"rule": {...}} per chunk as it is cut, then {"result": {...summary}}
+    if len(sys.argv) > 1:
+        emit = lambda line: print(json.dumps(line), flush=True)
+        emit({"result": process_rulebook_pdf(sys.argv[1], on_rule=lambda rule: emit({"rule": rule}))})
+    else:
+        print("LangChain integration loaded and ready")
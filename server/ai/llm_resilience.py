@@ -0,0 +1,290 @@
+"""
+LLM Call Resilience for Docu-Agent
+Bounded concurrency, per-call timeouts, jittered retries and a circuit breaker for model calls
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, List, Tuple
+import logging
+
+from cache_metrics import Histogram, render_histogram_series, render_series
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:  # google-api-core ships with google-generativeai
+    google_exceptions = None
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', 8))
+CALL_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', 30))
+MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', 2))
+RETRY_BASE_DELAY = float(os.getenv('GEMINI_RETRY_BASE_DELAY', 0.5))
+RETRY_MAX_DELAY = 8.0
+BREAKER_FAILURES = int(os.getenv('GEMINI_BREAKER_FAILURES', 5))
+BREAKER_RESET = float(os.getenv('GEMINI_BREAKER_RESET', 30))
+
+# Rate limiting, overload and network errors are worth another attempt; bad requests are not
+TRANSIENT_ERRORS = (asyncio.TimeoutError, TimeoutError, ConnectionError)
+if google_exceptions is not None:
+    TRANSIENT_ERRORS += (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+    )
+
+
+# Time to first token / whole generation (seconds); +Inf is implicit
+TTFT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0)
+GENERATION_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+MODEL_METRIC_PREFIX = "docu_llm"
+# Marks the end of a blocking stream iterated from a worker thread
+_STREAM_END = object()
+
+
+def is_transient(error: BaseException) -> bool:
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Full-jitter exponential backoff, so retrying callers do not stampede together"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class ModelMetrics:
+    """Streaming model call instrumentation keyed by operation (e.g. chatbot)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ttft: Dict[str, Histogram] = {}
+        self.generation: Dict[str, Histogram] = {}
+        # (operation, outcome) -> count, outcome in completed/failed/cancelled
+        self.streams: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def record_ttft(self, operation: str, seconds: float):
+        with self._lock:
+            if operation not in self.ttft:
+                self.ttft[operation] = Histogram(TTFT_BUCKETS)
+            self.ttft[operation].observe(seconds)
+
+    def record_stream(self, operation: str, outcome: str, seconds: float):
+        with self._lock:
+            self.streams[(operation, outcome)] += 1
+            if outcome == "completed":
+                if operation not in self.generation:
+                    self.generation[operation] = Histogram(GENERATION_BUCKETS)
+                self.generation[operation].observe(seconds)
+
+    def summary(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                operation: {
+                    "ttft_p50_ms": histogram.quantile(0.5) * 1000,
+                    "ttft_p99_ms": histogram.quantile(0.99) * 1000,
+                    "ttft_mean_ms": round(histogram.sum / histogram.count * 1000, 1),
+                    "streams": {outcome: n for (op, outcome), n in self.streams.items() if op == operation}
+                }
+                for operation, histogram in self.ttft.items()
+            }
+
+    def render(self) -> List[str]:
+        """Prometheus lines to append to the cache metrics"""
+        with self._lock:
+            lines = render_histogram_series("ttft_seconds", "Time from request to first streamed token",
+                                            self.ttft, "operation", prefix=MODEL_METRIC_PREFIX)
+            lines += render_histogram_series("generation_seconds", "Duration of completed streamed generations",
+                                             self.generation, "operation", prefix=MODEL_METRIC_PREFIX)
+            lines += render_series("streams_total", "Streamed generations by outcome",
+                                   {f"{op}/{outcome}": n for (op, outcome), n in self.streams.items()},
+                                   "stream", kind="counter", prefix=MODEL_METRIC_PREFIX)
+            return lines
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the model while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive transient failures
+
+    While open, calls fail fast. After `reset_timeout` a single probe is let
+    through (half-open); its success closes the breaker, its failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def release_probe(self):
+        """End a half-open probe without a verdict, so the next call probes again"""
+        with self._lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None and not self.probing:
+                return  # Already open; calls still in flight do not extend it
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self.probing = False
+                self.times_opened += 1
+                logger.warning(f"Model circuit opened after {self.failures} failures")
+
+
+class ResilientModel:
+    """Async front for a generative model: semaphore, timeout, retries, breaker
+
+    Uses the model's generate_content_async when it has one, otherwise runs the
+    blocking generate_content in a worker thread. A timed-out thread call keeps
+    its thread until the SDK returns, so the semaphore also bounds those threads.
+    """
+
+    def __init__(self, model: Any, max_concurrency: int = MAX_CONCURRENCY, timeout: float = CALL_TIMEOUT,
+                 max_retries: int = MAX_RETRIES, breaker: CircuitBreaker = None):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "timeouts": 0,
+                      "failures": 0, "short_circuited": 0}
+
+    async def _attempt(self, prompt: str):
+        generate_async = getattr(self.model, "generate_content_async", None)
+        if generate_async is not None:
+            return await asyncio.wait_for(generate_async(prompt), self.timeout)
+        return await asyncio.wait_for(asyncio.to_thread(self.model.generate_content, prompt), self.timeout)
+
+    async def generate_content(self, prompt: str):
+        """Model response, or CircuitOpenError / the last error once retries are exhausted"""
+        self.stats["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            async with self.semaphore:
+                # Checked after queueing, so callers waiting on the semaphore fail fast once it opens
+                if not self.breaker.allow():
+                    self.stats["short_circuited"] += 1
+                    raise CircuitOpenError("Model circuit is open")
+                self.stats["attempts"] += 1
+                try:
+                    response = await self._attempt(prompt)
+                except Exception as e:
+                    error = e
+                else:
+                    self.breaker.record_success()
+                    return response
+
+            if not is_transient(error):
+                # The request itself was bad: neither a success nor a failure of the service
+                self.breaker.release_probe()
+                self.stats["failures"] += 1
+                raise error
+            if isinstance(error, asyncio.TimeoutError):
+                self.stats["timeouts"] += 1
+            self.breaker.record_failure()
+            if attempt == self.max_retries or self.breaker.state == "open":
+                self.stats["failures"] += 1
+                raise error
+            self.stats["retries"] += 1
+            await asyncio.sleep(backoff_delay(attempt))
+
+    async def _open_stream(self, prompt: str) -> AsyncIterator:
+        """Async iterator over response chunks, from the async SDK or a blocking stream in a thread"""
+        generate_async = getattr(self.model, "generate_content_async", None)
+        if generate_async is not None:
+            return (await generate_async(prompt, stream=True)).__aiter__()
+        chunks = iter(await asyncio.to_thread(self.model.generate_content, prompt, stream=True))
+
+        async def from_thread():
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, _STREAM_END)
+                if chunk is _STREAM_END:
+                    return
+                yield chunk
+        return from_thread()
+
+    async def stream_content(self, prompt: str) -> AsyncIterator:
+        """Response chunks as they arrive, under the same semaphore, breaker and retry policy
+        
+        Only opening the stream and waiting for the first chunk are retried;
+        once a chunk has been yielded an error ends the stream. `timeout` applies
+        to the first chunk and to each gap between chunks.
+        """
+        self.stats["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            async with self.semaphore:
+                if not self.breaker.allow():
+                    self.stats["short_circuited"] += 1
+                    raise CircuitOpenError("Model circuit is open")
+                self.stats["attempts"] += 1
+                try:
+                    chunks = await asyncio.wait_for(self._open_stream(prompt), self.timeout)
+                    first = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    self.breaker.record_success()
+                    return
+                except Exception as e:
+                    error = e
+                else:
+                    self.breaker.record_success()
+                    yield first
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                        except StopAsyncIteration:
+                            return
+                        yield chunk
+
+            if not is_transient(error):
+                self.breaker.release_probe()
+                self.stats["failures"] += 1
+                raise error
+            if isinstance(error, asyncio.TimeoutError):
+                self.stats["timeouts"] += 1
+            self.breaker.record_failure()
+            if attempt == self.max_retries or self.breaker.state == "open":
+                self.stats["failures"] += 1
+                raise error
+            self.stats["retries"] += 1
+            await asyncio.sleep(backoff_delay(attempt))
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "breaker": self.breaker.state, "breaker_opened": self.breaker.times_opened}
+
+
+# Process-wide streaming metrics, exported on /metrics next to the cache metrics
+model_metrics = ModelMetrics()
@@ -0,0 +1,62 @@
+"""
+Local Embeddings for Docu-Agent
+Deterministic hashing-vectorizer embeddings that need no model download or API key
+"""
+
+import math
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+try:
+    from langchain.embeddings.base import Embeddings
+except ImportError:  # LangChain is only needed to plug these into its vector stores
+    Embeddings = object
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbeddings(Embeddings):
+    """Feature-hashed bag of words, word bigrams and character trigrams, L2-normalized
+
+    Exposes LangChain's Embeddings methods (embed_documents / embed_query), so
+    it can stand in for OpenAIEmbeddings offline and in tests. Hashing uses
+    crc32, so vectors are identical across processes and restarts.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.model_name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        words = TOKEN_PATTERN.findall(text.casefold())
+        features = [f"w:{word}" for word in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), dim) float32 matrix of unit vectors (zero rows for empty text)"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature in self._features(text):
+                digest = zlib.crc32(feature.encode())
+                # Low bits pick the column, one high bit the sign, so collisions tend to cancel
+                index = (digest % self.dim, -1.0 if digest & 0x80000000 else 1.0)
+                counts[index] = counts.get(index, 0) + 1
+            for (column, sign), count in counts.items():
+                matrix[row, column] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text])[0].tolist()
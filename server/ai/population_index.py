@@ -0,0 +1,174 @@
+"""
+Population Index for Docu-Agent
+Bitmap and sorted-array indexes over a columnar profile snapshot for reverse eligibility
+"""
+
+import math
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Tuple
+import logging
+
+from eligibility_engine import (
+    FIELD_MAP,
+    OPERATORS,
+    OP_EQUALS,
+    OP_GREATER_THAN,
+    OP_INCLUDES,
+    OP_LESS_THAN,
+    OP_NOT_EQUALS,
+    OP_UNKNOWN,
+    PROFILE_FIELDS,
+    ProfileColumns,
+    parse_between,
+    to_number,
+    to_text,
+)
+
+logger = logging.getLogger(__name__)
+
+# Fields with at most this many distinct values get eager per-value bitmaps
+BITMAP_CARDINALITY = 1024
+
+
+class PopulationIndex:
+    """Answers "which users qualify for this scheme?" over a ProfileColumns snapshot
+
+    Bitmaps are NumPy packed bit arrays (one bit per profile). Categorical
+    conditions read per-value bitmaps; numeric conditions slice a sorted
+    permutation of the field. The pad bits past `size` are never read.
+    """
+
+    def __init__(self, columns: ProfileColumns):
+        self.columns = columns
+        self.size = columns.size
+        self.built_at = datetime.utcnow().isoformat()
+        self._bitmaps: Dict[Tuple[str, int], np.ndarray] = {}
+        self._present: Dict[str, np.ndarray] = {}
+        # field -> (profile positions sorted by value, sorted values), NaN excluded
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+        for field in PROFILE_FIELDS:
+            codes = columns.codes[field]
+            self._present[field] = np.packbits(codes >= 0)
+
+            numeric = columns.numeric[field]
+            valid = np.flatnonzero(~np.isnan(numeric))
+            if len(valid):
+                order = valid[np.argsort(numeric[valid], kind='stable')]
+                self._sorted[field] = (order, numeric[order])
+
+            if len(columns.vocab[field]) <= BITMAP_CARDINALITY:
+                for code in range(len(columns.vocab[field])):
+                    self._bitmaps[(field, code)] = np.packbits(codes == code)
+
+        logger.info(f"Population index built ({self.size} profiles, {len(self._bitmaps)} bitmaps)")
+
+    @classmethod
+    def from_profiles(cls, profiles: List[Dict]) -> 'PopulationIndex':
+        return cls(ProfileColumns(profiles))
+
+    def _empty(self) -> np.ndarray:
+        return np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _full(self) -> np.ndarray:
+        return np.full((self.size + 7) // 8, 0xFF, dtype=np.uint8)
+
+    def _from_positions(self, positions: np.ndarray) -> np.ndarray:
+        bits = np.zeros(self.size, dtype=bool)
+        bits[positions] = True
+        return np.packbits(bits)
+
+    def _value_bitmap(self, field: str, code: int) -> np.ndarray:
+        bitmap = self._bitmaps.get((field, code))
+        if bitmap is None:
+            bitmap = np.packbits(self.columns.codes[field] == code)
+        return bitmap
+
+    def row_bitmap(self, condition: Dict) -> np.ndarray:
+        """Bitmap of profiles passing one condition row"""
+        attr = FIELD_MAP.get(condition.get('field'))
+        op = OPERATORS.get(condition.get('operator'), OP_UNKNOWN)
+        if not attr or op == OP_UNKNOWN:
+            return self._empty()
+
+        value = condition.get('value')
+        if op in (OP_EQUALS, OP_NOT_EQUALS):
+            code = self.columns.lookup[attr].get(to_text(value).lower())
+            if op == OP_EQUALS:
+                return self._empty() if code is None else self._value_bitmap(attr, code)
+            if code is None:
+                return self._present[attr]
+            return self._present[attr] & ~self._value_bitmap(attr, code)
+
+        if op == OP_INCLUDES:
+            needle = to_text(value).lower()
+            vocab = self.columns.vocab[attr]
+            matches = [code for code, text in enumerate(vocab) if needle in text]
+            if len(vocab) <= BITMAP_CARDINALITY:
+                bitmap = self._empty()
+                for code in matches:
+                    bitmap |= self._bitmaps[(attr, code)]
+                return bitmap
+            vocab_pass = np.zeros(len(vocab) + 1, dtype=bool)
+            vocab_pass[matches] = True
+            return np.packbits(vocab_pass[self.columns.codes[attr]])
+
+        # Numeric operators slice the sorted permutation (NaN never passes)
+        if attr not in self._sorted:
+            return self._empty()
+        order, values = self._sorted[attr]
+        if op == OP_LESS_THAN:
+            threshold = to_number(value)
+            if math.isnan(threshold):
+                return self._empty()
+            return self._from_positions(order[:np.searchsorted(values, threshold, 'left')])
+        if op == OP_GREATER_THAN:
+            threshold = to_number(value)
+            if math.isnan(threshold):
+                return self._empty()
+            return self._from_positions(order[np.searchsorted(values, threshold, 'right'):])
+
+        low, high = parse_between(value)
+        if math.isnan(low) or math.isnan(high):
+            return self._empty()
+        start = np.searchsorted(values, low, 'left')
+        stop = np.searchsorted(values, high, 'right')
+        return self._from_positions(order[start:stop])
+
+    def scheme_bitmap(self, scheme: Dict) -> np.ndarray:
+        """Bitmap of profiles eligible for a scheme (every group passes)"""
+        result = self._full()
+        for group in scheme.get('conditions') or []:
+            rows = group.get('rows') or []
+            is_or = group.get('joiner') == 'OR'
+            if not rows:
+                # Array.some on no rows fails for everyone; Array.every passes
+                if is_or:
+                    return self._empty()
+                continue
+
+            group_bitmap = self.row_bitmap(rows[0]).copy()
+            for row in rows[1:]:
+                if is_or:
+                    group_bitmap |= self.row_bitmap(row)
+                else:
+                    group_bitmap &= self.row_bitmap(row)
+            result &= group_bitmap
+        return result
+
+    def eligible_positions(self, scheme: Dict) -> np.ndarray:
+        """Snapshot positions of eligible profiles, in snapshot order"""
+        return np.flatnonzero(np.unpackbits(self.scheme_bitmap(scheme), count=self.size))
+
+    def eligible_users(self, scheme: Dict) -> List[str]:
+        user_ids = self.columns.user_ids
+        return [user_ids[i] for i in self.eligible_positions(scheme).tolist()]
+
+    def get_stats(self) -> Dict:
+        return {
+            "profiles": self.size,
+            "bitmaps": len(self._bitmaps),
+            "bitmap_bytes": sum(b.nbytes for b in self._bitmaps.values()),
+            "built_at": self.built_at
+        }
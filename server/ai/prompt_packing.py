@@ -0,0 +1,89 @@
+"""
+Prompt Packing for Docu-Agent
+Packs many items into one model request under a token budget and splits the answer back out
+"""
+
+import json
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+# Tokens per request for the packed prompt (shared part + items); the response needs headroom too
+PROMPT_TOKEN_BUDGET = int(os.getenv('GEMINI_PROMPT_TOKEN_BUDGET', 6000))
+MAX_ITEMS_PER_PROMPT = int(os.getenv('GEMINI_MAX_ITEMS_PER_PROMPT', 20))
+# Instructions and result schema around the packed items
+PROMPT_OVERHEAD_TOKENS = 150
+
+ITEM_HEADER = "### {label}: {item_id}"
+CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+# Free-text segments (e.g. translations) are delimited by marker lines the model copies through
+SEGMENT_MARKER = "<<<{item_id}>>>"
+SEGMENT_SPLIT = re.compile(r"^[ \t]*<<<([^<>\n]+)>>>[ \t]*$", re.MULTILINE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting"""
+    return len(text) // 4 + 1
+
+
+def pack_items(items: Dict[str, str], shared_tokens: int, budget: int = PROMPT_TOKEN_BUDGET,
+               max_items: int = MAX_ITEMS_PER_PROMPT) -> List[List[str]]:
+    """Greedily group item ids so each group's prompt stays within the token budget
+
+    An item too large to share a prompt gets a group of its own.
+    """
+    packs, current, used = [], [], shared_tokens + PROMPT_OVERHEAD_TOKENS
+    for item_id, text in items.items():
+        cost = estimate_tokens(text) + 10
+        if current and (used + cost > budget or len(current) >= max_items):
+            packs.append(current)
+            current, used = [], shared_tokens + PROMPT_OVERHEAD_TOKENS
+        current.append(item_id)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def strip_code_fence(text: str) -> str:
+    """Model JSON answers often come wrapped in ```json fences"""
+    return CODE_FENCE.sub("", text.strip())
+
+
+def format_items(label: str, items: Dict[str, str]) -> str:
+    """Items under delimiter headers the model is asked to echo back as result keys"""
+    return "\n\n".join(f"{ITEM_HEADER.format(label=label, item_id=item_id)}\n{text}" for item_id, text in items.items())
+
+
+def split_results(text: str, item_ids: List[str],
+                  is_valid: Optional[Callable[[Dict], bool]] = None) -> Dict[str, Dict]:
+    """Per-item results from a packed JSON answer; missing or malformed items are left out"""
+    try:
+        parsed = json.loads(strip_code_fence(text))
+    except (ValueError, TypeError):
+        return {}
+    if isinstance(parsed, dict) and isinstance(parsed.get("results"), list):
+        parsed = parsed["results"]
+    if isinstance(parsed, list):
+        parsed = {str(entry.get("id")): entry for entry in parsed if isinstance(entry, dict)}
+    if not isinstance(parsed, dict):
+        return {}
+
+    results = {}
+    for item_id in item_ids:
+        result = parsed.get(str(item_id))
+        if isinstance(result, dict) and (is_valid is None or is_valid(result)):
+            results[item_id] = result
+    return results
+
+
+def format_segments(items: Dict[str, str]) -> str:
+    """Free-text items, each under its own marker line"""
+    return "\n".join(f"{SEGMENT_MARKER.format(item_id=item_id)}\n{text}" for item_id, text in items.items())
+
+
+def split_segments(text: str, item_ids: List[str]) -> Dict[str, str]:
+    """Segments of a packed free-text answer by marker; missing or empty segments are left out"""
+    parts = SEGMENT_SPLIT.split(strip_code_fence(text))
+    found = {marker.strip(): segment.strip() for marker, segment in zip(parts[1::2], parts[2::2])}
+    return {item_id: found[str(item_id)] for item_id in item_ids if found.get(str(item_id))}
@@ -3,24 +3,386 @@ Redis Cache Manager for Docu-Agent
 Handles caching of eligibility checks, rules, and user data
 """
 
+import asyncio
+import hashlib
 import redis
+import redis.asyncio
 import json
-import pickle
-from functools import wraps
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import partial, wraps
 import os
-from typing import Any, Callable, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 import logging
 
+from cache_codec import CacheCodec, CodecError, get_codec
+from cache_metrics import cache_metrics, render_series
+
 logger = logging.getLogger(__name__)
 
-class RedisCache:
-    """Redis cache client wrapper"""
+INVALIDATION_CHANNEL = "cache:invalidate"
+LOCK_PREFIX = "lock:"
+GENERATION_PREFIX = "gen:"
+# Keys per SCAN page / UNLINK call, and the pause between batches, when sweeping orphaned generations
+CLEANUP_BATCH = 500
+CLEANUP_PAUSE = 0.01
+# Translations do not go stale with scheme changes, so the memory keeps them for a month
+TRANSLATION_TTL = int(os.getenv('TRANSLATION_TTL', 30 * 86400))
+
+# Namespaces cleared by clear() without arguments; @cached registers its prefixes here
+cache_namespaces = {"eligibility", "rule", "query", "translation", "app"}
+# Compare-and-delete, so a holder whose lock already expired can't release the next holder's
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class LocalCache:
+    """In-process LRU tier bounded by entry count and bytes, with per-entry expiry
+    
+    Entries hold the serialized bytes, so callers always get a fresh object.
+    """
+    
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024, max_ttl: int = 60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Upper bound on local staleness should an invalidation message be missed
+        self.max_ttl = max_ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            data, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+    
+    def set(self, key: str, data: bytes, ttl: float):
+        ttl = min(ttl, self.max_ttl)
+        if ttl <= 0 or len(data) > self.max_bytes:
+            self.delete(key)
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (data, time.monotonic() + ttl)
+            self._bytes += len(data)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+    
+    def delete(self, key: str):
+        with self._lock:
+            self._drop(key)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+    
+    def get_stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes
+        }
+
+class GenerationTable:
+    """Process-local copy of namespace and tag generation counters
+    
+    A counter is re-read from Redis once it is older than `max_age` seconds,
+    or updated at once when a bump is announced on the invalidation channel.
+    Values only move forward.
+    """
+    
+    def __init__(self, max_age: float = 1.0):
+        self.max_age = max_age
+        self._values: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+    
+    def lookup(self, counters: Iterable[str]) -> Tuple[Dict[str, int], List[str]]:
+        """(known generations, counters that need a Redis read)"""
+        now = time.monotonic()
+        known, missing = {}, []
+        with self._lock:
+            for counter in counters:
+                entry = self._values.get(counter)
+                if entry is not None and now - entry[1] < self.max_age:
+                    known[counter] = entry[0]
+                else:
+                    missing.append(counter)
+        return known, missing
+    
+    def update(self, generations: Dict[str, int]):
+        now = time.monotonic()
+        with self._lock:
+            for counter, generation in generations.items():
+                entry = self._values.get(counter)
+                self._values[counter] = (max(generation, entry[0]) if entry else generation, now)
+
+def namespace_counter(namespace: str) -> str:
+    return f"{GENERATION_PREFIX}ns:{namespace}"
+
+def tag_counter(tag: str) -> str:
+    return f"{GENERATION_PREFIX}tag:{tag}"
+
+def scheme_tag(scheme_id: str) -> str:
+    """Tag for entries derived from one scheme"""
+    return f"scheme={scheme_id}"
+
+def _key_head(key: str) -> str:
+    return key.split(':', 1)[0]
+
+class _TieredCache:
+    """State shared by the sync and async clients: codec, local tier, generations and invalidation handling
+    
+    Logical keys are `{namespace}:{rest}`. In Redis they are stored as
+    `{namespace}@{gen}|{tag}@{gen}...:{rest}` (the `@0` of a namespace that
+    was never invalidated is omitted), so bumping a namespace or tag counter
+    orphans every entry under it in O(1). Tags must not contain ':', '|' or '@'.
+    """
+    
+    def __init__(self, local_cache: Optional[LocalCache] = None, codec: Optional[CacheCodec] = None):
+        self.local = local_cache
+        self.codec = codec or get_codec()
+        self.generations = GenerationTable(float(os.getenv('REDIS_GENERATION_TTL', 1.0)))
+        self.redis_hits = 0
+        self.redis_misses = 0
+        # Identifies this client's own invalidation messages
+        self.instance_id = uuid.uuid4().hex
+    
+    def _on_invalidate(self, message: dict):
+        try:
+            payload = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if payload.get("origin") == self.instance_id:
+            return
+        if payload.get("generations"):
+            self.generations.update(payload["generations"])
+        if self.local is None:
+            return
+        if payload.get("all"):
+            self.local.clear()
+            return
+        for key in payload.get("keys", []):
+            self.local.delete(key)
+    
+    def _invalidation_message(self, keys: Iterable[str], all_keys: bool,
+                              generations: Optional[Dict[str, int]] = None) -> str:
+        return json.dumps({"origin": self.instance_id, "keys": list(keys), "all": all_keys,
+                           "generations": generations or {}})
+    
+    @staticmethod
+    def _metric_prefix(key: str) -> str:
+        """Metrics label for a logical key (namespaces outside cache_namespaces count as other)"""
+        namespace = key.partition(':')[0]
+        return namespace if namespace in cache_namespaces else "other"
+    
+    @staticmethod
+    def _counters_for(keys: Iterable[str], tags: Iterable[str]) -> List[str]:
+        counters = {namespace_counter(_key_head(key)) for key in keys}
+        counters.update(tag_counter(tag) for tag in tags)
+        return list(counters)
+    
+    @staticmethod
+    def _physical_key(key: str, generations: Dict[str, int], tags: Iterable[str]) -> str:
+        namespace, sep, rest = key.partition(':')
+        generation = generations.get(namespace_counter(namespace), 0)
+        head = f"{namespace}@{generation}" if generation else namespace
+        for tag in tags:
+            head += f"|{tag}@{generations.get(tag_counter(tag), 0)}"
+        return f"{head}{sep}{rest}"
+    
+    @staticmethod
+    def _head_generations(key: str) -> Dict[str, int]:
+        """Counters a stored key was written under, parsed from its head"""
+        parts = _key_head(key).split('|')
+        namespace, _, generation = parts[0].partition('@')
+        generations = {namespace_counter(namespace): int(generation or 0)}
+        for part in parts[1:]:
+            tag, _, generation = part.rpartition('@')
+            generations[tag_counter(tag)] = int(generation or 0)
+        return generations
+    
+    @staticmethod
+    def _cleanup_match(counter: str) -> str:
+        """SCAN pattern covering the stored keys a counter applies to"""
+        kind, _, name = counter[len(GENERATION_PREFIX):].partition(':')
+        # Tags like `scheme=a*` must match literally, not as a glob
+        name = re.sub(r'([*?\[\]\\])', r'\\\1', name)
+        if kind == "ns":
+            return f"{name}[:@|]*"
+        return f"*|{name}@*"
+    
+    @staticmethod
+    def _is_superseded(written: Dict[str, int], current: Dict[str, int]) -> bool:
+        # Only strictly older generations are dropped; a newer one means our table lags
+        return any(generation < current.get(counter, 0) for counter, generation in written.items())
+    
+    def _learn_generations(self, generations: Dict[str, int], counters: List[str],
+                           values: Iterable[Optional[bytes]]) -> Dict[str, int]:
+        """Merge counters just read from Redis into `generations` and the process-wide table"""
+        fetched = {counter: int(value or 0) for counter, value in zip(counters, values)}
+        self.generations.update(fetched)
+        generations.update(fetched)
+        return generations
+    
+    @classmethod
+    def _physical_keys(cls, keys: List[str], tags: List[str], generations: Dict[str, int]) -> List[str]:
+        return [cls._physical_key(key, generations, tags) for key in keys]
+    
+    def _local_reads(self, prefix: str, logical: Dict[str, str], use_local: bool) -> Tuple[Dict[str, Any], List[str]]:
+        """Values held by the local tier (by logical key), and the stored keys left for Redis"""
+        if not use_local:
+            return {}, list(logical)
+        
+        results, pending = {}, []
+        for key, name in logical.items():
+            data = self.local.get(key)
+            if data is not None:
+                results[name] = self.codec.decode(data)
+            else:
+                pending.append(key)
+        cache_metrics.record_lookup(prefix, "local", hits=len(results))
+        return results, pending
+    
+    def _redis_reads(self, prefix: str, logical: Dict[str, str], pending: List[str], values: List[Optional[bytes]],
+                     pttls: List[Optional[int]], results: Dict[str, Any]) -> List[str]:
+        """Decode Redis replies into `results`, copying hits into the local tier when their TTL was fetched
+        
+        Returns the undecodable entries (old frame versions, pickle); the caller deletes them and they count as misses.
+        """
+        dropped = []
+        hits = 0
+        for key, data, pttl in zip(pending, values, pttls):
+            if not data:
+                continue
+            try:
+                value = self.codec.decode(data)
+            except CodecError as e:
+                logger.info(f"Dropping cache entry {key}: {e}")
+                dropped.append(key)
+                self._forget_local([key])
+                continue
+            if value is None:
+                continue
+            hits += 1
+            if pttl and pttl > 0:
+                self.local.set(key, data, pttl / 1000)
+            results[logical[key]] = value
+        
+        self.redis_hits += hits
+        self.redis_misses += len(pending) - hits
+        cache_metrics.record_lookup(prefix, "redis", hits=hits, misses=len(pending) - hits)
+        return dropped
+    
+    def _encode_many(self, keys: List[str], values: Iterable[Any]) -> Dict[str, bytes]:
+        return {key: self.codec.encode(value) for key, value in zip(keys, values)}
+    
+    def _wrote(self, prefix: str, op: str, start: float, encoded: Dict[str, bytes], ttl: int, local: bool):
+        """Metrics and local-tier update once a write has reached Redis"""
+        self._record_latency(prefix, op, start)
+        cache_metrics.record_sizes(prefix, [len(data) for data in encoded.values()])
+        if self.local is None:
+            return
+        for key, data in encoded.items():
+            if local:
+                self.local.set(key, data, ttl)
+            else:
+                self.local.delete(key)
+    
+    def _forget_local(self, keys: Iterable[str]):
+        if self.local is not None:
+            for key in keys:
+                self.local.delete(key)
+    
+    def _cleared(self, namespaces: List[str]):
+        if self.local is not None:
+            self.local.clear()
+        logger.info(f"Cache cleared ({', '.join(namespaces)})")
+    
+    @staticmethod
+    def _record_latency(prefix: str, op: str, start: float):
+        cache_metrics.record_latency(prefix, op, time.perf_counter() - start)
+    
+    @staticmethod
+    def _record_error(prefix: str, op: str, error: Exception):
+        cache_metrics.record_error(prefix, op)
+        logger.error(f"Cache {op} failed: {error}")
+    
+    @staticmethod
+    def _namespaces_or_all(namespaces: Optional[Iterable[str]]) -> List[str]:
+        return list(namespaces) if namespaces is not None else sorted(cache_namespaces)
+    
+    def _tier_stats(self) -> dict:
+        tiers = {"redis": {"hits": self.redis_hits, "misses": self.redis_misses}}
+        if self.local is not None:
+            tiers["local"] = self.local.get_stats()
+        return tiers
+    
+    def _stats(self, info: dict) -> dict:
+        return {
+            "memory_used": info.get('used_memory_human', 'N/A'),
+            "connected_clients": info.get('connected_clients', 0),
+            "total_commands": info.get('total_commands_processed', 0),
+            "tiers": self._tier_stats(),
+            "single_flight": single_flight_stats.get_stats(),
+            "prefixes": cache_metrics.summary(),
+            "status": "connected"
+        }
+    
+    
+    def prometheus_metrics(self, extra: Iterable[str] = ()) -> str:
+        """Per-prefix metrics plus this client's local tier and single-flight counters, as Prometheus text"""
+        extra = list(extra) + render_series("single_flight_total", "@cached recomputation coalescing events",
+                              single_flight_stats.get_stats(), "event", kind="counter")
+        if self.local is not None:
+            local = self.local.get_stats()
+            extra += render_series("local_entries", "Entries held in the in-process tier",
+                                   {"local": local["entries"]}, "tier")
+            extra += render_series("local_bytes", "Bytes held in the in-process tier",
+                                   {"local": local["bytes"]}, "tier")
+            extra += render_series("local_evictions_total", "LRU evictions from the in-process tier",
+                                   {"local": local["evictions"]}, "tier", kind="counter")
+        return cache_metrics.render(extra)
+
+class RedisCache(_TieredCache):
+    """Redis cache client wrapper with an optional in-process tier"""
     
-    def __init__(self, host: str = None, port: int = None, db: int = 0):
+    def __init__(self, host: str = None, port: int = None, db: int = 0,
+                 local_cache: Optional[LocalCache] = None, codec: Optional[CacheCodec] = None):
+        super().__init__(local_cache, codec)
         self.host = host or os.getenv('REDIS_HOST', 'localhost')
         self.port = port or int(os.getenv('REDIS_PORT', 6379))
         self.db = db
         self.client = None
+        self._subscriber = None
         self.connect()
     
     def connect(self):
@@ -39,83 +401,521 @@ class RedisCache:
         except Exception as e:
             logger.warning(f"Redis connection failed: {e}")
             self.client = None
+            return
+        
+        self._subscribe()
+    
+    def _subscribe(self):
+        """Follow generation bumps, and drop local copies when other processes set or delete keys"""
+        try:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_invalidate})
+            self._subscriber = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except Exception as e:
+            logger.warning(f"Cache invalidation subscribe failed: {e}")
+    
+    def _publish_invalidation(self, keys: Iterable[str] = (), all_keys: bool = False,
+                              generations: Optional[Dict[str, int]] = None):
+        if self.local is None and not generations:
+            return
+        try:
+            self.client.publish(INVALIDATION_CHANNEL, self._invalidation_message(keys, all_keys, generations))
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish failed: {e}")
+    
+    def _generations(self, counters: List[str]) -> Dict[str, int]:
+        generations, missing = self.generations.lookup(counters)
+        return self._learn_generations(generations, missing, self.client.mget(missing) if missing else [])
+    
+    def _resolve(self, keys: List[str], tags: Iterable[str] = ()) -> List[str]:
+        """Stored keys for logical keys under the current generations"""
+        tags = list(tags)
+        return self._physical_keys(keys, tags, self._generations(self._counters_for(keys, tags)))
+    
+    def _fetch(self, keys: List[str], with_ttl: bool) -> Tuple[List[Optional[bytes]], List[Optional[int]]]:
+        """Stored values, plus their remaining TTLs in the same round trip so local copies expire with Redis"""
+        if not with_ttl:
+            return self.client.mget(keys), [None] * len(keys)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.mget(keys)
+        for key in keys:
+            pipe.pttl(key)
+        replies = pipe.execute()
+        return replies[0], replies[1:]
     
-    def get(self, key: str) -> Optional[Any]:
-        """Get value from cache"""
+    def _read(self, keys: List[str], local: bool, tags: Iterable[str], op: str) -> Dict[str, Any]:
+        if not self.client or not keys:
+            return {}
+        
+        use_local = local and self.local is not None
+        # Bulk calls are per domain; the first key labels the operation
+        prefix = self._metric_prefix(keys[0])
+        start = time.perf_counter()
+        results = {}
+        try:
+            logical = dict(zip(self._resolve(keys, tags), keys))
+            results, pending = self._local_reads(prefix, logical, use_local)
+            if pending:
+                values, pttls = self._fetch(pending, use_local)
+                dropped = self._redis_reads(prefix, logical, pending, values, pttls, results)
+                if dropped:
+                    self.client.delete(*dropped)
+            self._record_latency(prefix, op, start)
+            return results
+        except Exception as e:
+            self._record_error(prefix, op, e)
+            return results
+    
+    def _write(self, items: Dict[str, Any], ttl: int, local: bool, tags: Iterable[str], op: str) -> bool:
         if not self.client:
-            return None
+            return False
+        if not items:
+            return True
         
+        prefix = self._metric_prefix(next(iter(items)))
+        start = time.perf_counter()
         try:
-            data = self.client.get(key)
-            if data:
-                return pickle.loads(data)
+            encoded = self._encode_many(self._resolve(list(items), tags), items.values())
+            pipe = self.client.pipeline(transaction=False)
+            for key, data in encoded.items():
+                pipe.setex(key, ttl, data)
+            pipe.execute()
+            self._wrote(prefix, op, start, encoded, ttl, local)
+            self._publish_invalidation(encoded)
+            return True
+        except Exception as e:
+            self._record_error(prefix, op, e)
+            return False
+    
+    def _remove(self, keys: List[str], tags: Iterable[str], op: str) -> Optional[int]:
+        """Delete keys; returns how many existed, or None when Redis is unavailable"""
+        if not self.client:
             return None
+        if not keys:
+            return 0
+        
+        prefix = self._metric_prefix(keys[0])
+        start = time.perf_counter()
+        try:
+            keys = self._resolve(keys, tags)
+            deleted = self.client.delete(*keys)
+            self._record_latency(prefix, op, start)
+            self._forget_local(keys)
+            self._publish_invalidation(keys)
+            return deleted
         except Exception as e:
-            logger.error(f"Cache get failed: {e}")
+            self._record_error(prefix, op, e)
             return None
     
-    def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
+    def get(self, key: str, local: bool = True, tags: Iterable[str] = ()) -> Optional[Any]:
+        """Get value from cache (local tier first when enabled)"""
+        return self._read([key], local, tags, "get").get(key)
+    
+    def set(self, key: str, value: Any, ttl: int = 3600, local: bool = True, tags: Iterable[str] = ()) -> bool:
         """Set value in cache with TTL (default 1 hour)"""
+        return self._write({key: value}, ttl, local, tags, "set")
+    
+    def delete(self, key: str, tags: Iterable[str] = ()) -> bool:
+        """Delete key from cache"""
+        return self._remove([key], tags, "delete") is not None
+    
+    def get_many(self, keys: Iterable[str], local: bool = True, tags: Iterable[str] = ()) -> Dict[str, Any]:
+        """Get several values in one round trip; missing keys are left out of the result"""
+        return self._read(list(keys), local, tags, "get_many")
+    
+    def set_many(self, items: Dict[str, Any], ttl: int = 3600, local: bool = True, tags: Iterable[str] = ()) -> bool:
+        """Set several values with the same TTL in one pipelined round trip"""
+        return self._write(items, ttl, local, tags, "set_many")
+    
+    def delete_many(self, keys: Iterable[str], tags: Iterable[str] = ()) -> int:
+        """Delete several keys in one round trip; returns how many existed"""
+        return self._remove(list(keys), tags, "delete_many") or 0
+    
+    def ttl(self, key: str, tags: Iterable[str] = ()) -> int:
+        """Remaining TTL in seconds (negative if the key is missing or has no expiry)"""
+        if not self.client:
+            return -2
+        
+        try:
+            return self.client.ttl(self._resolve([key], tags)[0])
+        except Exception as e:
+            logger.error(f"Cache ttl failed: {e}")
+            return -2
+    
+    def acquire_lock(self, name: str, timeout: float) -> Optional[str]:
+        """Take lock:{name} for up to `timeout` seconds; returns its token, or None if held elsewhere"""
+        token = uuid.uuid4().hex
+        if self.client.set(LOCK_PREFIX + name, token, nx=True, px=int(timeout * 1000)):
+            return token
+        return None
+    
+    def release_lock(self, name: str, token: str):
+        try:
+            self.client.eval(RELEASE_LOCK_SCRIPT, 1, LOCK_PREFIX + name, token)
+        except Exception as e:
+            logger.warning(f"Cache lock release failed for {name}: {e}")
+    
+    def _bump(self, counters: List[str], cleanup: bool = True) -> Dict[str, int]:
+        """Advance generation counters, announce them, and sweep orphaned keys in the background"""
+        pipe = self.client.pipeline(transaction=False)
+        for counter in counters:
+            pipe.incr(counter)
+        generations = dict(zip(counters, pipe.execute()))
+        self.generations.update(generations)
+        self._publish_invalidation(generations=generations)
+        
+        if cleanup:
+            threading.Thread(target=self.cleanup, args=(counters,), daemon=True).start()
+        return generations
+    
+    def _invalidate(self, counter: str, what: str) -> Optional[int]:
+        if not self.client:
+            return None
+        
+        try:
+            generation = self._bump([counter])[counter]
+            logger.info(f"Cache {what} invalidated (generation {generation})")
+            return generation
+        except Exception as e:
+            logger.error(f"Cache {what} invalidation failed: {e}")
+            return None
+    
+    def invalidate_namespace(self, namespace: str) -> Optional[int]:
+        """Orphan every entry under `{namespace}:` in O(1); returns the new generation"""
+        return self._invalidate(namespace_counter(namespace), f"namespace {namespace}")
+    
+    def invalidate_tag(self, tag: str) -> Optional[int]:
+        """Orphan every entry written with `tag` in O(1); returns the new generation"""
+        return self._invalidate(tag_counter(tag), f"tag {tag}")
+    
+    def cleanup(self, counters: Iterable[str], batch: int = CLEANUP_BATCH) -> int:
+        """Delete stored keys written under superseded generations (SCAN + UNLINK in batches)"""
+        deleted = 0
+        for counter in counters:
+            stale = []
+            try:
+                for raw in self.client.scan_iter(match=self._cleanup_match(counter), count=batch):
+                    key = raw.decode() if isinstance(raw, bytes) else raw
+                    written = self._head_generations(key)
+                    if self._is_superseded(written, self._generations(list(written))):
+                        stale.append(key)
+                    if len(stale) >= batch:
+                        deleted += self.client.unlink(*stale)
+                        stale = []
+                        time.sleep(CLEANUP_PAUSE)
+                if stale:
+                    deleted += self.client.unlink(*stale)
+            except Exception as e:
+                logger.warning(f"Cache cleanup of {counter} failed: {e}")
+        if deleted:
+            logger.info(f"Cache cleanup removed {deleted} orphaned keys")
+        return deleted
+    
+    def clear(self, namespaces: Optional[Iterable[str]] = None) -> bool:
+        """Invalidate the given cache namespaces (all known ones by default) without touching other keys"""
         if not self.client:
             return False
         
         try:
-            data = pickle.dumps(value)
-            self.client.setex(key, ttl, data)
+            namespaces = self._namespaces_or_all(namespaces)
+            self._bump([namespace_counter(namespace) for namespace in namespaces])
+            self._cleared(namespaces)
             return True
         except Exception as e:
-            logger.error(f"Cache set failed: {e}")
+            logger.error(f"Cache clear failed: {e}")
             return False
     
-    def delete(self, key: str) -> bool:
-        """Delete key from cache"""
+    def exists(self, key: str, tags: Iterable[str] = ()) -> bool:
+        """Check if key exists"""
+        if not self.client:
+            return False
+        
+        try:
+            return self.client.exists(self._resolve([key], tags)[0]) > 0
+        except Exception as e:
+            logger.error(f"Cache exists check failed: {e}")
+            return False
+    
+    def get_stats(self) -> dict:
+        """Get cache statistics"""
+        if not self.client:
+            return {"status": "disconnected"}
+        
+        try:
+            return self._stats(self.client.info())
+        except Exception as e:
+            logger.error(f"Stats retrieval failed: {e}")
+            return {"status": "error", "error": str(e)}
+
+class AsyncRedisCache(_TieredCache):
+    """asyncio counterpart of RedisCache on the shared pool opened by connect_async_redis()"""
+    
+    def __init__(self, local_cache: Optional[LocalCache] = None, codec: Optional[CacheCodec] = None):
+        super().__init__(local_cache, codec)
+        self._listener: Optional[asyncio.Task] = None
+        # Strong references to background cleanup tasks until they finish
+        self._cleanups = set()
+    
+    @property
+    def client(self) -> Optional[redis.asyncio.Redis]:
+        return _async_client
+    
+    def start_listener(self):
+        """Follow generation bumps, and drop local copies when other processes set or delete keys"""
+        if self.client and self._listener is None:
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+    
+    async def stop_listener(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+    
+    async def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                self._on_invalidate(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener stopped: {e}")
+        finally:
+            await pubsub.reset()
+    
+    async def _publish_invalidation(self, keys: Iterable[str] = (), all_keys: bool = False,
+                                    generations: Optional[Dict[str, int]] = None):
+        if self.local is None and not generations:
+            return
+        try:
+            await self.client.publish(INVALIDATION_CHANNEL, self._invalidation_message(keys, all_keys, generations))
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish failed: {e}")
+    
+    async def _generations(self, counters: List[str]) -> Dict[str, int]:
+        generations, missing = self.generations.lookup(counters)
+        return self._learn_generations(generations, missing, await self.client.mget(missing) if missing else [])
+    
+    async def _resolve(self, keys: List[str], tags: Iterable[str] = ()) -> List[str]:
+        """Stored keys for logical keys under the current generations"""
+        tags = list(tags)
+        return self._physical_keys(keys, tags, await self._generations(self._counters_for(keys, tags)))
+    
+    async def _fetch(self, keys: List[str], with_ttl: bool) -> Tuple[List[Optional[bytes]], List[Optional[int]]]:
+        """Stored values, plus their remaining TTLs in the same round trip so local copies expire with Redis"""
+        if not with_ttl:
+            return await self.client.mget(keys), [None] * len(keys)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.mget(keys)
+            for key in keys:
+                pipe.pttl(key)
+            replies = await pipe.execute()
+        return replies[0], replies[1:]
+    
+    async def _read(self, keys: List[str], local: bool, tags: Iterable[str], op: str) -> Dict[str, Any]:
+        if not self.client or not keys:
+            return {}
+        
+        use_local = local and self.local is not None
+        # Bulk calls are per domain; the first key labels the operation
+        prefix = self._metric_prefix(keys[0])
+        start = time.perf_counter()
+        results = {}
+        try:
+            logical = dict(zip(await self._resolve(keys, tags), keys))
+            results, pending = self._local_reads(prefix, logical, use_local)
+            if pending:
+                values, pttls = await self._fetch(pending, use_local)
+                dropped = self._redis_reads(prefix, logical, pending, values, pttls, results)
+                if dropped:
+                    await self.client.delete(*dropped)
+            self._record_latency(prefix, op, start)
+            return results
+        except Exception as e:
+            self._record_error(prefix, op, e)
+            return results
+    
+    async def _write(self, items: Dict[str, Any], ttl: int, local: bool, tags: Iterable[str], op: str) -> bool:
         if not self.client:
             return False
+        if not items:
+            return True
         
+        prefix = self._metric_prefix(next(iter(items)))
+        start = time.perf_counter()
         try:
-            self.client.delete(key)
+            encoded = self._encode_many(await self._resolve(list(items), tags), items.values())
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, data in encoded.items():
+                    pipe.setex(key, ttl, data)
+                await pipe.execute()
+            self._wrote(prefix, op, start, encoded, ttl, local)
+            await self._publish_invalidation(encoded)
             return True
         except Exception as e:
-            logger.error(f"Cache delete failed: {e}")
+            self._record_error(prefix, op, e)
             return False
     
-    def clear(self) -> bool:
-        """Clear all cache"""
+    async def _remove(self, keys: List[str], tags: Iterable[str], op: str) -> Optional[int]:
+        """Delete keys; returns how many existed, or None when Redis is unavailable"""
+        if not self.client:
+            return None
+        if not keys:
+            return 0
+        
+        prefix = self._metric_prefix(keys[0])
+        start = time.perf_counter()
+        try:
+            keys = await self._resolve(keys, tags)
+            deleted = await self.client.delete(*keys)
+            self._record_latency(prefix, op, start)
+            self._forget_local(keys)
+            await self._publish_invalidation(keys)
+            return deleted
+        except Exception as e:
+            self._record_error(prefix, op, e)
+            return None
+    
+    async def get(self, key: str, local: bool = True, tags: Iterable[str] = ()) -> Optional[Any]:
+        """Get value from cache (local tier first when enabled)"""
+        return (await self._read([key], local, tags, "get")).get(key)
+    
+    async def set(self, key: str, value: Any, ttl: int = 3600, local: bool = True, tags: Iterable[str] = ()) -> bool:
+        """Set value in cache with TTL (default 1 hour)"""
+        return await self._write({key: value}, ttl, local, tags, "set")
+    
+    async def delete(self, key: str, tags: Iterable[str] = ()) -> bool:
+        """Delete key from cache"""
+        return await self._remove([key], tags, "delete") is not None
+    
+    async def get_many(self, keys: Iterable[str], local: bool = True, tags: Iterable[str] = ()) -> Dict[str, Any]:
+        """Get several values in one round trip; missing keys are left out of the result"""
+        return await self._read(list(keys), local, tags, "get_many")
+    
+    async def set_many(self, items: Dict[str, Any], ttl: int = 3600, local: bool = True,
+                       tags: Iterable[str] = ()) -> bool:
+        """Set several values with the same TTL in one pipelined round trip"""
+        return await self._write(items, ttl, local, tags, "set_many")
+    
+    async def delete_many(self, keys: Iterable[str], tags: Iterable[str] = ()) -> int:
+        """Delete several keys in one round trip; returns how many existed"""
+        return await self._remove(list(keys), tags, "delete_many") or 0
+    
+    async def ttl(self, key: str, tags: Iterable[str] = ()) -> int:
+        """Remaining TTL in seconds (negative if the key is missing or has no expiry)"""
+        if not self.client:
+            return -2
+        
+        try:
+            return await self.client.ttl((await self._resolve([key], tags))[0])
+        except Exception as e:
+            logger.error(f"Cache ttl failed: {e}")
+            return -2
+    
+    async def acquire_lock(self, name: str, timeout: float) -> Optional[str]:
+        """Take lock:{name} for up to `timeout` seconds; returns its token, or None if held elsewhere"""
+        token = uuid.uuid4().hex
+        if await self.client.set(LOCK_PREFIX + name, token, nx=True, px=int(timeout * 1000)):
+            return token
+        return None
+    
+    async def release_lock(self, name: str, token: str):
+        try:
+            await self.client.eval(RELEASE_LOCK_SCRIPT, 1, LOCK_PREFIX + name, token)
+        except Exception as e:
+            logger.warning(f"Cache lock release failed for {name}: {e}")
+    
+    async def _bump(self, counters: List[str], cleanup: bool = True) -> Dict[str, int]:
+        """Advance generation counters, announce them, and sweep orphaned keys in the background"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            for counter in counters:
+                pipe.incr(counter)
+            generations = dict(zip(counters, await pipe.execute()))
+        self.generations.update(generations)
+        await self._publish_invalidation(generations=generations)
+        
+        if cleanup:
+            task = asyncio.create_task(self.cleanup(counters))
+            self._cleanups.add(task)
+            task.add_done_callback(self._cleanups.discard)
+        return generations
+    
+    async def _invalidate(self, counter: str, what: str) -> Optional[int]:
+        if not self.client:
+            return None
+        
+        try:
+            generation = (await self._bump([counter]))[counter]
+            logger.info(f"Cache {what} invalidated (generation {generation})")
+            return generation
+        except Exception as e:
+            logger.error(f"Cache {what} invalidation failed: {e}")
+            return None
+    
+    async def invalidate_namespace(self, namespace: str) -> Optional[int]:
+        """Orphan every entry under `{namespace}:` in O(1); returns the new generation"""
+        return await self._invalidate(namespace_counter(namespace), f"namespace {namespace}")
+    
+    async def invalidate_tag(self, tag: str) -> Optional[int]:
+        """Orphan every entry written with `tag` in O(1); returns the new generation"""
+        return await self._invalidate(tag_counter(tag), f"tag {tag}")
+    
+    async def cleanup(self, counters: Iterable[str], batch: int = CLEANUP_BATCH) -> int:
+        """Delete stored keys written under superseded generations (SCAN + UNLINK in batches)"""
+        deleted = 0
+        for counter in counters:
+            stale = []
+            try:
+                async for raw in self.client.scan_iter(match=self._cleanup_match(counter), count=batch):
+                    key = raw.decode() if isinstance(raw, bytes) else raw
+                    written = self._head_generations(key)
+                    if self._is_superseded(written, await self._generations(list(written))):
+                        stale.append(key)
+                    if len(stale) >= batch:
+                        deleted += await self.client.unlink(*stale)
+                        stale = []
+                        await asyncio.sleep(CLEANUP_PAUSE)
+                if stale:
+                    deleted += await self.client.unlink(*stale)
+            except Exception as e:
+                logger.warning(f"Cache cleanup of {counter} failed: {e}")
+        if deleted:
+            logger.info(f"Cache cleanup removed {deleted} orphaned keys")
+        return deleted
+    
+    async def clear(self, namespaces: Optional[Iterable[str]] = None) -> bool:
+        """Invalidate the given cache namespaces (all known ones by default) without touching other keys"""
         if not self.client:
             return False
         
         try:
-            self.client.flushdb()
-            logger.info("Cache cleared")
+            namespaces = self._namespaces_or_all(namespaces)
+            await self._bump([namespace_counter(namespace) for namespace in namespaces])
+            self._cleared(namespaces)
             return True
         except Exception as e:
             logger.error(f"Cache clear failed: {e}")
             return False
     
-    def exists(self, key: str) -> bool:
+    async def exists(self, key: str, tags: Iterable[str] = ()) -> bool:
         """Check if key exists"""
         if not self.client:
             return False
         
         try:
-            return self.client.exists(key) > 0
+            return await self.client.exists((await self._resolve([key], tags))[0]) > 0
         except Exception as e:
             logger.error(f"Cache exists check failed: {e}")
             return False
     
-    def get_stats(self) -> dict:
+    async def get_stats(self) -> dict:
         """Get cache statistics"""
         if not self.client:
             return {"status": "disconnected"}
         
         try:
-            info = self.client.info()
-            return {
-                "memory_used": info.get('used_memory_human', 'N/A'),
-                "connected_clients": info.get('connected_clients', 0),
-                "total_commands": info.get('total_commands_processed', 0),
-                "status": "connected"
-            }
+            return self._stats(await self.client.info())
         except Exception as e:
             logger.error(f"Stats retrieval failed: {e}")
             return {"status": "error", "error": str(e)}
@@ -124,13 +924,79 @@ class RedisCache:
 # Global cache instance
 _redis_cache = None
 
+def _local_cache_from_env() -> Optional[LocalCache]:
+    """Local tier sized by REDIS_LOCAL_CACHE_ENTRIES / REDIS_LOCAL_CACHE_BYTES (entries=0 disables it)"""
+    entries = int(os.getenv('REDIS_LOCAL_CACHE_ENTRIES', 1024))
+    if entries <= 0:
+        return None
+    return LocalCache(
+        max_entries=entries,
+        max_bytes=int(os.getenv('REDIS_LOCAL_CACHE_BYTES', 16 * 1024 * 1024)),
+        max_ttl=int(os.getenv('REDIS_LOCAL_CACHE_TTL', 60))
+    )
+
 def get_redis_cache() -> RedisCache:
     """Get or create Redis cache instance"""
     global _redis_cache
     if _redis_cache is None:
-        _redis_cache = RedisCache()
+        _redis_cache = RedisCache(local_cache=_local_cache_from_env())
     return _redis_cache
 
+def redis_cache_connected() -> bool:
+    """Whether the sync cache is already connected; never opens a connection"""
+    return _redis_cache is not None and _redis_cache.client is not None
+
+# Shared asyncio client (one connection pool per process) and the cache bound to it
+_async_client: Optional[redis.asyncio.Redis] = None
+_async_cache: Optional[AsyncRedisCache] = None
+
+async def connect_async_redis(host: str = None, port: int = None, db: int = 0) -> Optional[redis.asyncio.Redis]:
+    """Open the process-wide asyncio pool (sized by REDIS_MAX_CONNECTIONS); None if Redis is unreachable
+    
+    Call once at app startup; the returned client is the one AsyncRedisCache uses.
+    """
+    global _async_client
+    if _async_client is not None:
+        return _async_client
+    
+    host = host or os.getenv('REDIS_HOST', 'localhost')
+    port = port or int(os.getenv('REDIS_PORT', 6379))
+    pool = redis.asyncio.ConnectionPool(
+        host=host,
+        port=port,
+        db=db,
+        max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', 50)),
+        socket_connect_timeout=5
+    )
+    client = redis.asyncio.Redis(connection_pool=pool)
+    try:
+        await client.ping()
+    except Exception as e:
+        logger.warning(f"Redis connection failed: {e}")
+        await client.aclose(close_connection_pool=True)
+        return None
+    
+    _async_client = client
+    logger.info(f"✓ Redis connected ({host}:{port}, async pool)")
+    get_async_redis_cache().start_listener()
+    return _async_client
+
+async def close_async_redis():
+    """Stop the invalidation listener and close the shared pool"""
+    global _async_client
+    if _async_cache is not None:
+        await _async_cache.stop_listener()
+    if _async_client is not None:
+        await _async_client.aclose(close_connection_pool=True)
+        _async_client = None
+
+def get_async_redis_cache() -> AsyncRedisCache:
+    """Get or create the asyncio cache instance (a no-op cache until connect_async_redis succeeds)"""
+    global _async_cache
+    if _async_cache is None:
+        _async_cache = AsyncRedisCache(local_cache=_local_cache_from_env())
+    return _async_cache
+
 def cache_key(*args, **kwargs) -> str:
     """Generate cache key from args"""
     parts = []
@@ -146,77 +1012,532 @@ def cache_key(*args, **kwargs) -> str:
             parts.append(f"{k}:{v}")
     return ":".join(parts)
 
-def cached(prefix: str = "app", ttl: int = 3600) -> Callable:
-    """Decorator for caching function results"""
+def translation_key(language: str, text: str) -> str:
+    """Translation memory key: language plus a hash of the exact source text"""
+    digest = hashlib.sha256(text.encode()).hexdigest()[:32]
+    return f"translation:{language.strip().lower()}:{digest}"
+
+class SingleFlightStats:
+    """Counters for @cached recomputation: who computed, who waited, what was served stale"""
+    
+    FIELDS = ("leaders", "local_waiters", "remote_waiters", "lock_timeouts", "stale_served", "background_refreshes")
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+    
+    def incr(self, field: str):
+        with self._lock:
+            self._counts[field] += 1
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counts)
+        stats["coalesced_waiters"] = stats["local_waiters"] + stats["remote_waiters"]
+        return stats
+
+single_flight_stats = SingleFlightStats()
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key within this process into one"""
+    
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+    
+    def run(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        
+        if not leader:
+            single_flight_stats.incr("local_waiters")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight (one event loop)"""
+    
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Future] = {}
+    
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is not None:
+            single_flight_stats.incr("local_waiters")
+            # Shield so a cancelled waiter doesn't cancel the shared result
+            return await asyncio.shield(flight)
+        
+        # The load runs as its own task: a cancelled leader stops waiting, but the
+        # load finishes for the waiters (and the cache)
+        flight = self._flights[key] = asyncio.ensure_future(fn())
+        flight.add_done_callback(partial(self._finish, key))
+        return await asyncio.shield(flight)
+    
+    def _finish(self, key: str, flight: asyncio.Future):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            # Callers re-raise it; don't also report it as never retrieved when all of them left
+            flight.exception()
+
+_flights = SingleFlight()
+_async_flights = AsyncSingleFlight()
+# Keys with a stale-while-revalidate refresh running in this process
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+# Strong references to background refresh tasks until they finish
+_refresh_tasks = set()
+
+def _wrap_entry(value: Any, ttl: int, stale_ttl: int) -> Any:
+    """Stale-while-revalidate entries carry the end of their fresh period"""
+    if not stale_ttl:
+        return value
+    return {"value": value, "fresh_until": time.time() + ttl}
+
+def _unwrap_entry(entry: Any, stale_ttl: int):
+    """(value, is_fresh) of a cached entry"""
+    if stale_ttl and isinstance(entry, dict) and "fresh_until" in entry:
+        return entry.get("value"), entry["fresh_until"] > time.time()
+    return entry, True
+
+def _claim_refresh(key: str) -> bool:
+    with _refreshing_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+        return True
+
+def _release_refresh(key: str):
+    with _refreshing_lock:
+        _refreshing.discard(key)
+
+def _poll_delays(timeout: float) -> Iterable[float]:
+    """Backoff schedule for waiting on another process's computation"""
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    while time.monotonic() < deadline:
+        yield delay
+        delay = min(delay * 2, 0.2)
+
+def _load(cache: RedisCache, key: str, compute: Callable[[], Any], ttl: int, stale_ttl: int,
+          local: bool, lock_timeout: float, tags: List[str]) -> Any:
+    """Compute under the Redis lock, or wait for the process that holds it"""
+    try:
+        token = cache.acquire_lock(key, lock_timeout)
+    except Exception as e:
+        logger.warning(f"Cache lock failed for {key}: {e}")
+        token = ""
+    
+    if token is None:
+        single_flight_stats.incr("remote_waiters")
+        for delay in _poll_delays(lock_timeout):
+            time.sleep(delay)
+            entry = cache.get(key, local=False, tags=tags)
+            if entry is not None:
+                return _unwrap_entry(entry, stale_ttl)[0]
+            # Lock free but nothing stored: the holder failed or gave up, so load here
+            try:
+                token = cache.acquire_lock(key, lock_timeout)
+            except Exception:
+                token = None
+            if token is not None:
+                entry = cache.get(key, local=False, tags=tags)
+                if entry is not None:
+                    cache.release_lock(key, token)
+                    return _unwrap_entry(entry, stale_ttl)[0]
+                single_flight_stats.incr("leaders")
+                break
+        else:
+            single_flight_stats.incr("lock_timeouts")
+    else:
+        single_flight_stats.incr("leaders")
+    
+    try:
+        start = time.perf_counter()
+        result = compute()
+        cache_metrics.record_compute(cache._metric_prefix(key), time.perf_counter() - start)
+        cache.set(key, _wrap_entry(result, ttl, stale_ttl), ttl + stale_ttl, local=local, tags=tags)
+        return result
+    finally:
+        if token:
+            cache.release_lock(key, token)
+
+def _refresh(cache: RedisCache, key: str, compute: Callable[[], Any], ttl: int, stale_ttl: int,
+             local: bool, lock_timeout: float, tags: List[str]):
+    """Background stale-while-revalidate refresh; skipped if another process holds the lock"""
+    try:
+        token = cache.acquire_lock(key, lock_timeout)
+        if token is None:
+            return
+        single_flight_stats.incr("background_refreshes")
+        try:
+            result = compute()
+            cache.set(key, _wrap_entry(result, ttl, stale_ttl), ttl + stale_ttl, local=local, tags=tags)
+        finally:
+            cache.release_lock(key, token)
+    except Exception as e:
+        logger.warning(f"Background refresh of {key} failed: {e}")
+    finally:
+        _release_refresh(key)
+
+async def _load_async(cache: AsyncRedisCache, key: str, compute: Callable[[], Awaitable[Any]], ttl: int,
+                      stale_ttl: int, local: bool, lock_timeout: float, tags: List[str]) -> Any:
+    """asyncio counterpart of _load"""
+    try:
+        token = await cache.acquire_lock(key, lock_timeout)
+    except Exception as e:
+        logger.warning(f"Cache lock failed for {key}: {e}")
+        token = ""
+    
+    if token is None:
+        single_flight_stats.incr("remote_waiters")
+        for delay in _poll_delays(lock_timeout):
+            await asyncio.sleep(delay)
+            entry = await cache.get(key, local=False, tags=tags)
+            if entry is not None:
+                return _unwrap_entry(entry, stale_ttl)[0]
+            # Lock free but nothing stored: the holder failed or gave up, so load here
+            try:
+                token = await cache.acquire_lock(key, lock_timeout)
+            except Exception:
+                token = None
+            if token is not None:
+                entry = await cache.get(key, local=False, tags=tags)
+                if entry is not None:
+                    await cache.release_lock(key, token)
+                    return _unwrap_entry(entry, stale_ttl)[0]
+                single_flight_stats.incr("leaders")
+                break
+        else:
+            single_flight_stats.incr("lock_timeouts")
+    else:
+        single_flight_stats.incr("leaders")
+    
+    try:
+        start = time.perf_counter()
+        result = await compute()
+        cache_metrics.record_compute(cache._metric_prefix(key), time.perf_counter() - start)
+        await cache.set(key, _wrap_entry(result, ttl, stale_ttl), ttl + stale_ttl, local=local, tags=tags)
+        return result
+    finally:
+        if token:
+            await cache.release_lock(key, token)
+
+async def _refresh_async(cache: AsyncRedisCache, key: str, compute: Callable[[], Awaitable[Any]], ttl: int,
+                         stale_ttl: int, local: bool, lock_timeout: float, tags: List[str]):
+    """asyncio counterpart of _refresh"""
+    try:
+        token = await cache.acquire_lock(key, lock_timeout)
+        if token is None:
+            return
+        single_flight_stats.incr("background_refreshes")
+        try:
+            result = await compute()
+            await cache.set(key, _wrap_entry(result, ttl, stale_ttl), ttl + stale_ttl, local=local, tags=tags)
+        finally:
+            await cache.release_lock(key, token)
+    except Exception as e:
+        logger.warning(f"Background refresh of {key} failed: {e}")
+    finally:
+        _release_refresh(key)
+
+def cached(prefix: str = "app", ttl: int = 3600, local: bool = True, stale_ttl: int = 0,
+           lock_timeout: float = 10.0, tags: Optional[Callable[..., Iterable[str]]] = None) -> Callable:
+    """Decorator for caching function results (local=False bypasses the in-process tier)
+    
+    `async def` functions are cached through the shared asyncio pool.
+    
+    On a miss only one caller per key computes: concurrent callers in this
+    process wait on it, and other processes wait (up to `lock_timeout`
+    seconds) on a Redis lock, loading it themselves if the lock is released
+    without a result. With `stale_ttl`, entries are kept that many
+    seconds past `ttl` and served stale while one background refresh runs.
+    `tags`, called with the function's arguments, names the tags an entry is
+    invalidated with (e.g. `lambda scheme_id: [scheme_tag(scheme_id)]`).
+    """
+    cache_namespaces.add(prefix)
+    
     def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                cache = get_async_redis_cache()
+                key = f"{prefix}:{cache_key(func.__name__, *args, **kwargs)}"
+                compute = partial(func, *args, **kwargs)
+                if not cache.client:
+                    return await compute()
+                entry_tags = list(tags(*args, **kwargs)) if tags else []
+                
+                entry = await cache.get(key, local=local, tags=entry_tags)
+                if entry is not None:
+                    value, fresh = _unwrap_entry(entry, stale_ttl)
+                    if fresh:
+                        logger.debug(f"Cache hit: {key}")
+                        return value
+                    single_flight_stats.incr("stale_served")
+                    if _claim_refresh(key):
+                        task = asyncio.create_task(
+                            _refresh_async(cache, key, compute, ttl, stale_ttl, local, lock_timeout, entry_tags))
+                        _refresh_tasks.add(task)
+                        task.add_done_callback(_refresh_tasks.discard)
+                    return value
+                
+                return await _async_flights.run(
+                    key, partial(_load_async, cache, key, compute, ttl, stale_ttl, local, lock_timeout, entry_tags))
+            
+            return async_wrapper
+        
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
             cache = get_redis_cache()
             
             # Generate cache key
             key = f"{prefix}:{cache_key(func.__name__, *args, **kwargs)}"
+            compute = partial(func, *args, **kwargs)
+            if not cache.client:
+                return compute()
+            entry_tags = list(tags(*args, **kwargs)) if tags else []
             
             # Try cache
-            cached_value = cache.get(key)
-            if cached_value is not None:
-                logger.debug(f"Cache hit: {key}")
-                return cached_value
-            
-            # Call function
-            result = func(*args, **kwargs)
+            entry = cache.get(key, local=local, tags=entry_tags)
+            if entry is not None:
+                value, fresh = _unwrap_entry(entry, stale_ttl)
+                if fresh:
+                    logger.debug(f"Cache hit: {key}")
+                    return value
+                single_flight_stats.incr("stale_served")
+                if _claim_refresh(key):
+                    threading.Thread(
+                        target=_refresh, args=(cache, key, compute, ttl, stale_ttl, local, lock_timeout, entry_tags),
+                        daemon=True
+                    ).start()
+                return value
             
-            # Store in cache
-            cache.set(key, result, ttl)
-            return result
+            # Compute once per key across threads and processes, then store
+            return _flights.run(key, partial(_load, cache, key, compute, ttl, stale_ttl, local, lock_timeout, entry_tags))
         
         return wrapper
     return decorator
 
 
-# Specific cache managers
+# Specific cache managers. Each one reaches its cache through `_cache`; the async managers
+# swap in the asyncio cache, hand back its awaitables, and override only the methods that
+# post-process a result, so the key formats live in one place.
 class EligibilityCache:
     """Eligibility result caching"""
     
-    @staticmethod
-    def get_user_eligibility(user_id: str):
-        cache = get_redis_cache()
-        return cache.get(f"eligibility:{user_id}")
+    _cache = staticmethod(get_redis_cache)
     
     @staticmethod
-    def set_user_eligibility(user_id: str, result: dict, ttl: int = 7200):
-        cache = get_redis_cache()
-        return cache.set(f"eligibility:{user_id}", result, ttl)
+    def _key(user_id: str) -> str:
+        return f"eligibility:{user_id}"
     
     @staticmethod
-    def invalidate_user(user_id: str):
-        cache = get_redis_cache()
-        return cache.delete(f"eligibility:{user_id}")
+    def _by_user(found: Dict[str, dict]) -> Dict[str, dict]:
+        return {key[len("eligibility:"):]: result for key, result in found.items()}
+    
+    @classmethod
+    def get_user_eligibility(cls, user_id: str):
+        return cls._cache().get(cls._key(user_id))
+    
+    @classmethod
+    def set_user_eligibility(cls, user_id: str, result: dict, ttl: int = 7200):
+        return cls._cache().set(cls._key(user_id), result, ttl)
+    
+    @classmethod
+    def invalidate_user(cls, user_id: str):
+        return cls._cache().delete(cls._key(user_id))
+    
+    @classmethod
+    def refresh_user(cls, user_id: str, patch: Callable[[dict], Optional[dict]], ttl: int = 7200) -> bool:
+        """Patch the cached result in place (e.g. SchemeRegistry.reevaluate after a
+        profile field change); invalidates instead when `patch` returns None"""
+        cache = cls._cache()
+        key = cls._key(user_id)
+        cached_result = cache.get(key)
+        if cached_result is None:
+            return False
+        
+        patched = patch(cached_result)
+        if patched is None:
+            return cache.delete(key)
+        return cache.set(key, patched, ttl)
+    
+    @classmethod
+    def get_users_eligibility(cls, user_ids: Iterable[str]) -> Dict[str, dict]:
+        return cls._by_user(cls._cache().get_many(map(cls._key, user_ids)))
+    
+    @classmethod
+    def set_users_eligibility(cls, results: Dict[str, dict], ttl: int = 7200):
+        return cls._cache().set_many({cls._key(user_id): result for user_id, result in results.items()}, ttl)
+    
+    @classmethod
+    def invalidate_users(cls, user_ids: Iterable[str]):
+        return cls._cache().delete_many(map(cls._key, user_ids))
 
 class RuleCache:
     """Rule caching"""
     
+    _cache = staticmethod(get_redis_cache)
+    
     @staticmethod
-    def get_rule(scheme_id: str):
-        cache = get_redis_cache()
-        return cache.get(f"rule:{scheme_id}")
+    def _key(scheme_id: str) -> str:
+        return f"rule:{scheme_id}"
     
     @staticmethod
-    def set_rule(scheme_id: str, rule: dict):
-        cache = get_redis_cache()
-        return cache.set(f"rule:{scheme_id}", rule, ttl=86400)
+    def _by_scheme(found: Dict[str, dict]) -> Dict[str, dict]:
+        return {key[len("rule:"):]: rule for key, rule in found.items()}
+    
+    @classmethod
+    def get_rule(cls, scheme_id: str):
+        return cls._cache().get(cls._key(scheme_id))
+    
+    @classmethod
+    def set_rule(cls, scheme_id: str, rule: dict):
+        return cls._cache().set(cls._key(scheme_id), rule, ttl=86400)
+    
+    @classmethod
+    def get_rules(cls, scheme_ids: Iterable[str]) -> Dict[str, dict]:
+        return cls._by_scheme(cls._cache().get_many(map(cls._key, scheme_ids)))
+    
+    @classmethod
+    def set_rules(cls, rules: Dict[str, dict]):
+        return cls._cache().set_many({cls._key(scheme_id): rule for scheme_id, rule in rules.items()}, ttl=86400)
+    
+    @classmethod
+    def invalidate_scheme(cls, scheme_id: str):
+        """Drop the scheme's rule and every entry tagged with scheme_tag(scheme_id)"""
+        cache = cls._cache()
+        cache.delete(cls._key(scheme_id))
+        return cache.invalidate_tag(scheme_tag(scheme_id))
 
 class QueryCache:
     """Query result caching"""
     
+    _cache = staticmethod(get_redis_cache)
+    
     @staticmethod
-    def get_query_result(query_hash: str):
-        cache = get_redis_cache()
-        return cache.get(f"query:{query_hash}")
+    def _key(query_hash: str) -> str:
+        return f"query:{query_hash}"
     
     @staticmethod
-    def set_query_result(query_hash: str, result: dict):
-        cache = get_redis_cache()
-        return cache.set(f"query:{query_hash}", result, ttl=14400)
+    def _by_hash(found: Dict[str, dict]) -> Dict[str, dict]:
+        return {key[len("query:"):]: result for key, result in found.items()}
+    
+    @classmethod
+    def get_query_result(cls, query_hash: str):
+        return cls._cache().get(cls._key(query_hash))
+    
+    @classmethod
+    def set_query_result(cls, query_hash: str, result: dict):
+        return cls._cache().set(cls._key(query_hash), result, ttl=14400)
+    
+    @classmethod
+    def get_query_results(cls, query_hashes: Iterable[str]) -> Dict[str, dict]:
+        return cls._by_hash(cls._cache().get_many(map(cls._key, query_hashes)))
+    
+    @classmethod
+    def set_query_results(cls, results: Dict[str, dict]):
+        return cls._cache().set_many({cls._key(query_hash): result for query_hash, result in results.items()},
+                                     ttl=14400)
+
+class TranslationCache:
+    """Translation memory keyed by (language, source text hash)"""
+    
+    _cache = staticmethod(get_redis_cache)
+    
+    @classmethod
+    def get_translations(cls, language: str, texts: Iterable[str]) -> Dict[str, str]:
+        """{source text: translation} for the texts already translated into `language`"""
+        keys = {translation_key(language, text): text for text in texts}
+        found = cls._cache().get_many(keys)
+        return {keys[key]: translation for key, translation in found.items()}
+    
+    @classmethod
+    def set_translations(cls, language: str, translations: Dict[str, str]):
+        return cls._cache().set_many({translation_key(language, text): translation
+                                      for text, translation in translations.items()}, ttl=TRANSLATION_TTL)
+
+class AsyncEligibilityCache(EligibilityCache):
+    """Eligibility result caching on the shared asyncio pool"""
+    
+    _cache = staticmethod(get_async_redis_cache)
+    
+    @classmethod
+    async def refresh_user(cls, user_id: str, patch: Callable[[dict], Optional[dict]], ttl: int = 7200) -> bool:
+        """See EligibilityCache.refresh_user"""
+        cache = cls._cache()
+        key = cls._key(user_id)
+        cached_result = await cache.get(key)
+        if cached_result is None:
+            return False
+        
+        patched = patch(cached_result)
+        if patched is None:
+            return await cache.delete(key)
+        return await cache.set(key, patched, ttl)
+    
+    @classmethod
+    async def get_users_eligibility(cls, user_ids: Iterable[str]) -> Dict[str, dict]:
+        return cls._by_user(await cls._cache().get_many(map(cls._key, user_ids)))
+
+class AsyncRuleCache(RuleCache):
+    """Rule caching on the shared asyncio pool"""
+    
+    _cache = staticmethod(get_async_redis_cache)
+    
+    @classmethod
+    async def get_rules(cls, scheme_ids: Iterable[str]) -> Dict[str, dict]:
+        return cls._by_scheme(await cls._cache().get_many(map(cls._key, scheme_ids)))
+    
+    @classmethod
+    async def invalidate_scheme(cls, scheme_id: str):
+        """Drop the scheme's rule and every entry tagged with scheme_tag(scheme_id)"""
+        cache = cls._cache()
+        await cache.delete(cls._key(scheme_id))
+        return await cache.invalidate_tag(scheme_tag(scheme_id))
+
+class AsyncQueryCache(QueryCache):
+    """Query result caching on the shared asyncio pool"""
+    
+    _cache = staticmethod(get_async_redis_cache)
+    
+    @classmethod
+    async def get_query_results(cls, query_hashes: Iterable[str]) -> Dict[str, dict]:
+        return cls._by_hash(await cls._cache().get_many(map(cls._key, query_hashes)))
+
+class AsyncTranslationCache(TranslationCache):
+    """Translation memory on the shared asyncio pool"""
+    
+    _cache = staticmethod(get_async_redis_cache)
+    
+    @classmethod
+    async def get_translations(cls, language: str, texts: Iterable[str]) -> Dict[str, str]:
+        keys = {translation_key(language, text): text for text in texts}
+        found = await cls._cache().get_many(keys)
+        return {keys[key]: translation for key, translation in found.items()}
 
 if __name__ == "__main__":
     cache = get_redis_cache()
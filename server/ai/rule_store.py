@@ -0,0 +1,371 @@
+"""
+Rule Store for Docu-Agent
+Content-addressed extraction results, compiled once into eligibility condition groups
+"""
+
+import hashlib
+import json
+import re
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+
+from eligibility_engine import FIELD_MAP, OPERATORS, to_text
+from redis_cache import get_async_redis_cache, get_redis_cache
+
+logger = logging.getLogger(__name__)
+
+# Bump when the extraction prompt changes (stored extractions are redone)
+EXTRACTION_VERSION = 2
+# Bump when compile_extraction changes (stored extractions are recompiled, no LLM call)
+COMPILER_VERSION = 1
+
+RULEBOOK_PREFIX = "rulebook:"
+# Rules read per LRANGE when streaming a stored rule list
+RULES_SLICE = 1000
+# A staging rule list left behind by an interrupted ingest expires after this
+STAGING_TTL = 86400
+
+# Lower-cased names the model may use -> AdminScheme condition field
+FIELD_ALIASES = {
+    **{field.lower(): field for field in FIELD_MAP},
+    **{attr: field for field, attr in FIELD_MAP.items()},
+    'income': 'Annual Income',
+    'family income': 'Annual Income',
+    'caste': 'Category',
+    'caste category': 'Category',
+    'education': 'Education Level',
+    'marks': 'Marks Percentage',
+    'percentage': 'Marks Percentage',
+    'minority': 'Minority Status',
+    'disability': 'Disability Status',
+}
+OPERATOR_ALIASES = {
+    **{operator.lower(): operator for operator in OPERATORS},
+    '=': 'Equals', '==': 'Equals', 'is': 'Equals',
+    '!=': 'Not Equals', 'not': 'Not Equals',
+    '<': 'Less Than', 'below': 'Less Than',
+    '>': 'Greater Than', 'above': 'Greater Than',
+    'contains': 'Includes',
+    'range': 'Between',
+}
+# Operators whose value is a list of alternatives (compiled to an OR group of Equals rows)
+ONE_OF_OPERATORS = {'in', 'one of', 'any of'}
+INCLUSIVE_OPERATORS = {'<=': 'Less Than', '>=': 'Greater Than',
+                       'at most': 'Less Than', 'at least': 'Greater Than'}
+
+LIMIT_FIELDS = {'income_limits': 'Annual Income', 'age_limits': 'Age'}
+MAX_KEY = re.compile(r"max|upper|below|less|limit|ceiling|up_?to")
+MIN_KEY = re.compile(r"min|lower|above|greater|floor|at_?least")
+AMOUNT = re.compile(r"(\d+(?:\.\d+)?)\s*(lakhs?|lacs?|crores?|cr|thousand|k)?\b", re.IGNORECASE)
+MULTIPLIERS = {'lakh': 1e5, 'lac': 1e5, 'crore': 1e7, 'cr': 1e7, 'thousand': 1e3, 'k': 1e3}
+
+
+def text_hash(text: str) -> str:
+    """Content hash of source text, insensitive to whitespace differences between extractions"""
+    return hashlib.sha256(" ".join(text.split()).encode()).hexdigest()
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """Content hash of a file (e.g. a rulebook PDF), streamed"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_amount(value: Any) -> Optional[float]:
+    """Number from 800000, '₹8,00,000', '8 lakh', '2.5 lakhs', '35 years'; None if there is none"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = AMOUNT.search(str(value).replace(',', ''))
+    if not match:
+        return None
+    unit = (match.group(2) or '').lower().rstrip('s')
+    return float(match.group(1)) * MULTIPLIERS.get(unit, 1)
+
+
+def _row(field: str, operator: str, value: Any) -> Dict:
+    return {"field": field, "operator": operator, "value": to_text(value)}
+
+
+def _bound_group(field: str, low: Optional[float], high: Optional[float]) -> Optional[Dict]:
+    """Inclusive bounds as one group (the engine's Less/Greater Than are strict)"""
+    if low is not None and high is not None:
+        return {"joiner": "AND", "rows": [_row(field, 'Between', f"{to_text(low)}-{to_text(high)}")]}
+    if high is not None:
+        return {"joiner": "OR", "rows": [_row(field, 'Less Than', high), _row(field, 'Equals', high)]}
+    if low is not None:
+        return {"joiner": "OR", "rows": [_row(field, 'Greater Than', low), _row(field, 'Equals', low)]}
+    return None
+
+
+def _compile_limits(field: str, limits: Any) -> Optional[Dict]:
+    if isinstance(limits, dict):
+        low = high = None
+        for key, value in limits.items():
+            amount = parse_amount(value)
+            if amount is None or isinstance(value, (dict, list)):
+                return None
+            key = str(key).lower()
+            if MIN_KEY.search(key):
+                low = amount
+            elif MAX_KEY.search(key) or key in ('annual_income', 'income', 'age'):
+                high = amount
+            else:
+                # Per-category limits and the like do not fit one group
+                return None
+        return _bound_group(field, low, high)
+    # A bare number is a ceiling ("income limit: 8 lakh")
+    amount = parse_amount(limits)
+    return _bound_group(field, None, amount) if amount is not None else None
+
+
+def _compile_rule(rule: Any) -> Optional[Dict]:
+    """One extracted rule -> one condition group, or None if it is not machine-checkable"""
+    if not isinstance(rule, dict):
+        return None
+    alternatives = rule.get('any_of') or (rule.get('rows') if rule.get('joiner') else None)
+    if isinstance(alternatives, list):
+        groups = [_compile_rule(alternative) for alternative in alternatives]
+        if not groups or any(group is None or len(group["rows"]) != 1 for group in groups):
+            return None
+        return {"joiner": str(rule.get('joiner') or 'OR').upper(), "rows": [g["rows"][0] for g in groups]}
+
+    field = FIELD_ALIASES.get(str(rule.get('field', '')).strip().lower())
+    operator = str(rule.get('operator', '')).strip().lower()
+    value = rule.get('value')
+    if field is None or value is None or value == '':
+        return None
+
+    if operator in ONE_OF_OPERATORS or (isinstance(value, list) and OPERATOR_ALIASES.get(operator) == 'Equals'):
+        values = value if isinstance(value, list) else [part.strip() for part in str(value).split(',')]
+        return {"joiner": "OR", "rows": [_row(field, 'Equals', item) for item in values if item != '']}
+    if operator in INCLUSIVE_OPERATORS:
+        amount = parse_amount(value)
+        if amount is None:
+            return None
+        if INCLUSIVE_OPERATORS[operator] == 'Less Than':
+            return _bound_group(field, None, amount)
+        return _bound_group(field, amount, None)
+
+    operator = OPERATOR_ALIASES.get(operator)
+    if operator is None:
+        return None
+    if operator == 'Between':
+        if isinstance(value, dict):
+            low, high = parse_amount(value.get('min')), parse_amount(value.get('max'))
+        elif isinstance(value, list) and len(value) == 2:
+            low, high = parse_amount(value[0]), parse_amount(value[1])
+        else:
+            parts = str(value).split('-')
+            low, high = (parse_amount(parts[0]), parse_amount(parts[1])) if len(parts) == 2 else (None, None)
+        if low is None or high is None:
+            return None
+        return _bound_group(field, low, high)
+    if operator in ('Less Than', 'Greater Than'):
+        amount = parse_amount(value)
+        return {"joiner": "AND", "rows": [_row(field, operator, amount)]} if amount is not None else None
+    if isinstance(value, (dict, list)):
+        return None
+    return {"joiner": "AND", "rows": [_row(field, operator, value)]}
+
+
+def compile_extraction(extraction: Dict) -> Tuple[List[Dict], List[Any]]:
+    """Structured extraction (rules / income_limits / age_limits) -> (condition groups, uncompiled parts)
+
+    Each rule or limit becomes its own group, so the eligibility score counts
+    satisfied rules. Anything that does not map onto a known field and
+    operator is returned unchanged for review instead of being guessed.
+    """
+    groups, uncompiled, seen = [], [], set()
+
+    def add(group: Optional[Dict], source: Any):
+        if group is None or not group["rows"]:
+            uncompiled.append(source)
+            return
+        signature = json.dumps(group, sort_keys=True)
+        if signature not in seen:
+            seen.add(signature)
+            groups.append(group)
+
+    for key, field in LIMIT_FIELDS.items():
+        limits = extraction.get(key)
+        if limits not in (None, {}, [], ''):
+            add(_compile_limits(field, limits), {key: limits})
+    for rule in extraction.get('rules') or []:
+        add(_compile_rule(rule), rule)
+
+    conditions = [
+        {"id": g, "joiner": group["joiner"],
+         "rows": [{"id": r, **row} for r, row in enumerate(group["rows"], start=1)]}
+        for g, group in enumerate(groups, start=1)
+    ]
+    return conditions, uncompiled
+
+
+def build_record(source_hash: str, source_type: str, extraction: Optional[Dict] = None,
+                 extractor: Optional[str] = None, **extra) -> Dict:
+    """Stored entry: the raw extraction plus its compiled conditions"""
+    record = {
+        "source_hash": source_hash,
+        "source_type": source_type,
+        "extraction": extraction,
+        "extractor": extractor,
+        "extraction_version": EXTRACTION_VERSION,
+        "stored_at": datetime.utcnow().isoformat(),
+        **extra
+    }
+    return compile_record(record)
+
+
+def compile_record(record: Dict) -> Dict:
+    if record.get("extraction") is not None:
+        record["conditions"], record["uncompiled"] = compile_extraction(record["extraction"])
+        record["compiler_version"] = COMPILER_VERSION
+    return record
+
+
+def load_record(data: Optional[bytes]) -> Optional[Dict]:
+    """Decode a stored record; None when missing or extracted with an older prompt"""
+    if data is None:
+        return None
+    record = json.loads(data)
+    if record.get("extraction") is not None and record.get("extraction_version") != EXTRACTION_VERSION:
+        return None
+    if record.get("extraction") is not None and record.get("compiler_version") != COMPILER_VERSION:
+        compile_record(record)
+    return record
+
+
+def rulebook_key(source_hash: str) -> str:
+    return f"{RULEBOOK_PREFIX}{source_hash}"
+
+
+def rules_key(source_hash: str) -> str:
+    """Redis list of a rulebook's rules (JSON, in order); its record holds rule_count"""
+    return f"{RULEBOOK_PREFIX}{source_hash}:rules"
+
+
+class RuleStore:
+    """Records keyed by content hash, persisted in Redis without TTL (like scheme:{id})"""
+
+    @staticmethod
+    def get(source_hash: str) -> Optional[Dict]:
+        client = get_redis_cache().client
+        if not client:
+            return None
+        try:
+            return load_record(client.get(rulebook_key(source_hash)))
+        except Exception as e:
+            logger.warning(f"Rule store read failed: {e}")
+            return None
+
+    @staticmethod
+    def put(record: Dict) -> Dict:
+        client = get_redis_cache().client
+        if client:
+            try:
+                client.set(rulebook_key(record["source_hash"]), json.dumps(record))
+            except Exception as e:
+                logger.warning(f"Rule store write failed: {e}")
+        return record
+
+    @staticmethod
+    def staging_key(source_hash: str) -> str:
+        """A fresh list for rules being written; put_rules() publishes it"""
+        return f"{rules_key(source_hash)}:{uuid.uuid4().hex[:12]}"
+
+    @staticmethod
+    def append_rules(staging: str, rules: List[Dict]) -> bool:
+        """RPUSH a batch of rules onto a staging list; False if they could not be written"""
+        client = get_redis_cache().client
+        if not client:
+            return False
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.rpush(staging, *[json.dumps(rule) for rule in rules])
+            pipe.expire(staging, STAGING_TTL)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Rule store write failed: {e}")
+            return False
+
+    @staticmethod
+    def put_rules(record: Dict, staging: str) -> Dict:
+        """Publish a complete staging list as the record's rules and store the record, atomically"""
+        client = get_redis_cache().client
+        if client:
+            key = rules_key(record["source_hash"])
+            try:
+                pipe = client.pipeline(transaction=True)
+                pipe.rename(staging, key)
+                pipe.persist(key)
+                pipe.set(rulebook_key(record["source_hash"]), json.dumps(record))
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Rule store write failed: {e}")
+        return record
+
+    @staticmethod
+    def discard_rules(staging: str):
+        client = get_redis_cache().client
+        if client:
+            try:
+                client.delete(staging)
+            except Exception as e:
+                logger.warning(f"Rule store cleanup failed: {e}")
+
+    @staticmethod
+    def count_rules(source_hash: str) -> int:
+        client = get_redis_cache().client
+        if not client:
+            return 0
+        try:
+            return client.llen(rules_key(source_hash))
+        except Exception as e:
+            logger.warning(f"Rule store read failed: {e}")
+            return 0
+
+    @staticmethod
+    def iter_rules(source_hash: str, batch: int = RULES_SLICE) -> Iterator[Dict]:
+        """Stored rules in order, read RULES_SLICE at a time"""
+        client = get_redis_cache().client
+        start = 0
+        while client:
+            raws = client.lrange(rules_key(source_hash), start, start + batch - 1)
+            if not raws:
+                return
+            for raw in raws:
+                yield json.loads(raw)
+            start += len(raws)
+
+
+class AsyncRuleStore:
+    """RuleStore on the shared asyncio pool"""
+
+    @staticmethod
+    async def get(source_hash: str) -> Optional[Dict]:
+        client = get_async_redis_cache().client
+        if not client:
+            return None
+        try:
+            return load_record(await client.get(rulebook_key(source_hash)))
+        except Exception as e:
+            logger.warning(f"Rule store read failed: {e}")
+            return None
+
+    @staticmethod
+    async def put(record: Dict) -> Dict:
+        client = get_async_redis_cache().client
+        if client:
+            try:
+                await client.set(rulebook_key(record["source_hash"]), json.dumps(record))
+            except Exception as e:
+                logger.warning(f"Rule store write failed: {e}")
+        return record
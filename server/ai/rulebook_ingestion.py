@@ -0,0 +1,386 @@
+"""
+Rulebook Ingestion for Docu-Agent
+Parses, splits and indexes many rulebook PDFs in parallel on a process pool, one job per distinct PDF
+"""
+
+import asyncio
+import hashlib
+import ipaddress
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import logging
+
+import httpx
+
+from rule_store import file_hash
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv('INGEST_WORKERS', os.cpu_count() or 2))
+JOB_TTL = 7 * 86400
+# Downloaded rulebooks, stored by content hash so a re-submitted URL is not fetched twice
+DOWNLOAD_DIR = os.getenv('INGEST_DOWNLOAD_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rulebooks'))
+DOWNLOAD_TIMEOUT = 120.0
+# Larger downloads are aborted; concurrent downloads across all jobs are capped
+MAX_DOWNLOAD_BYTES = int(os.getenv('INGEST_MAX_DOWNLOAD_BYTES', 200 * 1024 * 1024))
+MAX_DOWNLOADS = int(os.getenv('INGEST_MAX_DOWNLOADS', 8))
+# Server-side PDFs may only be read from this directory (relative sources resolve against it)
+RULEBOOK_DIR = os.getenv('INGEST_RULEBOOK_DIR', DOWNLOAD_DIR)
+# Comma-separated hosts (and their subdomains) rulebook URLs may point at; when unset, any host
+# with only public addresses is allowed
+ALLOWED_HOSTS = [host.strip().lower() for host in os.getenv('INGEST_ALLOWED_HOSTS', '').split(',') if host.strip()]
+# The API process refreshes a running job's heartbeat; an active job silent for longer is stale
+HEARTBEAT_INTERVAL = 15.0
+STALE_AFTER = 4 * HEARTBEAT_INTERVAL
+# Seconds between progress writes from a worker
+PROGRESS_INTERVAL = 0.5
+ACTIVE = ("downloading", "queued", "processing")
+COUNTERS = ("pages_total", "pages_done", "rules")
+
+
+def job_key(job_id: str) -> str:
+    return f"ingest:{job_id}"
+
+
+def pdf_job_key(source_hash: str) -> str:
+    """Dedupe marker: the job that owns a PDF's content hash"""
+    return f"ingest:pdf:{source_hash}"
+
+
+def ingest_batch_key(batch_id: str) -> str:
+    return f"ingest:batch:{batch_id}"
+
+
+def _text(raw) -> str:
+    return raw.decode() if isinstance(raw, bytes) else raw
+
+
+def is_stale(job: Dict) -> bool:
+    """Whether a queued/processing job lost the process running it (no heartbeat lately)"""
+    if job.get("status") not in ACTIVE:
+        return False
+    return time.time() - float(job.get("heartbeat") or 0) > STALE_AFTER
+
+
+def ingest_pdf(job_id: str, path: str, source_hash: str) -> Dict:
+    """Worker entry point: ingest one PDF, writing page progress to the job hash as it goes"""
+    # Imported here so the API process does not load LangChain just to queue jobs
+    from pypdf import PdfReader
+    from langchain_integration import RulebookProcessor
+    from redis_cache import get_redis_cache
+
+    client = get_redis_cache().client
+    key = job_key(job_id)
+
+    def report(mapping: Dict):
+        if client:
+            try:
+                client.hset(key, mapping=mapping)
+            except Exception as e:
+                logger.warning(f"Ingest progress write failed: {e}")
+
+    report({"status": "processing", "pages_total": len(PdfReader(path).pages),
+            "worker_pid": os.getpid(), "started_at": datetime.utcnow().isoformat()})
+    progress = {"pages_done": 0, "rules": 0, "written": time.monotonic()}
+
+    def on_rule(rule: Dict):
+        progress["rules"] += 1
+        progress["pages_done"] = max(progress["pages_done"], int(rule["page"]) + 1)
+        if time.monotonic() - progress["written"] >= PROGRESS_INTERVAL:
+            progress["written"] = time.monotonic()
+            report({"pages_done": progress["pages_done"], "rules": progress["rules"]})
+
+    return RulebookProcessor().ingest(path, source_hash, on_rule)
+
+
+class IngestExecutor:
+    """Process pool for ingestion jobs (created on first use)"""
+
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            logger.info(f"Ingest pool started ({self.workers} workers)")
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def local_source(source: str) -> str:
+    """Real path of a server-side PDF, which must lie inside RULEBOOK_DIR"""
+    root = os.path.realpath(RULEBOOK_DIR)
+    path = os.path.realpath(os.path.join(root, source))
+    if os.path.commonpath([root, path]) != root:
+        raise PermissionError(f"Local rulebooks must be under {RULEBOOK_DIR}: {source}")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"No such file: {source}")
+    return path
+
+
+async def check_url(url: str):
+    """Refuse URLs outside ALLOWED_HOSTS, or (without an allowlist) hosts with non-public addresses"""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise ValueError(f"Not an http(s) URL: {url}")
+    if ALLOWED_HOSTS:
+        if not any(host == allowed or host.endswith("." + allowed) for allowed in ALLOWED_HOSTS):
+            raise PermissionError(f"Host not allowed for rulebook downloads: {host}")
+        return
+
+    addresses = await asyncio.get_running_loop().getaddrinfo(host, parts.port or 443)
+    for *_, sockaddr in addresses:
+        if not ipaddress.ip_address(sockaddr[0].split("%")[0]).is_global:
+            raise PermissionError(f"Host resolves to a non-public address: {host}")
+
+
+async def fetch_source(source: str) -> Tuple[str, str]:
+    """(local path, content hash) of a PDF under RULEBOOK_DIR or an http(s) URL, downloading URLs by hash"""
+    if not source.startswith(("http://", "https://")):
+        path = local_source(source)
+        return path, await asyncio.to_thread(file_hash, path)
+
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    handle, staging = tempfile.mkstemp(suffix=".pdf", dir=DOWNLOAD_DIR)
+    try:
+        with os.fdopen(handle, "wb") as f:
+            async with _download_slots():
+                await _download(source, f, digest)
+        path = os.path.join(DOWNLOAD_DIR, f"{digest.hexdigest()}.pdf")
+        os.replace(staging, path)
+    except BaseException:
+        if os.path.exists(staging):
+            os.remove(staging)
+        raise
+    return path, digest.hexdigest()
+
+
+_downloads: Optional[asyncio.Semaphore] = None
+
+
+def _download_slots() -> asyncio.Semaphore:
+    global _downloads
+    if _downloads is None:
+        _downloads = asyncio.Semaphore(MAX_DOWNLOADS)
+    return _downloads
+
+
+async def _download(url: str, f, digest):
+    """Stream a URL into f, refusing anything over MAX_DOWNLOAD_BYTES"""
+    # The hook checks the first request and every redirect it follows
+    hooks = {"request": [lambda request: check_url(str(request.url))]}
+    async with httpx.AsyncClient(timeout=DOWNLOAD_TIMEOUT, follow_redirects=True, event_hooks=hooks) as client:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            declared = response.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > MAX_DOWNLOAD_BYTES:
+                raise ValueError(f"Rulebook is {declared} bytes, over the {MAX_DOWNLOAD_BYTES} byte limit")
+            received = 0
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > MAX_DOWNLOAD_BYTES:
+                    raise ValueError(f"Rulebook exceeds the {MAX_DOWNLOAD_BYTES} byte limit")
+                digest.update(chunk)
+                f.write(chunk)
+
+
+def check_source(source: str):
+    """Cheap validation at submit time; the download or hash happens in the job"""
+    if source.startswith(("http://", "https://")):
+        if not urlsplit(source).hostname:
+            raise ValueError(f"Not an http(s) URL: {source}")
+        return
+    local_source(source)
+
+
+async def submit_sources(redis, sources: List[str]) -> Dict:
+    """Register a job per source straight away, without fetching or hashing anything
+
+    Returns the batch id, an entry per source (an invalid source carries
+    its error) and the (job_id, source) jobs to start. Each job downloads
+    or hashes its PDF and then dedupes on the content hash (claim_pdf).
+    """
+    batch_id = uuid.uuid4().hex[:16]
+    entries, to_run = [], []
+    for source in sources:
+        try:
+            check_source(source)
+        except Exception as e:
+            entries.append({"source": source, "job_id": None, "status": "failed", "error": str(e)})
+            continue
+        job_id = uuid.uuid4().hex[:16]
+        await redis.hset(job_key(job_id), mapping={
+            "status": "downloading", "source": source,
+            "pages_total": 0, "pages_done": 0, "rules": 0,
+            "queued_at": datetime.utcnow().isoformat(), "heartbeat": time.time()
+        })
+        await redis.expire(job_key(job_id), JOB_TTL)
+        entries.append({"source": source, "job_id": job_id, "status": "downloading"})
+        to_run.append((job_id, source))
+
+    job_ids = [entry["job_id"] for entry in entries if entry["job_id"]]
+    if job_ids:
+        await redis.rpush(ingest_batch_key(batch_id), *job_ids)
+        await redis.expire(ingest_batch_key(batch_id), JOB_TTL)
+    return {"batch_id": batch_id, "entries": entries, "to_run": to_run}
+
+
+async def claim_pdf(redis, job_id: str, source_hash: str) -> Optional[str]:
+    """Make job_id the owner of a PDF's content hash; returns the live owner instead if there is one
+
+    A failed or stale earlier job for the same PDF does not count, so
+    re-submitting retries it.
+    """
+    # SET NX: of concurrent jobs for the same PDF only one ingests it
+    if await redis.set(pdf_job_key(source_hash), job_id, nx=True, ex=JOB_TTL):
+        return None
+    owner = _text(await redis.get(pdf_job_key(source_hash)) or b"")
+    raw = await redis.hgetall(job_key(owner)) if owner and owner != job_id else {}
+    existing = {_text(k): _text(v) for k, v in raw.items()}
+    if existing and existing.get("status") not in ("failed", "duplicate") and not is_stale(existing):
+        return owner
+    if is_stale(existing):
+        await mark_failed(redis, owner, "Stopped without finishing (no heartbeat)")
+    # The earlier job failed, stalled or expired; this one takes the PDF over
+    await redis.set(pdf_job_key(source_hash), job_id, ex=JOB_TTL)
+    return None
+
+
+async def mark_failed(redis, job_id: str, error: str):
+    await redis.hset(job_key(job_id), mapping={"status": "failed", "error": error,
+                                               "finished_at": datetime.utcnow().isoformat()})
+
+
+async def _heartbeat(redis, job_id: str):
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            await redis.hset(job_key(job_id), "heartbeat", time.time())
+        except Exception as e:
+            logger.warning(f"Ingest heartbeat for {job_id} failed: {e}")
+
+
+async def run_ingest_job(redis, executor: IngestExecutor, job_id: str, source: str):
+    """Fetch (or hash) the source, dedupe on its content hash, run it on the pool and record the outcome
+
+    Progress during ingestion is written by the worker. While the job
+    downloads, waits or runs, its heartbeat is refreshed so a job left
+    behind by a crashed server is recognised as stale. Cancelling the task
+    (as on shutdown) marks the job failed. A PDF another live job already
+    owns ends this job as "duplicate" pointing at that job.
+    """
+    loop = asyncio.get_running_loop()
+    beat = asyncio.create_task(_heartbeat(redis, job_id))
+    try:
+        path, source_hash = await fetch_source(source)
+        owner = await claim_pdf(redis, job_id, source_hash)
+        if owner is not None:
+            await redis.hset(job_key(job_id), mapping={
+                "status": "duplicate", "source_hash": source_hash, "duplicate_of": owner,
+                "finished_at": datetime.utcnow().isoformat()
+            })
+            return
+        await redis.hset(job_key(job_id), mapping={"status": "queued", "source_hash": source_hash})
+        summary = await loop.run_in_executor(executor.pool, ingest_pdf, job_id, path, source_hash)
+    except asyncio.CancelledError:
+        await mark_failed(redis, job_id, "Server shut down before the job finished")
+        raise
+    except Exception as e:
+        logger.error(f"Ingest job {job_id} failed: {e}")
+        await mark_failed(redis, job_id, str(e))
+        return
+    finally:
+        beat.cancel()
+
+    await redis.hset(job_key(job_id), mapping={
+        "status": "completed",
+        "pages_done": summary["pages"],
+        "rules": summary["total_rules"],
+        "index_key": summary["index_key"] or "",
+        "cached": int(summary["cached"]),
+        "index_cached": int(summary["index_cached"]),
+        "processor_status": summary["processor_status"],
+        # Worker time, so throughput leaves out time spent queued for a free worker
+        "seconds": summary["seconds"],
+        "finished_at": datetime.utcnow().isoformat()
+    })
+    logger.info(f"Ingest job {job_id} completed ({summary['pages']} pages, {summary['total_rules']} rules)")
+
+
+def _elapsed(job: Dict) -> float:
+    if "seconds" in job:
+        return float(job["seconds"])
+    if "started_at" not in job:
+        return 0.0
+    end = datetime.fromisoformat(job["finished_at"]) if "finished_at" in job else datetime.utcnow()
+    return max((end - datetime.fromisoformat(job["started_at"])).total_seconds(), 0.0)
+
+
+async def get_job(redis, job_id: str) -> Optional[Dict]:
+    """Job status with page progress and throughput, or None if the job is unknown"""
+    raw = await redis.hgetall(job_key(job_id))
+    if not raw:
+        return None
+    job = {_text(k): _text(v) for k, v in raw.items()}
+    if is_stale(job):
+        job.update(status="failed", error="Stopped without finishing (no heartbeat)")
+    for field in COUNTERS:
+        job[field] = int(job.get(field, 0))
+    for field in ("cached", "index_cached"):
+        if field in job:
+            job[field] = job[field] == "1"
+    elapsed = _elapsed(job)
+    job["job_id"] = job_id
+    job["progress"] = round(job["pages_done"] / job["pages_total"], 3) if job["pages_total"] else 0.0
+    job["pages_per_second"] = round(job["pages_done"] / elapsed, 2) if elapsed else 0.0
+    job["rules_per_second"] = round(job["rules"] / elapsed, 2) if elapsed else 0.0
+    return job
+
+
+async def get_batch(redis, batch_id: str) -> Optional[Dict]:
+    """Jobs of a batch plus aggregate throughput over the batch's wall-clock time"""
+    job_ids = [_text(job_id) for job_id in await redis.lrange(ingest_batch_key(batch_id), 0, -1)]
+    if not job_ids:
+        return None
+    jobs = [job for job in await asyncio.gather(*(get_job(redis, job_id) for job_id in job_ids)) if job]
+
+    statuses: Dict[str, int] = {}
+    for job in jobs:
+        statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+    # A duplicate's PDF is ingested by the job it points at; count that job's progress instead
+    owner_ids = {job["duplicate_of"] for job in jobs if job["status"] == "duplicate"} - set(job_ids)
+    owners = [job for job in await asyncio.gather(*(get_job(redis, job_id) for job_id in owner_ids)) if job]
+    counted = jobs + owners
+    started = [datetime.fromisoformat(job["started_at"]) for job in counted if "started_at" in job]
+    finished = [datetime.fromisoformat(job["finished_at"]) for job in counted if "finished_at" in job]
+    running = any(job["status"] in ACTIVE for job in counted)
+    end = datetime.utcnow() if running or not finished else max(finished)
+    wall = max((end - min(started)).total_seconds(), 0.0) if started else 0.0
+    pages = sum(job["pages_done"] for job in counted)
+    rules = sum(job["rules"] for job in counted)
+    return {
+        "batch_id": batch_id,
+        "status": "processing" if running else "completed",
+        "jobs_by_status": statuses,
+        "pages_total": sum(job["pages_total"] for job in counted),
+        "pages_done": pages,
+        "rules": rules,
+        "wall_seconds": round(wall, 3),
+        "pages_per_second": round(pages / wall, 2) if wall else 0.0,
+        "rules_per_second": round(rules / wall, 2) if wall else 0.0,
+        "jobs": jobs
+    }
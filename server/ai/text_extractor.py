@@ -1,22 +1,20 @@
 import json
 import sys
-from knowledge_base import BOT_KB
+from kb_index import TOP_K, KnowledgeIndex, load_kb, tokenize
+
+# Built once per process; the --serve worker keeps it for every message
+KB_INDEX = KnowledgeIndex(load_kb())
 
 
 def normalize(text):
-    return "" if text is None else text.strip().lower()
+    return "" if text is None else str(text).strip().lower()
 
 
 def extract_keywords(text):
-    tokens = []
-    for part in text.replace("/", " ").replace("-", " ").split():
-        clean = "".join(ch for ch in part if ch.isalnum())
-        if clean:
-            tokens.append(clean.lower())
-    return set(tokens)
+    return set(tokenize(text))
 
 
-def generate_reply(message):
+def generate_reply(message, top_k=TOP_K):
     text = normalize(message)
     if not text:
         return {
@@ -24,17 +22,13 @@ def generate_reply(message):
             "matched": []
         }
 
-    tokens = extract_keywords(text)
-    matched = []
-    for item in BOT_KB:
-        if any(tag in tokens for tag in item.get("tags", [])):
-            matched.append(item)
-
+    # Best BM25 match first; misspelled words still match through the trigram index
+    matched = KB_INDEX.search(text, top_k)
     if matched:
-        top = matched[0]
+        top = matched[0]["entry"]
         return {
             "reply": top.get("answer", "I can help with documents, profile, or schemes."),
-            "matched": [m.get("id") for m in matched]
+            "matched": [m["id"] for m in matched]
         }
 
     return {
@@ -43,7 +37,53 @@ def generate_reply(message):
     }
 
 
+def safe_reply(message):
+    # A message that cannot be answered gets an error entry instead of failing its batch
+    try:
+        return generate_reply(message)
+    except Exception as e:
+        return {"error": f"Could not answer message: {e}", "matched": []}
+
+
+def generate_replies(messages):
+    return [safe_reply(message) for message in messages]
+
+
+def handle_request(request):
+    # {"id", "message"} -> {"id", "reply", "matched"}; {"id", "messages"} -> {"id", "replies"}
+    if isinstance(request.get("messages"), list):
+        return {"id": request.get("id"), "replies": generate_replies(request["messages"])}
+    return {"id": request.get("id"), **safe_reply(request.get("message"))}
+
+
+def serve(stdin=None, stdout=None):
+    # Long-lived worker: one JSON request per input line, one JSON response per output line
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    if hasattr(stdin, "reconfigure"):
+        stdin.reconfigure(encoding="utf-8")
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        request = None
+        try:
+            request = json.loads(line)
+            response = handle_request(request) if isinstance(request, dict) else {"error": "Request must be an object"}
+        except ValueError as e:
+            response = {"error": f"Invalid request: {e}"}
+        except Exception as e:
+            # Answer with the request id so only that request fails; the worker keeps serving
+            response = {"id": request.get("id") if isinstance(request, dict) else None, "error": f"Request failed: {e}"}
+        stdout.write(json.dumps(response) + "\n")
+        stdout.flush()
+
+
 def main():
+    if sys.argv[1:] == ["--serve"]:
+        serve()
+        return
+
     message = ""
     if len(sys.argv) > 1:
         message = " ".join(sys.argv[1:])
@@ -6,8 +6,11 @@ const __dirname = path.dirname(fileURLToPath(import.meta.url));
 
 /**
  * Process rulebook PDF using LangChain integration
+ * The Python side writes one JSON line per rule as it is cut, then a final
+ * summary line. onRule (optional) sees each rule as it arrives; the resolved
+ * value is the summary, plus the collected rules when no onRule is given.
  */
-export async function processRulebookWithLangChain(pdfUrl) {
+export async function processRulebookWithLangChain(pdfUrl, onRule = null) {
   return new Promise((resolve, reject) => {
     const pythonProcess = spawn('python3', [
       path.join(__dirname, '../ai/langchain_integration.py'),
@@ -20,11 +23,32 @@ export async function processRulebookWithLangChain(pdfUrl) {
       }
     });
 
-    let stdout = '';
+    let buffered = '';
     let stderr = '';
+    let result = null;
+    let invalid = null;
+    const rules = [];
+
+    const handleLine = (line) => {
+      if (!line.trim()) return;
+      try {
+        const message = JSON.parse(line);
+        if (message.rule) {
+          if (onRule) onRule(message.rule);
+          else rules.push(message.rule);
+        } else if (message.result) {
+          result = message.result;
+        }
+      } catch (e) {
+        invalid = line;
+      }
+    };
 
     pythonProcess.stdout.on('data', (data) => {
-      stdout += data.toString();
+      buffered += data.toString();
+      const lines = buffered.split('\n');
+      buffered = lines.pop();
+      lines.forEach(handleLine);
     });
 
     pythonProcess.stderr.on('data', (data) => {
@@ -32,6 +56,7 @@ export async function processRulebookWithLangChain(pdfUrl) {
     });
 
     pythonProcess.on('close', (code) => {
+      handleLine(buffered);
       if (code !== 0) {
         console.error(`LangChain process exited with code ${code}: ${stderr}`);
         return reject({
@@ -40,15 +65,13 @@ export async function processRulebookWithLangChain(pdfUrl) {
         });
       }
 
-      try {
-        const result = JSON.parse(stdout);
-        resolve(result);
-      } catch (e) {
-        reject({
+      if (!result) {
+        return reject({
           error: 'Invalid response from LangChain',
-          raw: stdout
+          raw: invalid
         });
       }
+      resolve(onRule ? result : { ...result, rules });
     });
 
     pythonProcess.on('error', (err) => {
@@ -62,25 +85,32 @@ export async function processRulebookWithLangChain(pdfUrl) {
 
 /**
  * Query rulebook using LangChain RAG
+ * indexKey is the index_key returned by processRulebookWithLangChain; the saved
+ * index is loaded from disk, so the PDF is not re-read or re-embedded.
  */
-export async function queryRulebookWithLangChain(query) {
+export async function queryRulebookWithLangChain(query, indexKey = '') {
   return new Promise((resolve, reject) => {
     const pythonScript = `
 import json
 import sys
-sys.path.insert(0, '${path.join(__dirname, '../ai').replace(/\\/g, '/')}')
 from langchain_integration import RulebookProcessor
 
 processor = RulebookProcessor()
-result = processor.query_eligibility('${query.replace(/'/g, "\\'")}')
+result = processor.query_eligibility(sys.argv[1], index_key=sys.argv[2] or None)
 print(json.dumps(result))
 `;
 
     const pythonProcess = spawn('python3', [
       '-c',
-      pythonScript
+      pythonScript,
+      query,
+      indexKey || ''
     ], {
-      windowsHide: true
+      windowsHide: true,
+      env: {
+        ...process.env,
+        PYTHONPATH: path.join(__dirname, '../ai')
+      }
     });
 
     let stdout = '';
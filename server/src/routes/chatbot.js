@@ -12,7 +12,7 @@ const pythonExecutable = process.env.PYTHON_EXECUTABLE || 'python';
 const scriptPath = path.resolve(__dirname, '..', '..', 'ai', 'text_extractor.py');
 
 const fallbackReply = (message) => {
-  const text = (message || '').toLowerCase();
+  const text = String(message || '').toLowerCase();
   if (text.includes('document') || text.includes('doc') || text.includes('upload')) {
     return 'Missing documents detected. Upload Income and Caste certificates in the Documents page to unlock more schemes.';
   }
@@ -25,39 +25,102 @@ const fallbackReply = (message) => {
   return 'I can help with documents, profile updates, or scheme eligibility.';
 };
 
-router.post('/', async (req, res) => {
-  const { message } = req.body || {};
-  if (!message) {
-    return res.status(400).json({ reply: 'Please share your question.' });
-  }
+// Long-lived `text_extractor.py --serve` worker: the interpreter and knowledge base load once,
+// and messages arriving in the same tick go out as one JSON line.
+const workerTimeoutMs = Number(process.env.CHATBOT_WORKER_TIMEOUT_MS || 5000);
+let worker = null;
+let nextBatchId = 1;
+const inFlight = new Map();
+let queued = [];
 
-  const child = spawn(pythonExecutable, [scriptPath, message], {
-    windowsHide: true
-  });
+const failBatch = (batch, reason) => {
+  clearTimeout(batch.timer);
+  batch.waiters.forEach((waiter) => waiter.reject(new Error(reason)));
+};
 
-  let output = '';
-  let errorOutput = '';
+const startWorker = () => {
+  const child = spawn(pythonExecutable, [scriptPath, '--serve'], { windowsHide: true });
+  let buffered = '';
 
   child.stdout.on('data', (data) => {
-    output += data.toString();
+    buffered += data.toString();
+    const lines = buffered.split('\n');
+    buffered = lines.pop();
+    lines.forEach((line) => {
+      if (!line.trim()) return;
+      let response;
+      try {
+        response = JSON.parse(line);
+      } catch {
+        return;
+      }
+      const batch = inFlight.get(response.id);
+      if (!batch) return;
+      inFlight.delete(response.id);
+      clearTimeout(batch.timer);
+      if (!Array.isArray(response.replies)) {
+        return failBatch(batch, response.error || 'Invalid response from extractor.');
+      }
+      batch.waiters.forEach((waiter, i) => waiter.resolve(response.replies[i]));
+    });
   });
 
+  // Writes after the worker died fail here; the exit handler fails those requests
+  child.stdin.on('error', () => {});
+
   child.stderr.on('data', (data) => {
-    errorOutput += data.toString();
+    console.warn(`Chatbot worker: ${data.toString().trim()}`);
   });
 
-  child.on('close', (code) => {
-    if (code !== 0 || !output) {
-      return res.json({ reply: fallbackReply(message), error: errorOutput || 'Python extractor failed.' });
-    }
-
-    try {
-      const parsed = JSON.parse(output);
-      return res.json({ reply: parsed.reply || fallbackReply(message), matched: parsed.matched || [] });
-    } catch {
-      return res.json({ reply: fallbackReply(message), error: 'Invalid response from extractor.' });
-    }
-  });
+  const onExit = (reason) => {
+    if (worker === child) worker = null;
+    inFlight.forEach((batch, id) => {
+      if (batch.child !== child) return;
+      inFlight.delete(id);
+      failBatch(batch, reason);
+    });
+  };
+  child.on('exit', (code) => onExit(`Python extractor exited (${code}).`));
+  child.on('error', (err) => onExit(err.message));
+  return child;
+};
+
+const flushQueue = () => {
+  const waiters = queued;
+  queued = [];
+  if (!worker) worker = startWorker();
+
+  const id = nextBatchId++;
+  const batch = { waiters, child: worker };
+  batch.timer = setTimeout(() => {
+    inFlight.delete(id);
+    failBatch(batch, 'Python extractor timed out.');
+    // A stuck worker would time out every later batch too; replace it on the next message
+    if (worker === batch.child) worker = null;
+    batch.child.kill();
+  }, workerTimeoutMs);
+  inFlight.set(id, batch);
+  worker.stdin.write(`${JSON.stringify({ id, messages: waiters.map((waiter) => waiter.message) })}\n`);
+};
+
+const askWorker = (message) => new Promise((resolve, reject) => {
+  if (queued.length === 0) setImmediate(flushQueue);
+  queued.push({ message, resolve, reject });
+});
+
+router.post('/', async (req, res) => {
+  const { message: raw } = req.body || {};
+  if (raw === undefined || raw === null || raw === '') {
+    return res.status(400).json({ reply: 'Please share your question.' });
+  }
+  const message = typeof raw === 'string' ? raw : String(raw);
+
+  try {
+    const parsed = await askWorker(message);
+    return res.json({ reply: parsed.reply || fallbackReply(message), matched: parsed.matched || [] });
+  } catch (err) {
+    return res.json({ reply: fallbackReply(message), error: err.message });
+  }
 });
 
 export default router;